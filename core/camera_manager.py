@@ -46,15 +46,17 @@ class CameraManager:
         
         # Egér kezelés
         self.cursor_locked = False
+        # Honnan jön az egér elmozdulás: () -> (dx, dy) vagy None
+        # Alapból az ablakból olvassuk; visszajátszás / headless szkript lecserélheti
+        self.mouse_source = self._read_window_pointer
+        # Opcionális figyelő az egér elmozdulásokra (pl. input felvétel): callback(dx, dy)
+        self.mouse_listener = None
         self.lock_cursor()
 
     def update(self):
         """Minden frame-ben meghívandó."""
         # 1. Követjük a célpontot
-        if self.target:
-            # A pivot a játékos feje magasságában legyen (pl. +2 Z), ne a talpánál
-            target_pos = self.target.getPos() + Vec3(0, 0, 2.0)
-            self.pivot.setPos(target_pos)
+        self._follow_target()
 
         # 2. Egér forgatás
         if self.cursor_locked:
@@ -63,6 +65,17 @@ class CameraManager:
         # 3. Kamera ütközésvizsgálat (Spring Arm)
         self._handle_camera_collision()
 
+    def sync(self):
+        """Kamera igazítása a célpont aktuális pozíciójához egér kezelés nélkül."""
+        self._follow_target()
+        self._handle_camera_collision()
+
+    def _follow_target(self):
+        if self.target:
+            # A pivot a játékos feje magasságában legyen (pl. +2 Z), ne a talpánál
+            target_pos = self.target.getPos() + Vec3(0, 0, 2.0)
+            self.pivot.setPos(target_pos)
+
     def _handle_camera_collision(self):
         # Az ideális pozíció (ha nincs fal):
         ideal_pos = Vec3(0, -self.distance, self.height)
@@ -103,33 +116,50 @@ class CameraManager:
             self.base.camera.setPos(ideal_pos)
 
     def _handle_mouse_look(self):
+        delta = self.mouse_source()
+        if delta is None:
+            return
+        dx, dy = delta
+        self.apply_mouse_delta(dx, dy)
+        if self.mouse_listener:
+            self.mouse_listener(dx, dy)
+
+    def _read_window_pointer(self):
+        """Egér elmozdulás a képernyő közepéhez képest (a kurzort visszaállítjuk)."""
         win = self.base.win
+        if win is None:
+            return None
         cx = win.getXSize() // 2
         cy = win.getYSize() // 2
         
         if not win.getPointer(0).getInWindow():
-            return
+            return None
 
         pointer = win.getPointer(0)
         x = pointer.getX()
         y = pointer.getY()
         
-        if x != cx or y != cy:
-            dx = x - cx
-            dy = y - cy
-            
-            current_h = self.pivot.getH()
-            current_p = self.pivot.getP()
-            
-            self.pivot.setH(current_h - dx * self.sensitivity)
-            
-            new_p = current_p - dy * self.sensitivity
-            new_p = max(-89, min(89, new_p))
-            self.pivot.setP(new_p)
-            
-            win.movePointer(0, cx, cy)
+        if x == cx and y == cy:
+            return None
+        win.movePointer(0, cx, cy)
+        return x - cx, y - cy
+
+    def apply_mouse_delta(self, dx, dy):
+        """Pivot forgatása egér elmozdulás (pixel) alapján."""
+        current_h = self.pivot.getH()
+        current_p = self.pivot.getP()
+        
+        self.pivot.setH(current_h - dx * self.sensitivity)
+        
+        new_p = current_p - dy * self.sensitivity
+        new_p = max(-89, min(89, new_p))
+        self.pivot.setP(new_p)
 
     def lock_cursor(self):
+        if self.base.win is None:
+            # Ablak nélkül nincs kurzor, de a (szkriptelt) egér forgatás működjön
+            self.cursor_locked = True
+            return
         props = WindowProperties()
         props.setCursorHidden(True)
         props.setMouseMode(WindowProperties.M_absolute)
@@ -141,6 +171,8 @@ class CameraManager:
         self.base.win.movePointer(0, cx, cy)
 
     def unlock_cursor(self):
+        if self.base.win is None:
+            return
         props = WindowProperties()
         props.setCursorHidden(False)
         props.setMouseMode(WindowProperties.M_absolute)
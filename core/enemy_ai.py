@@ -1,15 +1,34 @@
 import math
+import random
+from collections import namedtuple
 from panda3d.core import (
     Vec3, NodePath, BitMask32, CollisionTraverser, CollisionHandlerQueue,
-    CollisionRay, CollisionSegment, CollisionNode, GeomNode, CollisionSphere
+    CollisionSegment, CollisionNode, GeomNode, CollisionSphere
 )
-from direct.task import Task
 from direct.actor.Actor import Actor
 
+from core.profiler import profiler
+from core.entity_registry import ENTITY_ENEMY
+
+ENEMY_MODEL_PATH = "assets/models/monkey.egg"
+
 # Maszkok
 MASK_TERRAIN = BitMask32.bit(1)
 MASK_PLAYER = BitMask32.bit(2)
 
+# LOD szintek (frissítési gyakoriság a játékostól való távolság és láthatóság alapján)
+LOD_NEAR = 0    # Minden szimulációs lépésben teljes logika
+LOD_MID = 1     # Néhány lépésenként, összegyűjtött dt-vel
+LOD_FAR = 2     # Alvó mód: csak durva mozgás, raycast nélkül
+LOD_NAMES = ("NEAR", "MID", "FAR")
+LOD_DEBUG_COLORS = ((0.3, 1.0, 0.3, 1), (1.0, 1.0, 0.3, 1), (1.0, 0.3, 0.3, 1))
+
+# A modell origója és a talaj távolsága
+ENEMY_HEIGHT_OFFSET = 0.5
+
+# Felfüggesztett ellenség tömör állapota
+EnemyRecord = namedtuple("EnemyRecord", "x y z h health patrol_index patrol_points")
+
 class EnemyAI:
     STATE_IDLE = "Idle"
     STATE_PATROL = "Patrol"
@@ -26,7 +45,9 @@ class EnemyAI:
         # --- MODELL BETÖLTÉSE ---
         # Ha statikus a modell (nincs animáció), az Actor akkor is betölti a geometriát.
         # Üres szótárat adunk át, vagy csak a fájlt.
-        self.actor = Actor("assets/models/monkey.egg", {})
+        # Ha a Game már előtöltötte a modellt, abból másolunk (nem olvassuk újra az .egg-et)
+        model = getattr(self.base, "enemy_model", None) or ENEMY_MODEL_PATH
+        self.actor = Actor(model, {})
 
         self.actor.setScale(0.5, 0.5, 0.5) 
         self.actor.reparentTo(self.render)
@@ -48,12 +69,22 @@ class EnemyAI:
         self.current_patrol_index = 0
         self.last_known_pos = None
         self.search_timer = 0
+
+        # --- LOD Paraméterek ---
+        self.lod_near_range = self.sight_range
+        self.lod_far_range = self.sight_range * 2.5
+        # Hány szimulációs lépésenként fut le a logika az adott szinten
+        self.lod_intervals = (1, 4, 15)
+        self.lod_tier = LOD_NEAR
+        # Véletlen eltolás, hogy ne egyszerre frissüljön minden ellenség
+        self.lod_frame_counter = random.randrange(self.lod_intervals[LOD_FAR])
+        self.lod_accum_dt = 0.0
         
         # --- Élet Állapot ---
         self.is_alive = True
         self.health = 3
         
-        # --- Érzékelés és Fizika (Raycast) ---
+        # --- Érzékelés (Raycast) ---
         self.cTrav = CollisionTraverser()
         self.cQueue = CollisionHandlerQueue()
         
@@ -66,14 +97,8 @@ class EnemyAI:
         self.sight_np = self.actor.attachNewNode(self.sight_node)
         self.cTrav.addCollider(self.sight_np, self.cQueue)
 
-        # 2. Talaj sugár
-        self.foot_ray = CollisionRay(0, 0, 2, 0, 0, -1)
-        self.foot_node = CollisionNode('ai_foot')
-        self.foot_node.addSolid(self.foot_ray)
-        self.foot_node.setFromCollideMask(MASK_TERRAIN)
-        self.foot_node.setIntoCollideMask(BitMask32.allOff())
-        self.foot_np = self.actor.attachNewNode(self.foot_node)
-        self.cTrav.addCollider(self.foot_np, self.cQueue)
+        # --- Fizika: talajkövetés és gravitáció a közös PhysicsManager-ben ---
+        self.body = self.base.physics.add_body(self.actor, ENEMY_HEIGHT_OFFSET)
         
         # --- Hitbox ---
         c_sphere = CollisionNode('enemy_hitbox')
@@ -81,11 +106,48 @@ class EnemyAI:
         c_sphere.setIntoCollideMask(BitMask32.bit(3))
         c_sphere.setFromCollideMask(BitMask32.allOff())
         self.hitbox_np = self.actor.attachNewNode(c_sphere)
-        self.hitbox_np.setPythonTag("enemy", self)
 
-        self.base.taskMgr.add(self.update, "EnemyAIUpdate")
+        # Nyilvántartás: a golyók a hitbox node-ból keresik vissza az ellenséget
+        self.handle = self.base.entities.spawn(ENTITY_ENEMY, self)
+        self.base.entities.bind_collider(self.handle, self.hitbox_np)
+
+        # Render interpoláció (a frissítést a Game fix lépésű szimulációja hívja)
+        self.base.interpolator.track(self.actor)
         print("Enemy AI (Monkey) elindult!")
 
+    # --- Felfüggesztés (chunk streaming) ---
+
+    def to_record(self):
+        """Tömör állapot rekord a felfüggesztéshez (csak primitív értékek)."""
+        pos = self.actor.getPos()
+        return EnemyRecord(
+            pos.x, pos.y, pos.z, self.actor.getH(),
+            self.health, self.current_patrol_index,
+            tuple((p.x, p.y, p.z) for p in self.patrol_points)
+        )
+
+    @classmethod
+    def from_record(cls, base_app, player_obj, record):
+        """Felfüggesztett ellenség visszaállítása egy rekordból."""
+        patrol_points = [Vec3(*p) for p in record.patrol_points]
+        enemy = cls(base_app, player_obj, patrol_points)
+        enemy.actor.setPos(record.x, record.y, record.z)
+        enemy.actor.setH(record.h)
+        enemy.health = record.health
+        enemy.current_patrol_index = record.patrol_index
+        base_app.interpolator.track(enemy.actor)
+        return enemy
+
+    def suspend(self):
+        """Kivesszük a szimulációból és a jelenetből (nem halál)."""
+        if not self.is_alive: return
+        self.is_alive = False
+        self.base.entities.despawn(self.handle)
+        self.base.physics.remove_body(self.body)
+        self.base.interpolator.untrack(self.actor)
+        self.actor.cleanup()
+        self.actor.removeNode()
+
     def set_anim(self, anim_name, loop=True):
         """Animáció váltása biztonságosan."""
         if self.current_anim != anim_name:
@@ -117,19 +179,78 @@ class EnemyAI:
         if not self.is_alive: return
         self.is_alive = False
         print("Enemy died!")
+        self.base.entities.despawn(self.handle)
+        self.base.physics.remove_body(self.body)
+        self.base.interpolator.untrack(self.actor)
         self.actor.cleanup()
         self.actor.removeNode()
 
-    def update(self, task):
+    def is_on_screen(self):
+        """Benne van-e az ellenség a kamera látómezejében."""
+        cam_node = self.base.camNode
+        if cam_node is None:
+            # Nincs kamera (pl. ablak nélkül) -> mindent láthatónak tekintünk
+            return True
+        point = self.base.cam.getRelativePoint(self.render, self.actor.getPos())
+        return cam_node.isInView(point)
+
+    def compute_lod_tier(self, dist_to_player):
+        """LOD szint meghatározása távolság és láthatóság alapján."""
+        if dist_to_player > self.lod_far_range:
+            return LOD_FAR
+        if dist_to_player <= self.lod_near_range:
+            # Harcban, hallótávon belül vagy a képernyőn: teljes frissítés
+            if self.state in (self.STATE_CHASE, self.STATE_ATTACK):
+                return LOD_NEAR
+            if dist_to_player <= self.hearing_range or self.is_on_screen():
+                return LOD_NEAR
+        return LOD_MID
+
+    def set_lod_tier(self, tier):
+        if tier == self.lod_tier:
+            return
+        if tier == LOD_FAR:
+            # Alvó módban nincs animáció
+            try:
+                self.actor.stop()
+            except Exception:
+                pass
+            self.current_anim = None
+            # Ilyen messziről a játékost biztosan elvesztette
+            if self.state != self.STATE_PATROL:
+                self.state = self.STATE_PATROL
+        self.lod_tier = tier
+
+    def update(self, dt):
+        """Egy fix szimulációs lépés (dt = a lépés hossza)."""
         if not self.is_alive:
-            return Task.done
-            
-        dt = globalClock.getDt()
-        
+            return
+
+        self.lod_accum_dt += dt
+        self.lod_frame_counter += 1
+
         dist_to_player = (self.actor.getPos() - self.player.get_pos()).length()
-        
-        self.snap_to_ground()
+        self.set_lod_tier(self.compute_lod_tier(dist_to_player))
+
+        if self.lod_frame_counter < self.lod_intervals[self.lod_tier]:
+            return
 
+        dt = self.lod_accum_dt
+        self.lod_accum_dt = 0.0
+        self.lod_frame_counter = 0
+
+        with profiler.scope("enemy_ai"):
+            if self.lod_tier == LOD_FAR:
+                self.update_dormant(dt)
+            else:
+                self.think(dt, dist_to_player)
+
+    def update_dormant(self, dt):
+        """Olcsó frissítés: járőrözés érzékelés és animáció nélkül."""
+        self.behavior_patrol(dt)
+
+    def think(self, dt, dist_to_player):
+        """Teljes frissítés: érzékelés és állapotgép (a talajkövetés a fizikában van)."""
         can_see = self.check_vision(dist_to_player)
         can_hear = self.check_hearing(dist_to_player)
 
@@ -172,27 +293,6 @@ class EnemyAI:
         elif self.state == self.STATE_SEARCH:
             self.behavior_search(dt)
 
-        return Task.cont
-
-    def snap_to_ground(self):
-        self.cTrav.traverse(self.render)
-        ground_z = -100
-        
-        if self.cQueue.getNumEntries() > 0:
-            self.cQueue.sortEntries()
-            for i in range(self.cQueue.getNumEntries()):
-                entry = self.cQueue.getEntry(i)
-                if entry.getFromNode() == self.foot_node:
-                    ground_z = entry.getSurfacePoint(self.render).z
-                    break
-        
-        current_z = self.actor.getZ()
-        if ground_z > -90:
-            ground_offset = 0.5 
-            target_z = ground_z + ground_offset
-            new_z = current_z + (target_z - current_z) * 0.2
-            self.actor.setZ(new_z)
-
     def check_vision(self, dist):
         if dist > self.sight_range: return False
         
@@ -214,7 +314,8 @@ class EnemyAI:
         if self.cQueue.getNumEntries() > 0:
             self.cQueue.sortEntries()
             entry = self.cQueue.getEntry(0)
-            if entry.getIntoNode().getName() == "player_hitbox":
+            # Maszk alapján döntünk (a játékos hitboxa a 2-es biten ütközik)
+            if not (entry.getIntoNode().getIntoCollideMask() & MASK_PLAYER).isZero():
                 self.last_known_pos = self.player.get_pos()
                 return True
         return False
@@ -0,0 +1,123 @@
+import random
+from panda3d.core import Vec3
+
+from core.enemy_ai import EnemyAI
+from core.entity_registry import ENTITY_ENEMY
+
+
+class EnemySpawner:
+    """
+    Chunkokhoz kötött ellenség populáció.
+    A betöltött chunkokban aktív EnemyAI-k élnek (a Game entitás nyilvántartásában),
+    a kitett chunkok ellenségei tömör rekordként (EnemyRecord) várnak, amíg a chunk
+    újra be nem töltődik.
+    """
+    def __init__(self, base_app, player_obj, terrain, seed=42,
+                 spawn_chance=0.35, max_per_chunk=2):
+        self.base = base_app
+        self.player = player_obj
+        self.terrain = terrain
+        self.seed = seed
+
+        # Sűrűség chunkonként: ennyi eséllyel van ellenség, és legfeljebb ennyi
+        self.spawn_chance = spawn_chance
+        self.max_per_chunk = max_per_chunk
+        self.spawn_margin = 6.0      # Ne a chunk szélére kerüljön
+        self.patrol_length = 20.0
+
+        self.suspended = {}          # chunk key -> [EnemyRecord, ...]
+        self.visited = set()         # Már feltöltött chunkok
+
+        terrain.on_chunk_loaded.append(self.on_chunk_loaded)
+        terrain.on_chunk_unloaded.append(self.on_chunk_unloaded)
+
+        # A már betöltött chunkok feltöltése
+        for key in list(terrain.active_chunks.keys()):
+            self.on_chunk_loaded(key)
+
+    def on_chunk_loaded(self, key):
+        if key in self.visited:
+            # Visszatérő chunk: a felfüggesztett ellenségek folytatják
+            for record in self.suspended.pop(key, []):
+                EnemyAI.from_record(self.base, self.player, record)
+        else:
+            self.visited.add(key)
+            for patrol_route in self.spawn_routes(key):
+                EnemyAI(self.base, self.player, patrol_route)
+
+    def on_chunk_unloaded(self, key):
+        # Minden olyan ellenséget felfüggesztünk, amelyik már nem betöltött chunkon áll
+        # (nem csak a most kitett chunkét, hanem az oda elkóboroltakat is)
+        # Visszafelé járjuk be: a suspend swap-remove-val törli a nyilvántartásból
+        enemies = self.base.entities.of_type(ENTITY_ENEMY)
+        for i in range(len(enemies) - 1, -1, -1):
+            enemy = enemies[i]
+            pos = enemy.actor.getPos()
+            enemy_key = self.terrain.chunk_key_at(pos.x, pos.y)
+            if enemy_key not in self.terrain.active_chunks:
+                self.suspended.setdefault(enemy_key, []).append(enemy.to_record())
+                self.visited.add(enemy_key)
+                enemy.suspend()
+
+    def spawn_around(self, center, count, radius=60.0, seed=None):
+        """
+        Extra ellenségek a betöltött chunkokban (pl. terheléses teszthez).
+        Ugyanúgy részt vesznek a streamingben, mint a chunk saját ellenségei.
+        """
+        rng = random.Random(self.seed if seed is None else seed)
+        spawned = 0
+        attempts = 0
+        while spawned < count and attempts < count * 20:
+            attempts += 1
+            ax = center.x + rng.uniform(-radius, radius)
+            ay = center.y + rng.uniform(-radius, radius)
+            if self.terrain.chunk_key_at(ax, ay) not in self.terrain.active_chunks:
+                continue
+            bx = ax + rng.uniform(-1, 1) * self.patrol_length
+            by = ay + rng.uniform(-1, 1) * self.patrol_length
+            route = [self.ground_point(ax, ay), self.ground_point(bx, by)]
+            EnemyAI(self.base, self.player, route)
+            spawned += 1
+        return spawned
+
+    def spawn_routes(self, key):
+        """Determinisztikus járőr útvonalak egy chunkhoz (seed + chunk koordináta)."""
+        rng = random.Random(hash((self.seed, key[0], key[1])))
+        if rng.random() >= self.spawn_chance:
+            return []
+
+        size = self.terrain.chunk_world_size
+        start_x = key[0] * size
+        start_y = key[1] * size
+        low = self.spawn_margin
+        high = size - self.spawn_margin
+
+        routes = []
+        for _ in range(rng.randint(1, self.max_per_chunk)):
+            ax = start_x + rng.uniform(low, high)
+            ay = start_y + rng.uniform(low, high)
+            bx = min(start_x + high, max(start_x + low, ax + rng.uniform(-1, 1) * self.patrol_length))
+            by = min(start_y + high, max(start_y + low, ay + rng.uniform(-1, 1) * self.patrol_length))
+            routes.append([self.ground_point(ax, ay), self.ground_point(bx, by)])
+        return routes
+
+    def ground_point(self, x, y):
+        z, _, _ = self.terrain.get_height_slope(x, y)
+        return Vec3(x, y, z)
+
+    @property
+    def enemies(self):
+        """Aktív ellenségek (a nyilvántartás sűrű listája, nem másolat)."""
+        return self.base.entities.of_type(ENTITY_ENEMY)
+
+    def step(self, dt):
+        """Minden aktív ellenség egy szimulációs lépése."""
+        enemies = self.enemies
+        for i in range(len(enemies) - 1, -1, -1):
+            enemies[i].update(dt)
+
+    def active_count(self):
+        return self.base.entities.count(ENTITY_ENEMY)
+
+    def suspended_count(self):
+        return sum(len(records) for records in self.suspended.values())
@@ -0,0 +1,141 @@
+# Entitás típusok (a típusonkénti sűrű tárolás kulcsa)
+ENTITY_PLAYER = 0
+ENTITY_ENEMY = 1
+ENTITY_BULLET = 2
+
+# Handle felépítése: [generáció | slot index]
+INDEX_BITS = 20
+INDEX_MASK = (1 << INDEX_BITS) - 1
+INVALID_HANDLE = -1
+
+
+class EntityRegistry:
+    """
+    Központi entitás nyilvántartás.
+    - Generációs handle-ök: egy törölt entitás handle-je soha nem mutat egy későbbi
+      entitásra ugyanabban a slotban (get() ilyenkor None-t ad).
+    - Típusonként sűrű lista (dense), törlés swap-remove-val O(1).
+    - Ütközési node -> entitás keresés a node kulcsa alapján (nincs string összehasonlítás).
+    """
+    def __init__(self):
+        # Slotonként (handle index szerint)
+        self.generations = []
+        self.objects = []
+        self.types = []
+        self.dense_index = []
+        self.collider_keys = []
+        self.free_slots = []
+
+        # Típusonként: sűrű objektum és handle lista (azonos sorrendben)
+        self.dense = {}
+        self.dense_handles = {}
+
+        # Ütközési node kulcs -> handle
+        self.colliders = {}
+
+    # --- Létrehozás / törlés ---
+
+    def spawn(self, entity_type, obj):
+        """Entitás felvétele, visszaadja a handle-t. O(1)."""
+        if self.free_slots:
+            slot = self.free_slots.pop()
+        else:
+            slot = len(self.generations)
+            if slot > INDEX_MASK:
+                raise RuntimeError("EntityRegistry: elfogytak a slotok")
+            self.generations.append(0)
+            self.objects.append(None)
+            self.types.append(None)
+            self.dense_index.append(-1)
+            self.collider_keys.append(None)
+
+        handle = (self.generations[slot] << INDEX_BITS) | slot
+        objects = self.dense.setdefault(entity_type, [])
+        handles = self.dense_handles.setdefault(entity_type, [])
+
+        self.objects[slot] = obj
+        self.types[slot] = entity_type
+        self.dense_index[slot] = len(objects)
+        objects.append(obj)
+        handles.append(handle)
+        return handle
+
+    def despawn(self, handle):
+        """Entitás törlése (swap-remove a típus listájából). False, ha már nem élt."""
+        slot = handle & INDEX_MASK
+        if not self._valid(handle, slot):
+            return False
+
+        entity_type = self.types[slot]
+        objects = self.dense[entity_type]
+        handles = self.dense_handles[entity_type]
+        index = self.dense_index[slot]
+
+        # Az utolsó elem a törölt helyére kerül
+        last = len(objects) - 1
+        if index != last:
+            moved_handle = handles[last]
+            objects[index] = objects[last]
+            handles[index] = moved_handle
+            self.dense_index[moved_handle & INDEX_MASK] = index
+        objects.pop()
+        handles.pop()
+
+        if self.collider_keys[slot] is not None:
+            for key in self.collider_keys[slot]:
+                self.colliders.pop(key, None)
+            self.collider_keys[slot] = None
+
+        self.objects[slot] = None
+        self.types[slot] = None
+        self.dense_index[slot] = -1
+        self.generations[slot] = (self.generations[slot] + 1) & (0xFFFFFFFF >> INDEX_BITS)
+        self.free_slots.append(slot)
+        return True
+
+    # --- Lekérdezés ---
+
+    def _valid(self, handle, slot):
+        return (0 <= handle and slot < len(self.generations)
+                and self.objects[slot] is not None
+                and self.generations[slot] == handle >> INDEX_BITS)
+
+    def get(self, handle):
+        """Az entitás objektuma, vagy None, ha a handle elavult."""
+        slot = handle & INDEX_MASK
+        if not self._valid(handle, slot):
+            return None
+        return self.objects[slot]
+
+    def is_alive(self, handle):
+        return self._valid(handle, handle & INDEX_MASK)
+
+    def of_type(self, entity_type):
+        """
+        A típus sűrű listája (nem másolat!). Ha iterálás közben törlődhet elem,
+        visszafelé kell bejárni: a swap-remove csak már bejárt indexre mozgat.
+        """
+        return self.dense.get(entity_type, [])
+
+    def count(self, entity_type):
+        return len(self.dense.get(entity_type, ()))
+
+    # --- Ütközési node-ok ---
+
+    def bind_collider(self, handle, node_path):
+        """Az ütközési node az entitáshoz tartozik (CollisionEntry -> entitás keresés)."""
+        slot = handle & INDEX_MASK
+        if not self._valid(handle, slot):
+            return
+        key = node_path.getKey()
+        self.colliders[key] = handle
+        if self.collider_keys[slot] is None:
+            self.collider_keys[slot] = []
+        self.collider_keys[slot].append(key)
+
+    def from_collider(self, node_path):
+        """Entitás egy ütközési találat 'into' NodePath-jából (vagy None)."""
+        handle = self.colliders.get(node_path.getKey())
+        if handle is None:
+            return None
+        return self.get(handle)
@@ -0,0 +1,82 @@
+from panda3d.core import Point3
+
+
+class FixedTimestep:
+    """
+    Fix lépésközű szimulációs óra (accumulator).
+    A változó frame időt fix méretű szimulációs lépésekre bontja, a maradékot
+    pedig 'alpha'-ként adja vissza a renderelési interpolációhoz.
+    """
+    def __init__(self, rate=60.0, max_steps=5):
+        self.rate = rate
+        self.step_dt = 1.0 / rate
+        # Egy frame-ben legfeljebb ennyi lépés (különben a lassú gép "spirálba" kerül)
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+        self.step_index = 0      # Eddig lefutott szimulációs lépések száma
+        self.dropped_time = 0.0  # A limit miatt eldobott idő (diagnosztika)
+
+    def advance(self, frame_dt):
+        """Hozzáadja a frame időt, és visszaadja, hány lépést kell futtatni."""
+        self.accumulator += frame_dt
+        steps = int(self.accumulator / self.step_dt)
+        if steps > self.max_steps:
+            # Túl nagy akadás: a felesleget eldobjuk, a játék inkább lassul
+            self.dropped_time += (steps - self.max_steps) * self.step_dt
+            steps = self.max_steps
+        self.accumulator -= steps * self.step_dt
+        if self.accumulator >= self.step_dt:
+            self.accumulator %= self.step_dt
+        return steps
+
+    @property
+    def alpha(self):
+        """Interpolációs arány az utolsó két szimulációs állapot között (0..1)."""
+        return self.accumulator / self.step_dt
+
+
+class TransformInterpolator:
+    """
+    Renderelési interpoláció a szimulált NodePath-ok pozíciójára.
+    A szimuláció a node-ok valódi pozícióján dolgozik; frame végén az
+    interpolált pozíciót írjuk be, a következő frame elején pedig visszaállítjuk.
+    (A forgatást nem interpoláljuk, az a legutóbbi szimulációs lépés szerinti.)
+    """
+    def __init__(self):
+        # node kulcs -> [NodePath, előző pozíció, aktuális pozíció]
+        # (A kulcsot a track-kor rögzítjük, mert removeNode után a NodePath üres lesz)
+        self.tracked = {}
+
+    def track(self, node):
+        pos = node.getPos()
+        self.tracked[node.getKey()] = [node, Point3(pos), Point3(pos)]
+
+    def untrack(self, node):
+        """removeNode előtt kell hívni."""
+        if not node.isEmpty():
+            self.tracked.pop(node.getKey(), None)
+
+    def _prune(self):
+        for key in [k for k, entry in self.tracked.items() if entry[0].isEmpty()]:
+            del self.tracked[key]
+
+    def restore(self):
+        """Szimuláció előtt: a node-ok visszakapják a valódi (nem interpolált) pozíciót."""
+        self._prune()
+        for node, prev, curr in self.tracked.values():
+            node.setPos(curr)
+
+    def capture(self):
+        """Minden szimulációs lépés után: az állapot eltolása (előző <- aktuális)."""
+        for entry in self.tracked.values():
+            if entry[0].isEmpty():
+                continue
+            entry[1] = entry[2]
+            entry[2] = entry[0].getPos()
+
+    def apply(self, alpha):
+        """Renderelés előtt: interpolált pozíció beállítása."""
+        for node, prev, curr in self.tracked.values():
+            if node.isEmpty():
+                continue
+            node.setPos(prev + (curr - prev) * alpha)
@@ -0,0 +1,146 @@
+import struct
+import time
+
+# --- Fájlformátum ---
+# [fejléc] [esemény]...
+# Fejléc: magic, verzió, seed (előjeles i64), szimulációs ráta, max lépés / frame
+# Esemény: típus (B), szimulációs lépés index (I), időbélyeg mp-ben (f) + típusfüggő adat
+MAGIC = b"RSIR"
+VERSION = 2
+HEADER = struct.Struct("<4sHqdH")
+EVENT = struct.Struct("<BIf")
+
+EV_FRAME = 0   # Frame kezdete, adat: frame dt (d)
+EV_KEY = 1     # Billentyű, adat: billentyű index (B), érték (B)
+EV_MOUSE = 2   # Egér elmozdulás, adat: dx, dy (ff)
+EV_SHOOT = 3   # Lövés, nincs adat
+
+PAYLOADS = {
+    EV_FRAME: struct.Struct("<d"),
+    EV_KEY: struct.Struct("<BB"),
+    EV_MOUSE: struct.Struct("<ff"),
+    EV_SHOOT: None,
+}
+
+# A Game.keys kulcsai rögzített sorrendben (a fájlban index szerepel)
+KEY_NAMES = ("w", "s", "a", "d", "space")
+
+
+class InputRecorder:
+    """
+    Input események rögzítése tömör bináris fájlba.
+    A frame időket is elmenti, így a visszajátszás pontosan ugyanazokat a
+    fix szimulációs lépéseket futtatja le.
+    """
+    def __init__(self, path, seed, sim_rate, max_steps, flush_size=64 * 1024):
+        self.path = path
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, seed, sim_rate, max_steps))
+        self.buffer = bytearray()
+        self.flush_size = flush_size
+        self.start_time = time.perf_counter()
+        self.event_count = 0
+
+    def _write(self, ev_type, step, *data):
+        timestamp = time.perf_counter() - self.start_time
+        self.buffer += EVENT.pack(ev_type, step, timestamp)
+        payload = PAYLOADS[ev_type]
+        if payload is not None:
+            self.buffer += payload.pack(*data)
+        self.event_count += 1
+        if len(self.buffer) >= self.flush_size:
+            self.flush()
+
+    def record_frame(self, step, frame_dt):
+        self._write(EV_FRAME, step, frame_dt)
+
+    def record_key(self, step, key, value):
+        self._write(EV_KEY, step, KEY_NAMES.index(key), 1 if value else 0)
+
+    def record_mouse(self, step, dx, dy):
+        self._write(EV_MOUSE, step, dx, dy)
+
+    def record_shoot(self, step):
+        self._write(EV_SHOOT, step)
+
+    def flush(self):
+        if self.file is not None and self.buffer:
+            self.file.write(self.buffer)
+            self.buffer.clear()
+
+    def close(self):
+        if self.file is None:
+            return
+        self.flush()
+        self.file.close()
+        self.file = None
+        print(f"Input felvétel mentve: {self.path} ({self.event_count} esemény)")
+
+
+class InputReplay:
+    """Rögzített input visszajátszása: frame-enként adja a dt-t és az eseményeket."""
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.data = f.read()
+        magic, version, self.seed, self.sim_rate, self.max_steps = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Nem input felvétel: {path}")
+        if version != VERSION:
+            raise ValueError(f"Nem támogatott felvétel verzió: {version}")
+        self.offset = HEADER.size
+        self.finished = False
+        self.frame_count = 0
+        self.pending_mouse = []
+
+    def _peek_type(self):
+        if self.offset >= len(self.data):
+            return None
+        return self.data[self.offset]
+
+    def _read(self):
+        ev_type, step, timestamp = EVENT.unpack_from(self.data, self.offset)
+        self.offset += EVENT.size
+        payload = PAYLOADS[ev_type]
+        data = ()
+        if payload is not None:
+            data = payload.unpack_from(self.data, self.offset)
+            self.offset += payload.size
+        return ev_type, step, data
+
+    def at_end(self):
+        return self.offset >= len(self.data)
+
+    def next_frame(self, step_index):
+        """A következő frame dt-je (None, ha vége a felvételnek)."""
+        if self._peek_type() != EV_FRAME:
+            self.finished = True
+            return None
+        _, step, (frame_dt,) = self._read()
+        if step != step_index:
+            # Eltérő szimulációs állapot: a felvétel nem ugyanarról a kezdőállapotról indult
+            print(f"FIGYELEM: replay eltérés (lépés {step_index}, felvételben {step})")
+        self.frame_count += 1
+        return frame_dt
+
+    def dispatch(self, game):
+        """
+        Az aktuális frame eseményeinek lejátszása ugyanazokon az utakon, mint élőben.
+        Az egér elmozdulást a kamera kéri le (pop_mouse), ugyanott, ahol élőben olvasná.
+        """
+        while True:
+            ev_type = self._peek_type()
+            if ev_type is None or ev_type == EV_FRAME:
+                return
+            ev_type, step, data = self._read()
+            if ev_type == EV_KEY:
+                game.set_key(KEY_NAMES[data[0]], bool(data[1]))
+            elif ev_type == EV_MOUSE:
+                self.pending_mouse.append(data)
+            elif ev_type == EV_SHOOT:
+                game.shoot()
+
+    def pop_mouse(self):
+        """CameraManager.mouse_source: a frame rögzített egér elmozdulása (vagy None)."""
+        if not self.pending_mouse:
+            return None
+        return self.pending_mouse.pop(0)
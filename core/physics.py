@@ -1,87 +1,145 @@
-from panda3d.core import (
-    CollisionTraverser, CollisionHandlerQueue, 
-    CollisionNode, CollisionRay, 
-    BitMask32, NodePath, Vec3
-)
+import numpy as np
+
 
 class PhysicsManager:
-    def __init__(self, base_app):
+    """
+    Kinematikus test rendszer: minden test (játékos, ellenségek, golyók) függőleges
+    sebessége, talaj állapota és magasság eltolása tömbökben van, és egyetlen
+    vektorizált lépés kezeli a gravitációt, a végsebességet és a talajra helyezést
+    a terep analitikus magasság függvénye alapján (nincs testenkénti raycast).
+    A vízszintes mozgást továbbra is a játéklogika végzi a node-okon.
+    """
+    def __init__(self, base_app, terrain=None, capacity=64):
         self.base = base_app
-        
-        # Ütközés kezelők inicializálása
-        self.cTrav = CollisionTraverser()
-        self.cQueue = CollisionHandlerQueue()
-        
+        self.terrain = terrain
+
         # Fizikai konstansok
         self.gravity = 30.0
         self.terminal_velocity = 50.0
-        self.ground_mask = BitMask32.bit(1)
         self.player_obj = None
-        
-        # ÚJ: Offset a játékos középpontja és talpa között.
+        self.player_body = None
+
+        # Offset a játékos középpontja és talpa között.
         # Mivel a kocka 2.0 egység magas és az origója középen van,
         # 1.0-val feljebb kell tolni, hogy a talpa érje a földet.
         self.player_height_offset = 1.0
 
-    def setup_collision(self, player_obj, terrain_node):
-        """
-        Beállítja a sugarat a játékoson és a maszkot a terepen.
-        """
+        # Sűrű tömbök (az első 'count' elem él), törlés swap-remove-val
+        self.count = 0
+        self.velocity = np.zeros(capacity, dtype=np.float64)
+        self.grounded = np.zeros(capacity, dtype=bool)
+        self.height_offset = np.zeros(capacity, dtype=np.float64)
+        self.gravity_scale = np.ones(capacity, dtype=np.float64)
+        self.nodes = []
+
+        # Test azonosító -> sűrű index (az azonosítók nem ismétlődnek)
+        self.index_of = {}
+        self.body_ids = []
+        self.next_body_id = 0
+
+    # --- Testek ---
+
+    def add_body(self, node, height_offset=0.0, gravity_scale=1.0, velocity=0.0):
+        """Test felvétele egy NodePath-hoz, visszaadja az azonosítóját."""
+        if self.count == len(self.velocity):
+            self._grow(len(self.velocity) * 2)
+
+        index = self.count
+        self.velocity[index] = velocity
+        self.grounded[index] = False
+        self.height_offset[index] = height_offset
+        self.gravity_scale[index] = gravity_scale
+        self.nodes.append(node)
+
+        body = self.next_body_id
+        self.next_body_id += 1
+        self.index_of[body] = index
+        self.body_ids.append(body)
+        self.count += 1
+        return body
+
+    def remove_body(self, body):
+        """Test törlése (az utolsó test a helyére kerül). Már törölt testre nem csinál semmit."""
+        index = self.index_of.pop(body, None)
+        if index is None:
+            return
+        last = self.count - 1
+        if index != last:
+            self.velocity[index] = self.velocity[last]
+            self.grounded[index] = self.grounded[last]
+            self.height_offset[index] = self.height_offset[last]
+            self.gravity_scale[index] = self.gravity_scale[last]
+            self.nodes[index] = self.nodes[last]
+            moved = self.body_ids[last]
+            self.body_ids[index] = moved
+            self.index_of[moved] = index
+        self.nodes.pop()
+        self.body_ids.pop()
+        self.count -= 1
+
+    def is_grounded(self, body):
+        index = self.index_of.get(body)
+        return index is not None and bool(self.grounded[index])
+
+    def get_velocity(self, body):
+        index = self.index_of.get(body)
+        return 0.0 if index is None else float(self.velocity[index])
+
+    def set_velocity(self, body, velocity):
+        index = self.index_of.get(body)
+        if index is not None:
+            self.velocity[index] = velocity
+
+    def _grow(self, capacity):
+        for name in ("velocity", "grounded", "height_offset", "gravity_scale"):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    # --- Játékos ---
+
+    def setup_collision(self, player_obj, terrain=None):
+        """A játékos felvétele testként (a Player attribútumai lépésenként frissülnek)."""
+        if terrain is not None:
+            self.terrain = terrain
         self.player_obj = player_obj
-        
-        # A sugarat magasabbról (Z=50) indítjuk, hogy meredek lejtőn se kerüljön föld alá a kezdőpont
-        ray = CollisionRay()
-        ray.setOrigin(0, 0, 50) 
-        ray.setDirection(0, 0, -1)
-        
-        c_node = CollisionNode('player_ray')
-        c_node.addSolid(ray)
-        
-        c_node.setFromCollideMask(self.ground_mask)
-        c_node.setIntoCollideMask(BitMask32.allOff())
-        
-        self.c_np = self.player_obj.node.attachNewNode(c_node)
-        self.cTrav.addCollider(self.c_np, self.cQueue)
+        self.player_body = self.add_body(player_obj.node, self.player_height_offset,
+                                         velocity=player_obj.vertical_velocity)
+
+    # --- Lépés ---
 
     def update_physics(self, dt):
-        if not self.player_obj:
+        n = self.count
+        if n == 0 or self.terrain is None:
             return
 
-        # 1. Gravitáció alkalmazása
-        self.player_obj.vertical_velocity -= self.gravity * dt
-        
-        if self.player_obj.vertical_velocity < -self.terminal_velocity:
-            self.player_obj.vertical_velocity = -self.terminal_velocity
-
-        # 2. Becsült új pozíció
-        current_pos = self.player_obj.node.getPos()
-        new_z = current_pos.z + self.player_obj.vertical_velocity * dt
-        
-        # 3. Ütközésvizsgálat
-        self.cTrav.traverse(self.base.render)
-        
-        if self.cQueue.getNumEntries() > 0:
-            self.cQueue.sortEntries()
-            entry = self.cQueue.getEntry(0)
-            
-            ground_point = entry.getSurfacePoint(self.base.render)
-            ground_z = ground_point.z
-            
-            # JAVÍTOTT LOGIKA:
-            # Nem a nyers ground_z-hez hasonlítunk, hanem hozzáadjuk az offsetet.
-            # Így a "target_z" az a magasság, ahol a játékos KÖZEPÉNEK kell lennie ahhoz,
-            # hogy a TALPA a földön legyen.
-            target_z = ground_z + self.player_height_offset
-            
-            # Ha a tervezett új pozíció lejjebb van, mint a cél magasság...
-            if new_z <= target_z:
-                new_z = target_z # ...akkor felemeljük a helyes szintre
-                self.player_obj.vertical_velocity = 0
-                self.player_obj.is_grounded = True
-            else:
-                self.player_obj.is_grounded = False
-        else:
-            self.player_obj.is_grounded = False
-            
-        # 4. Pozíció frissítése
-        self.player_obj.node.setZ(new_z)
\ No newline at end of file
+        if self.player_obj is not None:
+            # A játéklogika (pl. ugrás) a Player attribútumát írja
+            self.set_velocity(self.player_body, self.player_obj.vertical_velocity)
+
+        # 1. Pozíciók kigyűjtése
+        positions = np.array([tuple(node.getPos()) for node in self.nodes], dtype=np.float64)
+        x, y, z = positions[:, 0], positions[:, 1], positions[:, 2]
+
+        # 2. Gravitáció és végsebesség
+        velocity = self.velocity[:n]
+        velocity -= self.gravity * self.gravity_scale[:n] * dt
+        np.maximum(velocity, -self.terminal_velocity, out=velocity)
+        new_z = z + velocity * dt
+
+        # 3. Talaj: ha a tervezett pozíció a talpmagasság alá kerülne, felemeljük
+        target_z = self.terrain.get_height_array(x, y) + self.height_offset[:n]
+        landed = new_z <= target_z
+        new_z = np.where(landed, target_z, new_z)
+        velocity[landed] = 0.0
+        self.grounded[:n] = landed
+
+        # 4. Visszaírás
+        for node, value in zip(self.nodes, new_z.tolist()):
+            node.setZ(value)
+
+        if self.player_obj is not None:
+            index = self.index_of[self.player_body]
+            self.player_obj.vertical_velocity = float(velocity[index])
+            self.player_obj.is_grounded = bool(landed[index])
@@ -0,0 +1,232 @@
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import deque, Counter
+
+ROOT_STAGE = "frame"
+
+
+class StackSampler:
+    """
+    Alacsony költségű mintavételező profiler egy külön szálon.
+    A fő szál hívási láncát 'interval' másodpercenként lekérdezi, és az aktuális
+    game loop szakasszal (stage) együtt tárolja, flamegraph (collapsed stack) formátumhoz.
+    """
+    def __init__(self, capture, interval=0.002, max_samples=None):
+        self.capture = capture
+        self.interval = interval
+        self.samples = deque(maxlen=max_samples)   # (frame index, collapsed stack)
+        self.thread_id = threading.main_thread().ident
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="StackSampler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def _run(self):
+        while self.running:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.reverse()
+                # A szakaszokat külön "keretként" a stack elejére tesszük
+                stages = [f"[{name}]" for name in self.capture.stage_stack]
+                self.samples.append((self.capture.frame_index, ";".join(stages + stack)))
+            time.sleep(self.interval)
+
+    def collapsed(self, first_frame=0):
+        """Összesített minták: {collapsed stack: darab}."""
+        return Counter(stack for frame, stack in list(self.samples) if frame >= first_frame)
+
+
+class ProfileCapture:
+    """
+    Igény szerinti profil felvétel a következő N frame-re (hotkey), szakaszonként
+    külön cProfile-lal, plusz opcionális gyűrűpuffer, ami a lassú frame-eket
+    automatikusan elmenti.
+    """
+    def __init__(self, frame_profiler, output_dir="profiles", frames=120,
+                 ring_seconds=3.0, spike_threshold_ms=50.0, sample_interval=0.002):
+        self.profiler = frame_profiler
+        self.output_dir = output_dir
+        self.capture_frames = frames
+        self.ring_seconds = ring_seconds
+        self.spike_threshold_ms = spike_threshold_ms
+        self.sample_interval = sample_interval
+
+        self.frame_index = 0
+        self.stage_stack = []
+        self.frame_stage_ms = {}     # Aktuális frame szakaszidői
+
+        # Hotkey-es felvétel állapota
+        self.capturing = False
+        self.frames_left = 0
+        self.first_frame = 0
+        self.stage_profiles = {}     # szakasz -> cProfile.Profile
+        self.frame_rows = []         # (frame index, frame ms, {szakasz: ms})
+        self.sampler = None
+
+        # Gyűrűpuffer (automatikus spike mentés)
+        self.ring_enabled = False
+        self.ring_sampler = None
+        self.ring_frames = deque()   # (frame index, időpont, frame ms, {szakasz: ms})
+        self.spike_cooldown_until = 0.0
+
+    # --- Vezérlés (hotkey-ek) ---
+
+    def start_capture(self):
+        if self.capturing:
+            return
+        print(f"Profil felvétel indul: {self.capture_frames} frame")
+        self.capturing = True
+        self.frames_left = self.capture_frames
+        self.first_frame = self.frame_index
+        self.stage_profiles = {}
+        self.frame_rows = []
+        self.stage_stack = [ROOT_STAGE]
+        self._attach()
+        self.sampler = StackSampler(self, self.sample_interval)
+        self.sampler.start()
+        self._profile_for(ROOT_STAGE).enable()
+
+    def toggle_ring(self):
+        self.ring_enabled = not self.ring_enabled
+        if self.ring_enabled:
+            self._attach()
+            max_samples = int(self.ring_seconds / self.sample_interval)
+            self.ring_sampler = StackSampler(self, self.sample_interval, max_samples)
+            self.ring_sampler.start()
+            print(f"Spike figyelés bekapcsolva (> {self.spike_threshold_ms:.0f} ms)")
+        else:
+            self.ring_sampler.stop()
+            self.ring_sampler = None
+            self.ring_frames.clear()
+            self._detach()
+            print("Spike figyelés kikapcsolva")
+
+    def _attach(self):
+        self.profiler.capture = self
+
+    def _detach(self):
+        if not self.capturing and not self.ring_enabled:
+            self.profiler.capture = None
+
+    # --- FrameProfiler hookok ---
+
+    def _profile_for(self, stage):
+        profile = self.stage_profiles.get(stage)
+        if profile is None:
+            profile = cProfile.Profile()
+            self.stage_profiles[stage] = profile
+        return profile
+
+    def enter_stage(self, name):
+        if self.capturing and self.stage_stack:
+            self._profile_for(self.stage_stack[-1]).disable()
+        self.stage_stack.append(name)
+        if self.capturing:
+            self._profile_for(name).enable()
+
+    def exit_stage(self, name, elapsed_ms):
+        if self.capturing:
+            self._profile_for(name).disable()
+        if self.stage_stack and self.stage_stack[-1] == name:
+            self.stage_stack.pop()
+        if self.capturing and self.stage_stack:
+            self._profile_for(self.stage_stack[-1]).enable()
+        self.frame_stage_ms[name] = self.frame_stage_ms.get(name, 0.0) + elapsed_ms
+
+    def end_frame(self, frame_ms):
+        """A Game hívja minden frame végén (frame_ms: a frame teljes ideje)."""
+        stage_ms = self.frame_stage_ms
+        self.frame_stage_ms = {}
+
+        if self.capturing:
+            self.frame_rows.append((self.frame_index, frame_ms, stage_ms))
+            self.frames_left -= 1
+            if self.frames_left <= 0:
+                self._finish_capture()
+
+        if self.ring_enabled:
+            now = time.perf_counter()
+            self.ring_frames.append((self.frame_index, now, frame_ms, stage_ms))
+            while self.ring_frames and now - self.ring_frames[0][1] > self.ring_seconds:
+                self.ring_frames.popleft()
+            if frame_ms > self.spike_threshold_ms and now >= self.spike_cooldown_until:
+                self._dump_spike(frame_ms)
+                self.spike_cooldown_until = now + self.ring_seconds
+
+        self.frame_index += 1
+
+    # --- Mentés ---
+
+    def _new_dir(self, prefix):
+        path = os.path.join(self.output_dir, f"{prefix}_{time.strftime('%Y%m%d_%H%M%S')}")
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def _finish_capture(self):
+        self._profile_for(ROOT_STAGE).disable()
+        self.sampler.stop()
+        self.capturing = False
+        self.stage_stack = []
+        self._detach()
+
+        path = self._new_dir("capture")
+        combined = None
+        for stage, profile in self.stage_profiles.items():
+            stats = pstats.Stats(profile)
+            stats.dump_stats(os.path.join(path, f"{stage}.pstats"))
+            if combined is None:
+                combined = pstats.Stats(profile)
+            else:
+                combined.add(profile)
+        if combined is not None:
+            combined.dump_stats(os.path.join(path, "all.pstats"))
+        self._write_collapsed(os.path.join(path, "stacks.collapsed"),
+                              self.sampler.collapsed(self.first_frame))
+        self._write_frames(os.path.join(path, "frames.csv"), self.frame_rows)
+        self.sampler = None
+        self.stage_profiles = {}
+        print(f"Profil felvétel mentve: {path}")
+
+    def _dump_spike(self, frame_ms):
+        path = self._new_dir("spike")
+        first_frame = self.ring_frames[0][0] if self.ring_frames else 0
+        self._write_collapsed(os.path.join(path, "stacks.collapsed"),
+                              self.ring_sampler.collapsed(first_frame))
+        rows = [(index, ms, stages) for index, _, ms, stages in self.ring_frames]
+        self._write_frames(os.path.join(path, "frames.csv"), rows)
+        print(f"Lassú frame ({frame_ms:.1f} ms), utolsó {self.ring_seconds:.0f} mp mentve: {path}")
+
+    @staticmethod
+    def _write_collapsed(path, counts):
+        with open(path, "w") as f:
+            for stack, count in counts.most_common():
+                f.write(f"{stack} {count}\n")
+
+    @staticmethod
+    def _write_frames(path, rows):
+        stages = sorted({name for _, _, stage_ms in rows for name in stage_ms})
+        with open(path, "w") as f:
+            f.write(",".join(["frame", "frame_ms"] + stages) + "\n")
+            for index, frame_ms, stage_ms in rows:
+                values = [f"{stage_ms.get(name, 0.0):.3f}" for name in stages]
+                f.write(",".join([str(index), f"{frame_ms:.3f}"] + values) + "\n")
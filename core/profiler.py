@@ -0,0 +1,174 @@
+import csv
+import json
+import time
+from collections import deque
+from panda3d.core import PStatClient, PStatCollector
+
+
+class _NullScope:
+    """Kikapcsolt profiler esetén: semmit nem csinál."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SCOPE = _NullScope()
+
+
+class _Scope:
+    """Egy mért szakasz (with blokk)."""
+    __slots__ = ("profiler", "name", "collector", "capture", "start")
+
+    def __init__(self, profiler, name, collector):
+        self.profiler = profiler
+        self.name = name
+        self.collector = collector
+        self.capture = profiler.capture
+
+    def __enter__(self):
+        if self.collector is not None:
+            self.collector.start()
+        if self.capture is not None:
+            self.capture.enter_stage(self.name)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        if self.capture is not None:
+            self.capture.exit_stage(self.name, elapsed * 1000.0)
+        if self.collector is not None:
+            self.collector.stop()
+        if self.profiler.enabled:
+            self.profiler.record(self.name, elapsed * 1000.0)
+        return False
+
+
+class FrameProfiler:
+    """
+    Szakaszonkénti frame idő mérés.
+    Minden szakasz utolsó 'history' mintáját tartja (ms), ebből számol p50/p95/p99-et.
+    Ha a PStats kliens csatlakozva van, a szakaszokat PStatCollector-okba is jelenti.
+    """
+    def __init__(self, history=600):
+        self.history = history
+        self.enabled = False          # Saját mintagyűjtés (overlay / export)
+        self.samples = {}             # szakasz neve -> deque[ms]
+        self.collectors = {}          # szakasz neve -> PStatCollector
+        # Aktív ProfileCapture (cProfile / mintavételezés szakaszonként), ha van
+        self.capture = None
+
+    def scope(self, name):
+        """Context manager egy szakasz méréséhez: with profiler.scope("physics"): ..."""
+        pstats = PStatClient.isConnected()
+        if not self.enabled and not pstats and self.capture is None:
+            return _NULL_SCOPE
+        collector = None
+        if pstats:
+            collector = self.collectors.get(name)
+            if collector is None:
+                collector = PStatCollector("Game:" + name)
+                self.collectors[name] = collector
+        return _Scope(self, name, collector)
+
+    def record(self, name, ms):
+        bucket = self.samples.get(name)
+        if bucket is None:
+            bucket = deque(maxlen=self.history)
+            self.samples[name] = bucket
+        bucket.append(ms)
+
+    def reset(self):
+        self.samples.clear()
+
+    def percentiles(self, name, points=(50, 95, 99)):
+        """A szakasz mintáinak percentilisei (ms), üres mintánál nullák."""
+        data = sorted(self.samples.get(name, ()))
+        if not data:
+            return tuple(0.0 for _ in points)
+        last = len(data) - 1
+        return tuple(data[min(last, int(round(p / 100.0 * last)))] for p in points)
+
+    def summary(self):
+        """Szakaszonkénti statisztika: {név: {count, mean, p50, p95, p99, max}}."""
+        result = {}
+        for name, bucket in self.samples.items():
+            if not bucket:
+                continue
+            p50, p95, p99 = self.percentiles(name)
+            result[name] = {
+                "count": len(bucket),
+                "mean": sum(bucket) / len(bucket),
+                "p50": p50,
+                "p95": p95,
+                "p99": p99,
+                "max": max(bucket),
+            }
+        return result
+
+    def report_lines(self):
+        lines = [f"{'stage':<16}{'p50':>8}{'p95':>8}{'p99':>8}  ms"]
+        for name, stats in sorted(self.summary().items()):
+            lines.append(f"{name:<16}{stats['p50']:>8.2f}{stats['p95']:>8.2f}{stats['p99']:>8.2f}")
+        return lines
+
+    def export_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def export_csv(self, path):
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["stage", "count", "mean", "p50", "p95", "p99", "max"])
+            for name, stats in sorted(self.summary().items()):
+                writer.writerow([name, stats["count"], f"{stats['mean']:.4f}",
+                                 f"{stats['p50']:.4f}", f"{stats['p95']:.4f}",
+                                 f"{stats['p99']:.4f}", f"{stats['max']:.4f}"])
+
+
+# Közös példány: a Game, az EnemyAI és a terep generátor is ezt használja
+profiler = FrameProfiler()
+
+
+class ProfilerOverlay:
+    """Kapcsolható OnscreenText kijelző a profiler statisztikáihoz."""
+    def __init__(self, base_app, frame_profiler, refresh_interval=0.25):
+        from direct.gui.OnscreenText import OnscreenText
+        self.base = base_app
+        self.profiler = frame_profiler
+        self.refresh_interval = refresh_interval
+        self.last_refresh = 0.0
+        self.visible = False
+        self.text = OnscreenText(text="", pos=(0.35, 0.9), scale=0.04, align=0,
+                                 fg=(0.8, 1, 0.8, 1), bg=(0, 0, 0, 0.5),
+                                 mayChange=True)
+        self.text.hide()
+
+    def toggle(self):
+        self.visible = not self.visible
+        self.profiler.enabled = self.visible
+        if self.visible:
+            self.profiler.reset()
+            self.text.show()
+        else:
+            self.text.hide()
+
+    def update(self):
+        if not self.visible:
+            return
+        now = time.perf_counter()
+        if now - self.last_refresh < self.refresh_interval:
+            return
+        self.last_refresh = now
+        self.text.setText("\n".join(self.profiler.report_lines()))
+
+    def export(self, prefix="profile"):
+        """CSV és JSON export időbélyeges fájlnévvel."""
+        stamp = time.strftime("%Y%m%d_%H%M%S")
+        self.profiler.export_csv(f"{prefix}_{stamp}.csv")
+        self.profiler.export_json(f"{prefix}_{stamp}.json")
+        print(f"Profil exportálva: {prefix}_{stamp}.csv/.json")
@@ -3,12 +3,14 @@ from panda3d.core import (
     BitMask32, CollisionHandlerQueue
 )
 
+from core.entity_registry import ENTITY_BULLET
+
 # Maszkok importálása vagy definíciója (hogy tudjuk mivel ütközünk)
 MASK_TERRAIN = BitMask32.bit(1)
 MASK_ENEMY = BitMask32.bit(3) # ÚJ: Az ellenség maszkja
 
 class Projectile:
-    def __init__(self, base_app, start_pos, direction_quat, speed=100.0):
+    def __init__(self, base_app, start_pos, direction_quat, speed=100.0, gravity_scale=0.15):
         self.base = base_app
         self.speed = speed
         self.lifetime = 3.0 # Hány másodpercig él a golyó
@@ -47,8 +49,14 @@ class Projectile:
         # (Ezt majd a main.py-ban hozzuk létre 'self.bulletTrav' néven)
         self.base.bulletTrav.addCollider(self.c_np, self.cQueue)
         
-        # Tag, hogy a golyó tudja magáról, ki ő (opcionális)
-        self.node.setPythonTag("owner", self)
+        # Render interpoláció a fix lépésű szimulációhoz
+        self.base.interpolator.track(self.node)
+
+        # Fizika: enyhe gravitáció, a talajt a PhysicsManager jelzi (grounded)
+        self.body = self.base.physics.add_body(self.node, gravity_scale=gravity_scale)
+
+        # Nyilvántartás (a Game a típus listáján iterál)
+        self.handle = self.base.entities.spawn(ENTITY_BULLET, self)
 
     def update(self, dt):
         if not self.alive: return
@@ -58,7 +66,7 @@ class Projectile:
         
         # Élettartam csökkentése
         self.lifetime -= dt
-        if self.lifetime <= 0:
+        if self.lifetime <= 0 or self.base.physics.is_grounded(self.body):
             self.destroy()
             return
 
@@ -66,24 +74,26 @@ class Projectile:
         if self.cQueue.getNumEntries() > 0:
             self.cQueue.sortEntries()
             entry = self.cQueue.getEntry(0)
-            hit_node = entry.getIntoNode()
-            hit_path = entry.getIntoNodePath()
+            into_mask = entry.getIntoNode().getIntoCollideMask()
             
             # Ha ellenséget találtunk
-            if hit_node.getName() == "enemy_hitbox":
-                # Lekérjük az ellenség objektumot a tag-ből
-                enemy = hit_path.getPythonTag("owner")
+            if not (into_mask & MASK_ENEMY).isZero():
+                # Az ellenség objektumot a nyilvántartásból kérjük le a hitbox node alapján
+                enemy = self.base.entities.from_collider(entry.getIntoNodePath())
                 if enemy:
                     print("Találat!")
                     enemy.take_damage()
                 self.destroy() # A golyó megsemmisül
                 
             # Ha terepet találtunk (falat)
-            elif hit_node.getName() == "chunk_node" or hit_path.hasNetTag("terrain"):
+            elif not (into_mask & MASK_TERRAIN).isZero():
                  self.destroy()
 
     def destroy(self):
         if self.alive:
             self.alive = False
+            self.base.entities.despawn(self.handle)
+            self.base.physics.remove_body(self.body)
             self.base.bulletTrav.removeCollider(self.c_np)
+            self.base.interpolator.untrack(self.node)
             self.node.removeNode()
\ No newline at end of file
@@ -0,0 +1,59 @@
+import json
+import time
+
+
+class _Phase:
+    __slots__ = ("trace", "name", "start")
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        self.trace.phases.append((self.name, self.start - self.trace.origin, end - self.start))
+        return False
+
+
+class StartupTrace:
+    """
+    Indítási idővonal: fázisok (név, kezdet, hossz) és mérföldkövek
+    (pl. first_frame, playable), mind a folyamat indulásához képest másodpercben.
+    """
+    def __init__(self, origin=None):
+        self.origin = time.perf_counter() if origin is None else origin
+        self.phases = []
+        self.marks = {}
+
+    def phase(self, name):
+        """with trace.phase("terrain"): ..."""
+        return _Phase(self, name)
+
+    def mark(self, name):
+        if name not in self.marks:
+            self.marks[name] = time.perf_counter() - self.origin
+
+    def as_dict(self):
+        return {
+            "time_to_first_frame": self.marks.get("first_frame"),
+            "time_to_playable": self.marks.get("playable"),
+            "marks": self.marks,
+            "phases": [{"name": name, "start": start, "duration": duration}
+                       for name, start, duration in self.phases],
+        }
+
+    def report_lines(self):
+        lines = [f"{'phase':<16}{'start':>9}{'ms':>9}"]
+        for name, start, duration in self.phases:
+            lines.append(f"{name:<16}{start * 1000.0:>9.1f}{duration * 1000.0:>9.1f}")
+        for name, t in sorted(self.marks.items(), key=lambda item: item[1]):
+            lines.append(f"{'@' + name:<16}{t * 1000.0:>9.1f}")
+        return lines
+
+    def export_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.as_dict(), f, indent=2)
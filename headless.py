@@ -0,0 +1,186 @@
+"""
+Ablak nélküli (headless) szimuláció terheléses teszthez.
+Ugyanazokat a Game rendszereket futtatja (terep, fizika, lövedékek, AI),
+csak 'window-type none' módban, determinisztikus frame idővel.
+
+Példa:
+    python headless.py --enemies 60 --fire-rate 8 --path figure8 --duration 30
+
+Egy futás rögzíthető, majd pontosan visszajátszható (összehasonlító méréshez):
+    python headless.py --enemies 60 --fire-rate 8 --record fight.rir
+    python headless.py --enemies 60 --replay fight.rir
+"""
+import argparse
+import math
+import time
+
+from panda3d.core import loadPrcFileData, ClockObject
+
+# A Game importálása ELŐTT kell beállítani, különben megnyílik az ablak
+loadPrcFileData("headless", "window-type none\naudio-library-name null")
+
+from main import Game
+from core.profiler import profiler
+from core.input_recorder import InputReplay
+from core.entity_registry import ENTITY_BULLET
+
+# --- Szkriptelt játékos útvonalak: t (mp) -> cél pont (x, y) ---
+
+def path_idle(t, radius):
+    return 0.0, 0.0
+
+def path_line(t, radius):
+    # Oda-vissza egy egyenes mentén
+    phase = (t * 0.05) % 2.0
+    offset = phase if phase <= 1.0 else 2.0 - phase
+    return 0.0, (offset * 2.0 - 1.0) * radius
+
+def path_circle(t, radius):
+    angle = t * 0.25
+    return math.cos(angle) * radius, math.sin(angle) * radius
+
+def path_figure8(t, radius):
+    angle = t * 0.2
+    return math.sin(angle) * radius, math.sin(angle) * math.cos(angle) * radius
+
+PATHS = {
+    "idle": path_idle,
+    "line": path_line,
+    "circle": path_circle,
+    "figure8": path_figure8,
+}
+
+
+class HeadlessRunner:
+    """A Game léptetése fix frame idővel, szkriptelt inputtal."""
+    def __init__(self, args):
+        self.args = args
+        self.replay = InputReplay(args.replay) if args.replay else None
+        self.game = Game(sim_rate=args.sim_rate, seed=args.seed,
+                         record_path=args.record, replay=self.replay)
+        # Az indítási fázisok (terep, modellek, világ) lefuttatása a mérés előtt
+        self.game.finish_startup()
+
+        # Determinisztikus frame idő: a szimuláció nem függ a gép sebességétől
+        clock = ClockObject.getGlobalClock()
+        clock.setMode(ClockObject.MNonRealTime)
+        clock.setFrameRate(args.frame_rate)
+
+        self.path = PATHS[args.path]
+        self.fire_interval = 1.0 / args.fire_rate if args.fire_rate > 0 else None
+        self.next_shot = 0.0
+        self.time = 0.0
+        if self.replay is None:
+            # A szkriptelt fordulás ugyanazon az úton megy, mint az élő egér (felvehető)
+            self.game.cam_manager.mouse_source = self.scripted_mouse
+
+        if args.enemies > 0:
+            spawned = self.game.enemy_spawner.spawn_around(
+                self.game.player.get_pos(), args.enemies, radius=args.radius)
+            print(f"Extra ellenségek: {spawned}")
+
+        # Minden frame mintát megtartunk a végső statisztikához
+        # (visszajátszásnál a felvétel hossza nem ismert előre: max. egy óra)
+        if self.replay is None:
+            profiler.history = int(args.duration * args.frame_rate) + 1
+        else:
+            profiler.history = int(3600 * args.frame_rate)
+        profiler.reset()
+        profiler.enabled = True
+
+    def target_offset(self):
+        target_x, target_y = self.path(self.time, self.args.radius)
+        pos = self.game.player.get_pos()
+        return target_x - pos.x, target_y - pos.y
+
+    def drive_player(self):
+        """A játékos a kamera irányában halad (W), amíg el nem éri az útvonal pontját."""
+        dx, dy = self.target_offset()
+        moving = dx * dx + dy * dy >= 1.0
+        if self.game.keys["w"] != moving:
+            self.game.set_key("w", moving)
+
+    def scripted_mouse(self):
+        """CameraManager.mouse_source: vízszintes 'egér' elmozdulás az útvonal irányába."""
+        dx, dy = self.target_offset()
+        if dx * dx + dy * dy < 1.0:
+            return None
+        cam = self.game.cam_manager
+        turn = (cam.get_heading() - math.degrees(math.atan2(-dx, dy)) + 180.0) % 360.0 - 180.0
+        if abs(turn) < 0.01:
+            return None
+        return turn / cam.sensitivity, 0.0
+
+    def run(self):
+        frame_dt = 1.0 / self.args.frame_rate
+        frames = 0
+        wall_start = time.perf_counter()
+
+        while not self.finished(frames):
+            if self.replay is None:
+                self.drive_player()
+                if self.fire_interval is not None and self.time >= self.next_shot:
+                    self.game.shoot()
+                    self.next_shot += self.fire_interval
+
+            start = time.perf_counter()
+            self.game.taskMgr.step()
+            profiler.record("frame_wall", (time.perf_counter() - start) * 1000.0)
+            self.time += frame_dt
+            frames += 1
+
+        if self.game.input_recorder:
+            self.game.input_recorder.close()
+        self.report(frames, time.perf_counter() - wall_start)
+
+    def finished(self, frames):
+        if self.replay is not None:
+            # Ne fusson élő (valós dt-s) frame a felvétel után
+            return self.replay.at_end()
+        return frames >= int(self.args.duration * self.args.frame_rate)
+
+    def report(self, frames, wall_time):
+        spawner = self.game.enemy_spawner
+        print()
+        print("\n".join(self.game.startup_trace.report_lines()))
+        print()
+        print(f"Frames: {frames} | sim steps: {self.game.sim_clock.step_index} "
+              f"| wall: {wall_time:.2f} s ({frames / max(wall_time, 1e-9):.1f} fps)")
+        print(f"Enemies active: {spawner.active_count()} | suspended: {spawner.suspended_count()} "
+              f"| bullets: {self.game.entities.count(ENTITY_BULLET)} | chunks: {len(self.game.terrain.active_chunks)}")
+        print()
+        pos = self.game.player.get_pos()
+        print(f"Player: ({pos.x:.3f}, {pos.y:.3f}, {pos.z:.3f}) | heading: {self.game.cam_manager.get_heading():.3f}")
+        print()
+        print("\n".join(profiler.report_lines()))
+        if self.args.export:
+            profiler.export_csv(self.args.export + ".csv")
+            profiler.export_json(self.args.export + ".json")
+            print(f"Exportálva: {self.args.export}.csv/.json")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Headless szimuláció / terheléses teszt")
+    parser.add_argument("--enemies", type=int, default=0,
+                        help="Extra ellenségek a kezdőpont körül (a chunk populáción felül)")
+    parser.add_argument("--fire-rate", type=float, default=0.0, help="Lövés / másodperc")
+    parser.add_argument("--path", choices=sorted(PATHS), default="circle",
+                        help="Szkriptelt játékos útvonal")
+    parser.add_argument("--radius", type=float, default=60.0, help="Útvonal / spawn sugár")
+    parser.add_argument("--duration", type=float, default=20.0, help="Szimulált idő (mp)")
+    parser.add_argument("--frame-rate", type=float, default=60.0, help="Szimulált frame ráta")
+    parser.add_argument("--sim-rate", type=float, default=None, help="Szimulációs ráta (Hz)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--export", default=None, help="CSV/JSON export fájlnév előtag")
+    parser.add_argument("--record", metavar="FILE", help="A futás inputjának felvétele")
+    parser.add_argument("--replay", metavar="FILE",
+                        help="Felvétel visszajátszása (seed és sim-rate a fájlból)")
+    args = parser.parse_args(argv)
+    # A felvétel fejlécében előjeles 64 bites egész
+    if not -2 ** 63 <= args.seed < 2 ** 63:
+        parser.error("--seed must fit in a signed 64-bit integer")
+    return args
+
+
+if __name__ == "__main__":
+    HeadlessRunner(parse_args()).run()
@@ -1,6 +1,30 @@
+import time
+# Az indítási idővonal origója: minden import előtt
+STARTUP_ORIGIN = time.perf_counter()
+
+import os
 import sys
 from direct.showbase.ShowBase import ShowBase
-from panda3d.core import AmbientLight, DirectionalLight, Vec3, CollisionTraverser
+from panda3d.core import (
+    AmbientLight, DirectionalLight, Vec3, CollisionTraverser,
+    ConfigVariableDouble, ConfigVariableInt, ConfigVariableBool, loadPrcFile
+)
+
+# Projekt szintű beállítások (pl. szimulációs ráta)
+if os.path.exists("config.prc"):
+    loadPrcFile("config.prc")
+
+# Szimuláció: fix lépésköz, a frame rátától függetlenül
+SIM_RATE = ConfigVariableDouble("sim-rate", 60.0, "Szimulációs lépések másodpercenként")
+SIM_MAX_STEPS = ConfigVariableInt("sim-max-steps", 5, "Max. szimulációs lépés egy frame-ben")
+
+# Profil felvétel (F9: következő N frame, F10: automatikus spike mentés)
+PROFILE_CAPTURE_FRAMES = ConfigVariableInt("profile-capture-frames", 120, "Felvett frame-ek száma")
+PROFILE_SPIKE_MS = ConfigVariableDouble("profile-spike-ms", 50.0, "Ennél lassabb frame-et menti")
+
+# Indítás: ennyi chunk generálódik frame-enként, és kiírjuk-e az indítási idővonalat
+STARTUP_CHUNK_BUDGET = 3
+STARTUP_TRACE_PRINT = ConfigVariableBool("startup-trace-print", False, "Indítási idővonal kiírása")
 
 # --- Modulok ---
 try:
@@ -8,58 +32,176 @@ try:
     from core.player import Player
     from core.camera_manager import CameraManager
     from core.physics import PhysicsManager
-    from core.enemy_ai import EnemyAI
+    from core.enemy_ai import LOD_NAMES, LOD_DEBUG_COLORS, ENEMY_MODEL_PATH
+    from core.enemy_spawner import EnemySpawner
     # ÚJ: Importáljuk a lövedéket
     from core.projectile import Projectile
+    from core.fixed_timestep import FixedTimestep, TransformInterpolator
+    from core.profiler import profiler, ProfilerOverlay
+    from core.startup_trace import StartupTrace
+    from core.entity_registry import EntityRegistry, ENTITY_PLAYER, ENTITY_BULLET
 
 except ImportError as e:
     print(f"HIBA: {e}"); sys.exit()
 
 class Game(ShowBase):
-    def __init__(self):
-        super().__init__()
+    def __init__(self, sim_rate=None, seed=42, record_path=None, replay=None,
+                 startup_trace=None):
+        # Indítási idővonal (a folyamat indulásától mérve)
+        self.startup_trace = startup_trace or StartupTrace(STARTUP_ORIGIN)
+        with self.startup_trace.phase("showbase"):
+            super().__init__()
         self.disableMouse()
+
+        # Visszajátszásnál a felvétel határozza meg a seedet és a szimulációs rátát
+        self.input_replay = replay
+        if replay is not None:
+            seed = replay.seed
+            sim_rate = replay.sim_rate
+        self.seed = seed
+        self.record_path = record_path
+
+        # Ablak nélküli futásnál (window-type none) nincs kamera: egy üres node helyettesíti,
+        # hogy a kamera követés és a lövés iránya ugyanúgy működjön
+        self.headless = self.win is None
+        if self.camera is None:
+            self.camera = self.render.attachNewNode("camera")
+
+        # Fix lépésű szimulációs óra és render interpoláció
+        self.sim_clock = FixedTimestep(sim_rate or SIM_RATE.getValue(), SIM_MAX_STEPS.getValue())
+        if replay is not None:
+            self.sim_clock.max_steps = replay.max_steps
+        self.interpolator = TransformInterpolator()
+        # Minden játékbeli entitás (játékos, ellenségek, golyók) központi nyilvántartása
+        self.entities = EntityRegistry()
         
-        # Környezet és Terep
+        # Környezet (azonnal), minden más fokozatosan, az első frame után töltődik be
         self.setup_environment()
-        self.setup_terrain()
+        from direct.gui.OnscreenText import OnscreenText
+        self.loading_text = OnscreenText(text="Betöltés...", pos=(0, 0), scale=0.07,
+                                         fg=(1, 1, 1, 1), mayChange=True)
+        self.is_playable = False
+        self.startup_progress = 0.0
+        self.startup = self.startup_stages()
+        self.taskMgr.add(self.startup_task, "startup")
+
+    def startup_task(self, task):
+        """Frame-enként egy indítási lépés, hogy közben a betöltő képernyő frissüljön."""
+        # A task az igLoop előtt fut: az első hívásnál még semmi sem rajzolódott ki,
+        # a második előtt viszont már igen (a betöltő felirattal)
+        if task.frame == 1:
+            self.startup_trace.mark("first_frame")
+        try:
+            label = next(self.startup)
+        except StopIteration:
+            return task.done
+        self.loading_text.setText(f"Betöltés... {int(self.startup_progress * 100)}%\n{label}")
+        return task.cont
+
+    def finish_startup(self):
+        """Az indítás végigfuttatása (headless / tesztek: nem kell frame-eket várni)."""
+        while not self.is_playable:
+            self.taskMgr.step()
 
+    def startup_stages(self):
+        """Az indítás fázisai; minden yield után kirajzolódik egy frame (progress, felirat)."""
+        trace = self.startup_trace
+
+        # 1. Eszközök: modellek aszinkron betöltése a háttérben
+        with trace.phase("assets"):
+            self.enemy_model = None
+            self.enemy_model_loaded = False   # A callback lefutott (a modell lehet None: hiba)
+            self.loader.loadModel(ENEMY_MODEL_PATH, callback=self.on_enemy_model_loaded)
+            # A golyó modelljét csak a cache-be töltjük (az első lövés ne akadjon)
+            self.loader.loadModel("models/misc/sphere", callback=lambda model: None)
+            yield "Modellek"
+            while not self.enemy_model_loaded:
+                yield "Modellek"
+            if self.enemy_model is None:
+                # Mint a szinkron betöltés: hiányzó modellnél nincs értelme tovább várni
+                self.loading_text.setText(f"Betöltési hiba: {ENEMY_MODEL_PATH}")
+                raise IOError(f"Could not load model file: {ENEMY_MODEL_PATH}")
+
+        # 2. Terep: shader és vertex formátum, majd a chunkok néhányanként
+        with trace.phase("terrain_setup"):
+            self.setup_terrain()
+            if self.win is not None:
+                # Shader előkészítése a GSG-n a következő frame-ben (ne az első játék frame-ben)
+                self.terrain.shader.prepare(self.win.getGsg().getPreparedObjects())
+        self.startup_progress = 0.2
+        yield "Terep"
+
+        with trace.phase("terrain_chunks"):
+            total = (2 * self.terrain.render_distance + 1) ** 2
+            while True:
+                pending = self.terrain.update(Vec3(0, 0, 0), budget=STARTUP_CHUNK_BUDGET)
+                self.startup_progress = 0.2 + 0.6 * (total - pending) / total
+                if pending == 0:
+                    break
+                yield "Terep"
+
+        # 3. Világ: játékos, kamera, fizika, lövedékek, ellenségek
+        with trace.phase("world"):
+            self.setup_world()
+        self.startup_progress = 0.95
+        yield "Ellenségek"
+
+        # 4. UI és irányítás
+        with trace.phase("ui"):
+            self.setup_ui()
+            self.setup_input_recording(self.record_path)
+            self.setup_controls()
+
+        self.loading_text.destroy()
+        self.loading_text = None
+        self.is_playable = True
+        trace.mark("playable")
+        if STARTUP_TRACE_PRINT.getValue():
+            print("\n".join(trace.report_lines()))
+        self.taskMgr.add(self.game_loop, "game_loop")
+
+    def on_enemy_model_loaded(self, model):
+        self.enemy_model = model
+        self.enemy_model_loaded = True
+
+    def setup_world(self):
         # Játékos és Kamera
         self.player = Player(self.render, start_pos=(0, 0, 50))
+        self.player.handle = self.entities.spawn(ENTITY_PLAYER, self.player)
+        self.interpolator.track(self.player.node)
         self.cam_manager = CameraManager(self, self.player.node)
         
         # Fizika
-        self.physics = PhysicsManager(self)
-        self.physics.setup_collision(self.player, self.terrain.root)
+        self.physics = PhysicsManager(self, self.terrain)
+        self.physics.setup_collision(self.player)
         
         # --- ÚJ: Lövedék Rendszer Setup ---
         # Külön Traverser a golyóknak, hogy gyors legyen
         self.bulletTrav = CollisionTraverser() 
-        self.bullets = [] # Itt tároljuk az aktív golyókat
-
-        # --- Ellenségek Létrehozása ---
-        self.enemies = []
-        # Több ellenséget rakunk le különböző helyekre
-        spawn_points = [
-            [Vec3(30, 30, 0), Vec3(30, -30, 0)],
-            [Vec3(-30, 30, 0), Vec3(-30, -30, 0)],
-            [Vec3(50, 0, 0), Vec3(60, 10, 0)]
-        ]
-        
-        for patrol_route in spawn_points:
-            enemy = EnemyAI(self, self.player, patrol_route)
-            self.enemies.append(enemy)
-        
+        # Az aktív golyók az entitás nyilvántartásban vannak (ENTITY_BULLET)
+
+        # --- Ellenségek: chunkokhoz kötött populáció ---
+        self.enemy_spawner = EnemySpawner(self, self.player, self.terrain, seed=self.seed)
+
         # Inputok
         self.keys = {"w": False, "s": False, "a": False, "d": False, "space": False}
-        self.setup_controls()
+        self.pending_shots = 0
 
-        # UI
+    def setup_ui(self):
         from direct.gui.OnscreenText import OnscreenText
         self.info = OnscreenText(text="BAL KLIKK: Lövés | WASD: Mozgás",
                                  pos=(-0.9, 0.9), scale=0.05, align=0, fg=(1,1,1,1))
 
-        self.taskMgr.add(self.game_loop, "game_loop")
+        # Debug: ellenség LOD szintek kijelzése (F3)
+        self.lod_overlay = OnscreenText(text="", pos=(-0.9, 0.8), scale=0.045,
+                                        align=0, fg=(1, 1, 0.5, 1), mayChange=True)
+        self.lod_overlay.hide()
+        self.show_lod_debug = False
+
+        # Debug: szakaszonkénti frame idő (F4 kijelzés, F5 export)
+        self.profiler_overlay = ProfilerOverlay(self, profiler)
+        # A profil felvétel (cProfile, pstats) csak az első F9/F10-re töltődik be
+        self.profile_capture = None
 
     def setup_environment(self):
         self.setBackgroundColor(0.5, 0.7, 0.9)
@@ -70,7 +212,8 @@ class Game(ShowBase):
         self.render.setLight(dlnp)
 
     def setup_terrain(self):
-        self.terrain = InfiniteTerrain(self.render, seed=42)
+        # A chunkokat az indítási fázis tölti be fokozatosan
+        self.terrain = InfiniteTerrain(self.render, seed=self.seed, generate=False)
 
     def setup_controls(self):
         for key in self.keys:
@@ -83,47 +226,187 @@ class Game(ShowBase):
         # ÚJ: Lövés gomb
         self.accept("mouse1", self.shoot)
         
+        self.accept("f3", self.toggle_lod_debug)
+        self.accept("f4", self.profiler_overlay.toggle)
+        self.accept("f5", self.profiler_overlay.export)
+        self.accept("f9", lambda: self.get_profile_capture().start_capture())
+        self.accept("f10", lambda: self.get_profile_capture().toggle_ring())
         self.accept("escape", self.userExit)
 
     def set_key(self, key, value):
         self.keys[key] = value
+        if self.input_recorder:
+            self.input_recorder.record_key(self.sim_clock.step_index, key, value)
+
+    def get_profile_capture(self):
+        """Lusta betöltés: a cProfile/pstats importja csak akkor fut, ha tényleg kell."""
+        if self.profile_capture is None:
+            from core.profile_capture import ProfileCapture
+            self.profile_capture = ProfileCapture(
+                profiler, frames=PROFILE_CAPTURE_FRAMES.getValue(),
+                spike_threshold_ms=PROFILE_SPIKE_MS.getValue())
+        return self.profile_capture
+
+    def setup_input_recording(self, record_path):
+        """Input felvétel (live) vagy visszajátszás beállítása."""
+        self.input_recorder = None
+        if self.input_replay is not None:
+            # Az egér elmozdulást a felvételből kapja a kamera
+            self.cam_manager.mouse_source = self.input_replay.pop_mouse
+            # Az első frame előtt rögzített események (pl. már lenyomott billentyű)
+            self.input_replay.dispatch(self)
+            print(f"Input visszajátszás: seed={self.seed}, sim-rate={self.sim_clock.rate}")
+        elif record_path:
+            from core.input_recorder import InputRecorder
+            self.input_recorder = InputRecorder(record_path, self.seed, self.sim_clock.rate,
+                                                self.sim_clock.max_steps)
+            self.cam_manager.mouse_listener = self.on_mouse_delta
+            self.finalExitCallbacks.append(self.input_recorder.close)
+
+    def on_mouse_delta(self, dx, dy):
+        self.input_recorder.record_mouse(self.sim_clock.step_index, dx, dy)
+
+    def toggle_lod_debug(self):
+        """LOD debug overlay be/ki kapcsolása."""
+        self.show_lod_debug = not self.show_lod_debug
+        if self.show_lod_debug:
+            self.lod_overlay.show()
+        else:
+            self.lod_overlay.hide()
+            for enemy in self.enemy_spawner.enemies:
+                enemy.actor.clearColorScale()
+
+    def update_lod_debug(self):
+        """Szintenkénti darabszám kiírása és az ellenségek színezése."""
+        counts = [0] * len(LOD_NAMES)
+        for enemy in self.enemy_spawner.enemies:
+            counts[enemy.lod_tier] += 1
+            enemy.actor.setColorScale(LOD_DEBUG_COLORS[enemy.lod_tier])
+        lines = [f"{name}: {count}" for name, count in zip(LOD_NAMES, counts)]
+        lines.append(f"Suspended: {self.enemy_spawner.suspended_count()}")
+        self.lod_overlay.setText("Enemy LOD\n" + "\n".join(lines))
 
     def shoot(self):
-        """Lövés esemény."""
+        """Lövés esemény: a golyó a következő szimulációs lépésben indul."""
+        if self.input_recorder:
+            self.input_recorder.record_shoot(self.sim_clock.step_index)
+        self.pending_shots += 1
+
+    def fire_pending_shots(self):
+        """A kért lövések végrehajtása a szimuláció elején (determinisztikus kezdőpont)."""
+        # A kamerát a játékos szimulált (nem interpolált) pozíciójához igazítjuk
+        self.cam_manager.sync()
+        for _ in range(self.pending_shots):
+            self.fire()
+        self.pending_shots = 0
+
+    def fire(self):
         # A kamerából indul a golyó, a kamera irányába
         # A cam_manager.pivot helyett a valódi kamerát (self.camera) használjuk a pontos célzáshoz
         start_pos = self.camera.getPos(self.render)
         direction_quat = self.camera.getQuat(self.render)
         
-        # Létrehozzuk a golyót
-        bullet = Projectile(self, start_pos, direction_quat)
-        self.bullets.append(bullet)
+        # Létrehozzuk a golyót (magát veszi fel a nyilvántartásba)
+        Projectile(self, start_pos, direction_quat)
 
     def game_loop(self, task):
-        dt = globalClock.getDt()
+        frame_dt = self.next_frame_dt()
+        if profiler.enabled:
+            profiler.record("frame", frame_dt * 1000.0)
+
+        # Fix lépésű szimuláció: a node-ok előbb visszakapják a valódi állapotot,
+        # majd annyi lépés fut, amennyit az eltelt idő kiad (max. sim_clock.max_steps)
+        self.interpolator.restore()
+        steps = self.sim_clock.advance(frame_dt)
+        for _ in range(steps):
+            with profiler.scope("simulate"):
+                self.simulate(self.sim_clock.step_dt)
+            self.sim_clock.step_index += 1
+            self.interpolator.capture()
+        self.interpolator.apply(self.sim_clock.alpha)
+
+        # Visszajátszás: a frame alatt rögzített inputok (egér, billentyű, lövés)
+        if self.input_replay is not None:
+            self.input_replay.dispatch(self)
+
+        # Frame-enkénti (nem szimulációs, csak vizuális) frissítések
+        with profiler.scope("camera"):
+            self.cam_manager.update()
+
+        if self.show_lod_debug:
+            self.update_lod_debug()
+        self.profiler_overlay.update()
+        if profiler.capture is not None:
+            profiler.capture.end_frame(frame_dt * 1000.0)
         
-        self.terrain.update(self.player.node.getPos())
-        self.cam_manager.update()
-        self.physics.update_physics(dt)
+        return task.cont
+
+    def next_frame_dt(self):
+        """Frame idő: élőben az órából (és felvesszük), visszajátszáskor a felvételből."""
+        if self.input_replay is not None:
+            frame_dt = self.input_replay.next_frame(self.sim_clock.step_index)
+            if frame_dt is not None:
+                return frame_dt
+            print(f"Input visszajátszás vége ({self.input_replay.frame_count} frame)")
+            self.input_replay = None
+            self.cam_manager.mouse_source = self.cam_manager._read_window_pointer
+
+        frame_dt = globalClock.getDt()
+        if self.input_recorder:
+            self.input_recorder.record_frame(self.sim_clock.step_index, frame_dt)
+        return frame_dt
+
+    def simulate(self, dt):
+        """Egy fix hosszúságú szimulációs lépés."""
+        if self.pending_shots:
+            self.fire_pending_shots()
+
+        with profiler.scope("physics"):
+            self.physics.update_physics(dt)
         
         # ÚJ: Golyók frissítése
         # A 'traverse' ellenőrzi az ütközéseket az összes golyóra
-        self.bulletTrav.traverse(self.render)
+        with profiler.scope("bullet_traverse"):
+            self.bulletTrav.traverse(self.render)
         
         # Frissítjük a golyók mozgását és töröljük a halottakat
-        for bullet in self.bullets[:]: # Másolaton iterálunk, hogy törölhessünk
-            bullet.update(dt)
-            if not bullet.alive:
-                self.bullets.remove(bullet)
+        with profiler.scope("bullet_update"):
+            # Visszafelé iterálunk: a halott golyó swap-remove-val törlődik (O(1))
+            bullets = self.entities.of_type(ENTITY_BULLET)
+            for i in range(len(bullets) - 1, -1, -1):
+                bullets[i].update(dt)
 
-        # Ellenségek listájának tisztítása (opcionális, ha törölni akarjuk a referenciát)
-        self.enemies = [e for e in self.enemies if e.is_alive]
+        with profiler.scope("enemies"):
+            self.enemy_spawner.step(dt)
 
-        cam_heading = self.cam_manager.get_heading()
-        self.player.update_movement(dt, self.keys, cam_heading)
-        
-        return task.cont
+        with profiler.scope("player_move"):
+            cam_heading = self.cam_manager.get_heading()
+            self.player.update_movement(dt, self.keys, cam_heading)
+
+        # Chunk streaming a szimulált pozícióval: az ellenségek megjelenése / felfüggesztése
+        # a szimulációs lépéshez kötött (nem a frame időzítéshez), így a visszajátszás egyezik
+        with profiler.scope("terrain"):
+            self.terrain.update(self.player.node.getPos())
 
 if __name__ == "__main__":
-    game = Game()
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--record", metavar="FILE", help="Input felvétel fájlba")
+    parser.add_argument("--replay", metavar="FILE", help="Rögzített input visszajátszása")
+    parser.add_argument("--startup-trace", metavar="FILE",
+                        help="Indítási idővonal mentése JSON-ba (a játék indulása után)")
+    args = parser.parse_args()
+
+    replay = None
+    if args.replay:
+        from core.input_recorder import InputReplay
+        replay = InputReplay(args.replay)
+    game = Game(record_path=args.record, replay=replay)
+    if args.startup_trace:
+        def export_startup_trace(task):
+            if not game.is_playable:
+                return task.cont
+            game.startup_trace.export_json(args.startup_trace)
+            return task.done
+        game.taskMgr.add(export_startup_trace, "export_startup_trace")
     game.run()
\ No newline at end of file
@@ -0,0 +1,82 @@
+"""
+Protokoll benchmark: JSON (debug), bináris keyframe és bináris delta STATE üzenet.
+Tickenkénti bájtszám, kódolási és dekódolási idő különböző játékosszámoknál.
+A delta mód az előző tick snapshotjához képest kódol (mint egy azonnal nyugtázó kliensnél).
+
+Futtatás a network könyvtárból:
+    python bench_protocol.py --players 10 100 1000 --ticks 600 --idle 0.5
+"""
+import argparse
+import random
+import time
+import uuid
+
+from protocol import (
+    PlayerState, encode_state, encode_snapshot, decode_message, HEADER_SIZE,
+    WIRE_FORMAT_BINARY, WIRE_FORMAT_JSON
+)
+from snapshot import build_snapshot, diff_snapshots
+
+MODES = ("json", "binary", "delta")
+
+
+def make_players(count, seed, idle):
+    rng = random.Random(seed)
+    players = []
+    for index in range(count):
+        state = PlayerState(str(uuid.UUID(int=rng.getrandbits(128))), index)
+        state.x = rng.uniform(-500.0, 500.0)
+        state.y = rng.uniform(-500.0, 500.0)
+        if rng.random() >= idle:
+            state.vx = rng.choice((-10.0, 10.0))
+            state.vy = rng.choice((-10.0, 0.0, 10.0))
+        players.append(state)
+    return players
+
+
+def bench(players, mode, ticks):
+    dt = 1.0 / 60.0
+    encode_time = 0.0
+    decode_time = 0.0
+    size = 0
+    previous = {}
+    for seq in range(1, ticks + 1):
+        for p in players:
+            p.x += p.vx * dt
+            p.y += p.vy * dt
+        start = time.perf_counter()
+        if mode == "delta":
+            snapshot = build_snapshot(players)
+            changes, removed = diff_snapshots(snapshot, previous)
+            frame = encode_snapshot(seq, seq - 1, changes, removed)
+            previous = snapshot
+        else:
+            wire_format = WIRE_FORMAT_JSON if mode == "json" else WIRE_FORMAT_BINARY
+            frame = encode_state(players, seq, wire_format)
+        encode_time += time.perf_counter() - start
+        start = time.perf_counter()
+        decode_message(frame[HEADER_SIZE:])
+        decode_time += time.perf_counter() - start
+        size += len(frame)
+    return size / ticks, encode_time / ticks * 1e6, decode_time / ticks * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON vs bináris protokoll benchmark")
+    parser.add_argument("--players", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--ticks", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--idle", type=float, default=0.5, help="Álló játékosok aránya")
+    args = parser.parse_args()
+
+    print(f"{'players':>8} {'format':>7} {'bytes/tick':>11} {'encode us':>10} {'decode us':>10} {'kB/s @60Hz':>11}")
+    for count in args.players:
+        for mode in MODES:
+            players = make_players(count, args.seed, args.idle)
+            size, encode_us, decode_us = bench(players, mode, args.ticks)
+            print(f"{count:>8} {mode:>7} {size:>11.0f} {encode_us:>10.1f} {decode_us:>10.1f} "
+                  f"{size * 60 / 1024:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Szerver tick benchmark: N csatlakozott (szimulált) játékos, tickenként input parancsokkal.
+A szimuláció (update_game_state) és a snapshot küldés (broadcast_state) idejét méri külön,
+valódi socketek nélkül (a kimenő keretek egy számláló transportba mennek).
+
+Futtatás a network könyvtárból:
+    python bench_server.py --players 100 1000 --ticks 300
+    python bench_server.py --players 100 1000 --spread 100 --compress   # tömörítés aránya és költsége
+"""
+import argparse
+import asyncio
+import logging
+import random
+import time
+
+from protocol import DIRECTIONS, COMMAND_RATE, MSG_TYPE_CLIENT_MOVE
+import server as game_server
+
+TICK_BUDGET_MS = 1000.0 / game_server.TICK_RATE
+
+
+class BenchProtocol:
+    """A FramedProtocol küldő felülete, socket nélkül: csak számolja a kereteket."""
+    def __init__(self, number: int):
+        self.peername = ("bench", number)
+        self.on_frame = None
+        self.on_close = None
+        self.reads = self.frames_received = self.bytes_received = 0
+        self.writes = self.frames_sent = self.bytes_sent = 0
+        self.write_paused = False
+
+    def write_frames(self, frames, unreliable_frame=None):
+        if unreliable_frame is not None:
+            frames = frames + [unreliable_frame]
+        self.writes += 1
+        self.frames_sent += len(frames)
+        self.bytes_sent += sum(len(f) for f in frames)
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def bench(count: int, ticks: int, seed: int, spread: float, compress: bool = False):
+    rng = random.Random(seed)
+    server = game_server.GameServer()
+    for number in range(count):
+        server.handle_client(BenchProtocol(number))
+    connections = list(server.connections.values())
+    for conn in connections:
+        conn.compression = compress
+    # Szétszórt kezdőpozíciók, hogy az AOI ne mindenkit lásson
+    for conn in connections:
+        server.place_player(conn, rng.uniform(-spread, spread), rng.uniform(-spread, spread))
+    directions = [rng.choice(DIRECTIONS) for _ in connections]
+
+    sim_times, broadcast_times, tick_times = [], [], []
+    for tick in range(1, ticks + 1):
+        for i, conn in enumerate(connections):
+            if rng.random() < 0.02:
+                directions[i] = rng.choice(DIRECTIONS)
+            # Tickenként egy parancs, a legutóbbi snapshot nyugtájával (mint egy valódi kliens)
+            server.process_message(conn.player_id, {
+                "type": MSG_TYPE_CLIENT_MOVE,
+                "payload": {"ack": conn.sent_seq, "seq": tick, "directions": [directions[i]]}})
+
+        start = time.perf_counter()
+        server.update_game_state(1.0 / COMMAND_RATE)
+        sim_times.append((time.perf_counter() - start) * 1000)
+        tick_times.append(sim_times[-1])
+
+        # A nézők csoportonként, eltolt tickekben kapják a snapshotot (mint a game_loop-ban)
+        groups = server.scheduler.snapshot_groups(tick)
+        if groups:
+            start = time.perf_counter()
+            server.broadcast_due(dict(groups))
+            broadcast_times.append((time.perf_counter() - start) * 1000)
+            tick_times[-1] += broadcast_times[-1]
+        # A write_loop taskok kiürítik a sorokat
+        await asyncio.sleep(0)
+
+    sent = sum(conn.protocol.bytes_sent for conn in connections)
+    server.is_running = False
+    for conn in connections:
+        server.remove_player(conn.player_id)
+    await asyncio.sleep(0)
+    seconds = ticks / game_server.TICK_RATE
+    return sim_times, broadcast_times, tick_times, sent / seconds, server.compression_stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Szerver tick benchmark")
+    parser.add_argument("--players", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--ticks", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--spread", type=float, default=500.0, help="Kezdőpozíciók tartománya")
+    parser.add_argument("--compress", action="store_true",
+                        help="Minden kapcsolat tömörítve kapja a snapshotokat (arány, µs/üzenet)")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    print(f"{'players':>8} {'sim p50':>8} {'sim p99':>8} {'bcast p50':>10} {'bcast p99':>10} "
+          f"{'tick p99 ms':>12} {'budget':>7} {'kB/s':>9}"
+          + (f" {'ratio':>6} {'comp us':>8}" if args.compress else ""))
+    for count in args.players:
+        sim, bcast, ticks, sent, compression = asyncio.run(bench(count, args.ticks, args.seed, args.spread,
+                                                          args.compress))
+        # Tickenként: szimuláció + az esedékes csoport(ok) snapshotja
+        tick_p99 = percentile(ticks, 0.99)
+        print(f"{count:>8} {percentile(sim, 0.5):>8.2f} {percentile(sim, 0.99):>8.2f} "
+              f"{percentile(bcast, 0.5):>10.2f} {percentile(bcast, 0.99):>10.2f} "
+              f"{tick_p99:>12.2f} {TICK_BUDGET_MS:>7.1f} {sent / 1024:>9.1f}"
+              + (f" {compression['ratio']:>6.2f} {compression['us_per_message']:>8.1f}"
+                 if args.compress else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,34 @@
 import asyncio
+import argparse
 import time
 import logging
-import struct
 import random
+from collections import deque
 from typing import Dict, Any, Optional
 
 # Import a protokoll modulból
 from protocol import (
-    decode_message, encode_message, HEADER_SIZE, HEADER_FORMAT,
-    MSG_TYPE_CLIENT_MOVE, MSG_TYPE_SERVER_STATE, MSG_TYPE_SERVER_ERROR
+    decode_message, encode_message,
+    MSG_TYPE_CLIENT_MOVE, MSG_TYPE_SERVER_STATE, MSG_TYPE_SERVER_ERROR,
+    MSG_TYPE_SERVER_WELCOME, MSG_TYPE_SERVER_ACK, MSG_TYPE_CLIENT_HELLO,
+    WIRE_FORMAT_BINARY, WIRE_FORMAT_JSON, COMMAND_RATE, COMMAND_DT
 )
+from compression import DICTIONARY_ID
+from snapshot import SnapshotReceiver
+from prediction import ClockSync, InterpolationBuffer, PlayerPredictor
+from framing import FramedProtocol
+from udp_transport import udp_connect, NetworkSimulator, TRANSPORT_TCP, TRANSPORT_UDP
 
 # --- Konfiguráció ---
 SERVER_HOST = '127.0.0.1'
 SERVER_PORT = 8888
 INPUT_SEND_RATE = 20  # Hz (Hányszor küld inputot a kliens/másodperc)
+INPUT_REDUNDANCY = 9  # Csomagonként ennyi legutóbbi parancs (az előző két csomag tartalma is)
+RENDER_RATE = 60      # Hz: helyi képkocka (predikció + interpoláció), független a snapshot rátától
+RENDER_LOG_INTERVAL = 1.0  # mp: a [RENDER] sor ilyen gyakran kerül a logba
 RECONNECT_DELAY = 5   # Másodperc várakozás újracsatlakozás előtt
+WIRE_FORMAT = WIRE_FORMAT_BINARY  # WIRE_FORMAT_JSON: olvasható debug forgalom
+TRANSPORT = TRANSPORT_TCP         # TRANSPORT_UDP: a MOVE/STATE nem megbízható csatornán megy
 
 # --- Logolás beállítása ---
 logging.basicConfig(level=logging.INFO, 
@@ -24,27 +37,62 @@ logging.basicConfig(level=logging.INFO,
 
 class GameClient:
     """A kliens, amely kezeli a hálózati I/O-t és a játékállapotot."""
-    def __init__(self):
-        self.reader: Optional[asyncio.StreamReader] = None
-        self.writer: Optional[asyncio.StreamWriter] = None
+    def __init__(self, transport: str = TRANSPORT, simulator: Optional[NetworkSimulator] = None,
+                 compression: bool = False):
+        self.transport = transport
+        self.simulator = simulator
+        # Tömörített snapshotok kérése (kis sávszélességnél; a szerver CPU-ba kerül)
+        self.compression = compression and bool(DICTIONARY_ID)
+        self.protocol = None  # FramedProtocol (TCP) vagy UdpConnection (UDP)
         self.is_connected = False
         self.game_state: Dict[str, Any] = {"players": []}
         self.client_id: str = "N/A" 
+        self.client_index: Optional[int] = None  # Saját kompakt index (WELCOME üzenetből)
+        self.snapshots = SnapshotReceiver()  # Delta snapshotok visszaállítása
+        self.command_seq = 0                 # Utolsó kiadott input parancs sorszáma
+        self.recent_commands = deque(maxlen=INPUT_REDUNDANCY)
+        # Simítás: szerver óra becslés, távoli játékosok interpolációja, saját predikció
+        self.clock = ClockSync()
+        self.interpolation = InterpolationBuffer()
+        self.predictor = PlayerPredictor(COMMAND_DT)
+        self.last_render_log = 0.0
+
+    async def connect(self, host: str, port: int):
+        """Kapcsolat felvétele és a kapcsolatonkénti állapot alaphelyzetbe állítása."""
+        if self.transport == TRANSPORT_UDP:
+            self.protocol = await udp_connect(host, port, self.on_frame, self.simulator)
+        else:
+            loop = asyncio.get_running_loop()
+            _, self.protocol = await loop.create_connection(
+                lambda: FramedProtocol(on_frame=self.on_frame), host, port)
+        self.snapshots = SnapshotReceiver()
+        self.snapshots.on_enter.append(self.on_entity_enter)
+        self.snapshots.on_leave.append(self.on_entity_leave)
+        self.command_seq = 0
+        self.recent_commands.clear()
+        self.clock = ClockSync()
+        self.interpolation = InterpolationBuffer()
+        self.predictor = PlayerPredictor(COMMAND_DT)
+        self.is_connected = True
+        # Képességek: a szerver csak azonos szótár azonosítónál tömörít (ACK-ban válaszol)
+        if self.compression:
+            self.protocol.write(encode_message(MSG_TYPE_CLIENT_HELLO, {"compression": DICTIONARY_ID},
+                                               WIRE_FORMAT))
 
     async def connect_forever(self, host: str, port: int):
         """Végtelen ciklus, amely megpróbál csatlakozni és kapcsolatot tartani."""
         while True:
             try:
                 logging.info(f"Attempting to connect to {host}:{port}...")
-                self.reader, self.writer = await asyncio.open_connection(host, port)
-                self.is_connected = True
+                await self.connect(host, port)
                 logging.info(f"Connected to server!")
                 
                 # Futtatjuk a kommunikációs loopokat
                 # A gather addig fut, amíg valamelyik loop véget nem ér (pl. hiba miatt)
                 await asyncio.gather(
                     self.receive_loop(),
-                    self.input_loop()
+                    self.input_loop(),
+                    self.render_loop()
                 )
             
             except ConnectionRefusedError:
@@ -59,56 +107,46 @@ class GameClient:
     def close(self):
         """Kapcsolat bezárása és takarítás."""
         self.is_connected = False
-        if self.writer:
+        if self.protocol:
             try:
-                self.writer.close()
+                self.protocol.close()
             except Exception:
                 pass
-            self.writer = None
-        self.reader = None
+            self.protocol = None
 
     async def send_message(self, msg_type: str, data: Optional[Dict[str, Any]] = None):
         """Üzenet küldése a szervernek."""
-        if not self.writer or not self.is_connected:
+        if not self.protocol or not self.is_connected:
             return
         try:
-            encoded_msg = encode_message(msg_type, data)
-            self.writer.write(encoded_msg)
-            await self.writer.drain()
+            encoded_msg = encode_message(msg_type, data, WIRE_FORMAT)
+            # A MOVE-ot a következő úgyis felülírja: UDP-n nem kell újraküldeni
+            self.protocol.write(encoded_msg, reliable=msg_type != MSG_TYPE_CLIENT_MOVE)
+            await self.protocol.drain()
         except Exception as e:
             # Nem logolunk minden hibát itt, a receive_loop/input_loop majd kezeli a szakadást
             pass
             
-    async def receive_loop(self):
-        """Folyamatosan fogadja és dekódolja a szerver üzeneteit."""
-        while self.is_connected:
-            try:
-                if not self.reader:
-                    break
-
-                # 1. Hossz (header) olvasása
-                header_data = await self.reader.readexactly(HEADER_SIZE)
-                msg_len, = struct.unpack(HEADER_FORMAT, header_data)
-                
-                # 2. Üzenet olvasása
-                message_data = await self.reader.readexactly(msg_len)
-                
-                # 3. Üzenet feldolgozása
-                message = decode_message(message_data)
-                if message:
-                    self.process_server_message(message)
+    def on_frame(self, frame: memoryview):
+        """Egy teljes bejövő keret (a FramedProtocol egy olvasásból az összeset átadja)."""
+        try:
+            message = decode_message(frame)
+            if message:
+                self.process_server_message(message)
+        except Exception as e:
+            logging.error(f"Error processing server message: {e}")
 
-            except asyncio.IncompleteReadError:
+    async def receive_loop(self):
+        """Megvárja a kapcsolat végét (a fogadást a FramedProtocol callbackjei végzik)."""
+        protocol = self.protocol
+        if protocol is not None:
+            exc = await protocol.closed_future
+            if exc is None:
                 logging.warning("Server disconnected (stream ended).")
-                break
-            except ConnectionResetError:
-                logging.warning("Server connection reset.")
-                break
-            except Exception as e:
-                logging.error(f"Error in receive loop: {e}")
-                break
-        
-        # Ha a loop megszakad, jelezzük a disconnectet
+            else:
+                logging.warning(f"Server connection reset: {exc}")
+
+        # Ha a kapcsolat megszakad, jelezzük a disconnectet
         self.close()
 
 
@@ -117,25 +155,74 @@ class GameClient:
         msg_type = message.get("type")
         payload = message.get("payload", {})
 
-        if msg_type == MSG_TYPE_SERVER_STATE:
-            self.game_state = payload
-            if self.client_id == "N/A":
-                self.client_id = next((p['id'] for p in payload.get('players', []) if 'id' in p), "N/A")
-                logging.info(f"Client assigned ID: {self.client_id}")
-            self.render_state()
+        if msg_type == MSG_TYPE_SERVER_WELCOME:
+            self.client_id = payload.get('id', "N/A")
+            self.client_index = payload.get('index')
+            logging.info(f"Client assigned ID: {self.client_id} (index {self.client_index})")
+
+        elif msg_type == MSG_TYPE_SERVER_STATE:
+            players = self.snapshots.apply(payload)
+            if players is None:
+                return
+            # A snapshot szerver ideje: órakülönbség minta és a jitter puffer időbélyege
+            server_time = payload.get("time", 0) / 1000.0
+            self.clock.add_sample(server_time, time.monotonic())
+            self.interpolation.push(server_time, players)
+            me = players.get(self.client_index)
+            if me is not None:
+                self.predictor.reconcile(me, payload.get("input_ack", 0))
             
         elif msg_type == MSG_TYPE_SERVER_ERROR:
             logging.error(f"Server Error: {payload.get('reason', 'Unknown error')}")
 
+        elif msg_type == MSG_TYPE_SERVER_ACK and "compression" in payload:
+            logging.info(f"Compression {'enabled' if payload['compression'] else 'declined by server'}")
+
+    def on_entity_enter(self, index: int, player: Dict[str, Any]):
+        """Egy távoli játékos a látókörbe ért (itt lehet spawnolni)."""
+        if index != self.client_index:
+            logging.debug(f"Player {index} entered view at ({player['x']:.1f}, {player['y']:.1f})")
+
+    def on_entity_leave(self, index: int):
+        """Egy távoli játékos elhagyta a látókört (itt lehet despawnolni)."""
+        logging.debug(f"Player {index} left view")
+
+    def update_view(self, dt: float):
+        """
+        A megjelenített állapot: a távoli játékosok a becsült szerver idő mögött interpolálva,
+        a saját játékos a predikcióból.
+        """
+        server_now = self.clock.server_now(time.monotonic())
+        if server_now is None:
+            return
+        players = self.interpolation.sample(server_now - self.interpolation.delay)
+        if self.predictor.initialized and self.client_index in players:
+            x, y = self.predictor.render_position(dt)
+            players = dict(players)
+            players[self.client_index] = {"index": self.client_index, "x": x, "y": y,
+                                          "vx": self.predictor.state.vx, "vy": self.predictor.state.vy}
+        self.game_state = {"players": list(players.values())}
+
+    async def render_loop(self):
+        """Helyi képkocka ciklus: a snapshotok ritkábbak, a megjelenítés ettől még folyamatos."""
+        dt = 1.0 / RENDER_RATE
+        while self.is_connected:
+            self.update_view(dt)
+            self.render_state()
+            await asyncio.sleep(dt)
+
     def render_state(self):
         """A játékállapot megjelenítése (logolás)."""
         if not self.game_state or not self.game_state.get('players'):
             return
         
-        # Csak ritkábban logoljunk, hogy ne floodoljuk a konzolt (opcionális)
-        # Itt most minden ticknél logol, ahogy az eredetiben
+        # Csak ritkábban logoljunk, hogy ne floodoljuk a konzolt
+        now = time.monotonic()
+        if now - self.last_render_log < RENDER_LOG_INTERVAL:
+            return
+        self.last_render_log = now
         player_data = self.game_state['players']
-        me = next((p for p in player_data if p['id'] == self.client_id), None)
+        me = next((p for p in player_data if p['index'] == self.client_index), None)
         player_count = len(player_data)
         
         if me:
@@ -143,14 +230,33 @@ class GameClient:
         else:
             pos_info = "Waiting for initial state... | "
             
-        logging.info(f"[RENDER] {pos_info}Total Players: {player_count}")
+        logging.info(f"[RENDER] {pos_info}Total Players: {player_count} | "
+                     f"Corrections: {self.predictor.corrections}")
+
+
+    def record_command(self, direction: str):
+        """Új input parancs (egy tick) sorszámmal."""
+        self.command_seq += 1
+        self.recent_commands.append(direction)
+        self.predictor.apply_command(self.command_seq, direction)
 
+    def command_payload(self) -> Dict[str, Any]:
+        """MOVE tartalom: az utolsó INPUT_REDUNDANCY parancs és a snapshot nyugta."""
+        return {"ack": self.snapshots.last_seq,
+                "seq": self.command_seq,
+                "directions": list(self.recent_commands)}
+
+    async def send_commands(self):
+        """Az utolsó INPUT_REDUNDANCY parancs elküldése (elveszett csomag pótlására)."""
+        # A mozgással együtt nyugtázzuk az utolsó megkapott snapshotot
+        await self.send_message(MSG_TYPE_CLIENT_MOVE, self.command_payload())
 
     async def input_loop(self):
-        """Input szimulálása és küldése."""
+        """Input szimulálása: COMMAND_RATE-en mintavétel, INPUT_SEND_RATE-en kötegelt küldés."""
         directions = ["up", "down", "left", "right", "none"]
         current_direction = random.choice(directions)
         last_change_time = time.time()
+        commands_per_packet = max(1, COMMAND_RATE // INPUT_SEND_RATE)
         
         while self.is_connected:
             try:
@@ -159,14 +265,29 @@ class GameClient:
                     last_change_time = time.time()
                     logging.info(f"Simulated new direction: {current_direction}")
 
-                await self.send_message(MSG_TYPE_CLIENT_MOVE, {"direction": current_direction})
-                await asyncio.sleep(1.0 / INPUT_SEND_RATE)
+                self.record_command(current_direction)
+                if self.command_seq % commands_per_packet == 0:
+                    await self.send_commands()
+                await asyncio.sleep(1.0 / COMMAND_RATE)
             except Exception:
                 break # Ha hiba van, lépjünk ki, a connect_forever majd újraindítja
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="RoguelikeShooter test client")
+    parser.add_argument("--transport", choices=[TRANSPORT_TCP, TRANSPORT_UDP], default=TRANSPORT)
+    parser.add_argument("--sim-loss", type=float, default=0.0, help="UDP: simulated packet loss (0..1)")
+    parser.add_argument("--sim-latency", type=float, default=0.0, help="UDP: simulated one-way latency (s)")
+    parser.add_argument("--sim-jitter", type=float, default=0.0, help="UDP: simulated extra random delay (s)")
+    parser.add_argument("--compress", action="store_true",
+                        help="Request compressed snapshots (less bandwidth, more server CPU)")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    client = GameClient()
+    args = parse_args()
+    client = GameClient(args.transport, NetworkSimulator(args.sim_loss, args.sim_latency, args.sim_jitter),
+                        args.compress)
     try:
         # connect helyett connect_forever-t hívunk
         asyncio.run(client.connect_forever(SERVER_HOST, SERVER_PORT))
@@ -0,0 +1,95 @@
+import os
+import zlib
+from collections import Counter
+from typing import Iterable, List, Optional
+
+# --- Konfiguráció ---
+# Üzenetenkénti (raw deflate) tömörítés előre betanított szótárral: nincs kapcsolatonkénti
+# stream állapot, így UDP-n az elveszett / átugrott snapshot sem rontja el a következőt
+DICTIONARY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshot_dictionary.bin")
+DICTIONARY_SIZE = 16 * 1024   # A deflate ablak 32 kB; a szótár vége hasznosul a legjobban
+COMPRESSION_LEVEL = 6
+WINDOW_BITS = -15             # Raw deflate: nincs zlib fejléc / adler32 (a keret hossza úgyis ismert)
+MAX_DECOMPRESSED_SIZE = 1024 * 1024   # Ennél nagyobbra kibomló üzenet hibás / ellenséges
+
+# Tanítás: k-mer = ennyi bájtos részsztring, a szótár ekkora darabokból áll össze
+KMER_SIZE = 6
+SEGMENT_SIZE = 48
+
+
+def load_dictionary(path: str = DICTIONARY_PATH) -> Optional[bytes]:
+    """A betanított szótár (None, ha nincs: ekkor a tömörítés nem egyeztethető)."""
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+DICTIONARY = load_dictionary()
+# A kapcsolódáskor egyeztetett azonosító: csak azonos szótárral tömörítünk (0 = nincs szótár)
+DICTIONARY_ID = zlib.crc32(DICTIONARY) if DICTIONARY else 0
+
+# A szótárral előkészített tömörítő: üzenetenként csak másoljuk (olcsóbb, mint újra betölteni)
+_compressor = zlib.compressobj(COMPRESSION_LEVEL, zlib.DEFLATED, WINDOW_BITS,
+                               zdict=DICTIONARY) if DICTIONARY else None
+
+
+def deflate(data: bytes) -> bytes:
+    """Egy üzenet tömörítése a szótárral (önállóan kibontható)."""
+    compressor = _compressor.copy()
+    return compressor.compress(data) + compressor.flush()
+
+
+def inflate(data: bytes) -> bytes:
+    """A deflate párja; a kibontott méret korlátos."""
+    if DICTIONARY is None:
+        raise ValueError("Compressed message but no dictionary")
+    decompressor = zlib.decompressobj(WINDOW_BITS, zdict=DICTIONARY)
+    result = decompressor.decompress(data, MAX_DECOMPRESSED_SIZE)
+    if decompressor.unconsumed_tail:
+        raise ValueError("Decompressed message too large")
+    if not decompressor.eof:
+        raise ValueError("Truncated compressed message")
+    return result
+
+
+def train_dictionary(samples: Iterable[bytes], size: int = DICTIONARY_SIZE,
+                     kmer: int = KMER_SIZE, segment: int = SEGMENT_SIZE) -> bytes:
+    """
+    Szótár a minták gyakori részleteiből (a zstd "cover" módszerének egyszerűsítése).
+    A minták darabjait aszerint pontozzuk, hogy a k-mereik hány mintában fordulnak elő;
+    a legjobb darabokból válogatunk, a már lefedett k-mereket nem számolva újra.
+    """
+    samples = [bytes(sample) for sample in samples]
+    # Dokumentum gyakoriság: hány mintában szerepel a k-mer (mintán belüli ismétlés nem számít)
+    frequency: Counter = Counter()
+    for sample in samples:
+        frequency.update({sample[i:i + kmer] for i in range(len(sample) - kmer + 1)})
+
+    candidates = []
+    step = segment // 2
+    for sample in samples:
+        for start in range(0, max(1, len(sample) - segment + 1), step):
+            piece = sample[start:start + segment]
+            kmers = {piece[i:i + kmer] for i in range(len(piece) - kmer + 1)}
+            # Az egyszer előforduló k-mer (pl. egy konkrét pozíció) nem segít
+            score = sum(frequency[k] for k in kmers if frequency[k] > 1)
+            if score:
+                candidates.append((score, piece, kmers))
+    candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+
+    chosen: List[bytes] = []
+    covered = set()
+    total = 0
+    for score, piece, kmers in candidates:
+        # Legalább felében új darab kell, különben csak ismételnénk a szótárat
+        if len(kmers - covered) * 2 < len(kmers):
+            continue
+        chosen.append(piece)
+        covered |= kmers
+        total += len(piece)
+        if total >= size:
+            break
+    # A deflate a közelebbi előzményt olcsóbban kódolja: a legjobb darab kerül a végére
+    return b"".join(reversed(chosen))[-size:]
@@ -0,0 +1,165 @@
+import asyncio
+import struct
+from typing import Callable, Optional, List
+
+from protocol import HEADER_FORMAT, HEADER_SIZE
+
+RECV_BUFFER_SIZE = 64 * 1024     # Kezdő fogadó puffer (szükség esetén nő)
+MAX_FRAME_SIZE = 1024 * 1024     # Ennél nagyobb hossz előtag = hibás/ellenséges kliens
+
+_HEADER = struct.Struct(HEADER_FORMAT)
+
+
+class FramedProtocol(asyncio.BufferedProtocol):
+    """
+    Hossz előtagos keretezés asyncio.BufferedProtocol-lal.
+    A socket közvetlenül egy újrahasznált pufferbe olvas; egy buffer_updated hívás
+    minden teljes keretet feldolgoz memoryview szeletekkel (nincs üzenetenkénti
+    readexactly és bytes másolat). A keret memoryview-ja csak a callback idejére él.
+    """
+    def __init__(self, on_frame: Optional[Callable[[memoryview], None]] = None,
+                 on_open: Optional[Callable[['FramedProtocol'], None]] = None,
+                 on_close: Optional[Callable[[Optional[Exception]], None]] = None,
+                 buffer_size: int = RECV_BUFFER_SIZE):
+        self.on_frame = on_frame
+        self.on_open = on_open
+        self.on_close = on_close
+
+        self.buffer = bytearray(buffer_size)
+        self.view = memoryview(self.buffer)
+        self.start = 0   # Első feldolgozatlan bájt
+        self.end = 0     # Az olvasott adat vége
+
+        self.transport: Optional[asyncio.Transport] = None
+        self.closed = False
+        self.closed_future = asyncio.get_running_loop().create_future()
+        self._paused = False
+        self._drain_waiter: Optional[asyncio.Future] = None
+
+        # Statisztika: olvasások (recv) vs. keretek, küldések (writelines) vs. keretek
+        self.reads = 0
+        self.frames_received = 0
+        self.bytes_received = 0
+        self.writes = 0
+        self.frames_sent = 0
+        self.bytes_sent = 0
+
+    # --- Kapcsolat ---
+
+    def connection_made(self, transport):
+        self.transport = transport
+        if self.on_open:
+            self.on_open(self)
+
+    def connection_lost(self, exc):
+        self.closed = True
+        if self._drain_waiter is not None and not self._drain_waiter.done():
+            self._drain_waiter.set_exception(ConnectionResetError("Connection lost"))
+        if not self.closed_future.done():
+            self.closed_future.set_result(exc)
+        if self.on_close:
+            self.on_close(exc)
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+
+    @property
+    def peername(self):
+        return self.transport.get_extra_info('peername')
+
+    @property
+    def write_paused(self) -> bool:
+        """A transport puffere a felső határ felett van (lassú olvasó)."""
+        return self._paused
+
+    # --- Fogadás ---
+
+    def get_buffer(self, sizehint):
+        if self.end == len(self.buffer):
+            self._reserve(len(self.buffer) - self.start + 1)
+        return self.view[self.end:]
+
+    def _reserve(self, needed: int):
+        """Helyet csinál 'needed' bájtnak a feldolgozatlan adattal együtt (tömörít vagy nő)."""
+        pending = self.end - self.start
+        size = len(self.buffer)
+        while size < needed:
+            size *= 2
+        if size != len(self.buffer):
+            buffer = bytearray(size)
+            buffer[:pending] = self.view[self.start:self.end]
+            self.buffer = buffer
+            self.view = memoryview(buffer)
+        elif self.start:
+            self.buffer[:pending] = self.buffer[self.start:self.end]
+        self.start = 0
+        self.end = pending
+
+    def buffer_updated(self, nbytes):
+        self.reads += 1
+        self.bytes_received += nbytes
+        self.end += nbytes
+
+        view = self.view
+        unpack_from = _HEADER.unpack_from
+        while self.end - self.start >= HEADER_SIZE and not self.closed:
+            length, = unpack_from(view, self.start)
+            if length > MAX_FRAME_SIZE:
+                self.closed = True
+                self.transport.close()
+                return
+            frame_end = self.start + HEADER_SIZE + length
+            if frame_end > self.end:
+                # Részleges keret: ha nem férne el, előre helyet csinálunk neki
+                if HEADER_SIZE + length > len(self.buffer) - self.start:
+                    self._reserve(HEADER_SIZE + length)
+                break
+            frame = view[self.start + HEADER_SIZE:frame_end]
+            self.start = frame_end
+            self.frames_received += 1
+            if self.on_frame:
+                self.on_frame(frame)
+
+        if self.start == self.end:
+            self.start = self.end = 0
+
+    def eof_received(self):
+        return False
+
+    # --- Küldés ---
+
+    def write(self, frame: bytes, reliable: bool = True):
+        # TCP-n minden üzenet megbízható; a paraméter a UdpConnection-nel közös felület miatt van
+        self.writes += 1
+        self.frames_sent += 1
+        self.bytes_sent += len(frame)
+        self.transport.write(frame)
+
+    def write_frames(self, frames: List[bytes], unreliable_frame: Optional[bytes] = None):
+        """Több keret egyetlen writelines hívással (egy rendszerhívás egy tickben)."""
+        if unreliable_frame is not None:
+            frames = frames + [unreliable_frame]
+        if not frames:
+            return
+        self.writes += 1
+        self.frames_sent += len(frames)
+        self.bytes_sent += sum(len(f) for f in frames)
+        self.transport.writelines(frames)
+
+    def pause_writing(self):
+        self._paused = True
+
+    def resume_writing(self):
+        self._paused = False
+        if self._drain_waiter is not None and not self._drain_waiter.done():
+            self._drain_waiter.set_result(None)
+
+    async def drain(self):
+        """Mint a StreamWriter.drain: vár, amíg a transport puffere a határ alá ürül."""
+        if self.closed:
+            raise ConnectionResetError("Connection lost")
+        if not self._paused:
+            return
+        self._drain_waiter = asyncio.get_running_loop().create_future()
+        await self._drain_waiter
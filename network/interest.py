@@ -0,0 +1,144 @@
+import math
+from typing import Tuple
+
+import numpy as np
+
+# --- Konfiguráció ---
+AOI_RADIUS = 60.0            # Alapértelmezett látókör (egység), kapcsolatonként felülírható
+AOI_CELL_SIZE = 60.0         # Rács cella mérete (= alap látókör: 3x3 cella szomszédság)
+AOI_NEAR_FRACTION = 0.5      # A látókör ezen hányadán belül minden snapshotban frissítünk
+AOI_FAR_UPDATE_INTERVAL = 3  # A távoli entitások csak minden N. snapshotban frissülnek
+
+MAX_SLOTS = 0x10000          # Slot (= hálózati index) felső korlát a kulcsokhoz
+
+
+class InterestManager:
+    """
+    Kliensenkénti érdeklődési terület (AOI): a kliens csak a látókörén belüli
+    entitásokat kapja, a távolabbiakat ritkábban frissítve.
+    A lekérdezés vektorizált: egy rács (cella kulcs szerint rendezett tömb) segítségével
+    egyszerre áll elő minden (néző, célpont) pár, Python ciklus nélkül.
+    A be- és kilépést a delta snapshot hordozza (új entitás teljes rekorddal,
+    kilépett entitás a 'removed' listában).
+    """
+    def __init__(self, cell_size: float = AOI_CELL_SIZE,
+                 near_fraction: float = AOI_NEAR_FRACTION,
+                 far_update_interval: int = AOI_FAR_UPDATE_INTERVAL):
+        self.cell_size = cell_size
+        self.near_fraction = near_fraction
+        self.far_update_interval = far_update_interval
+        # A távoli nézőknek küldött érték slotonként: csak az esedékes snapshotokban frissül,
+        # így a nem esedékes snapshotokban a deltában sem szerepel
+        self.far_values = np.zeros((0, 4), dtype=np.int64)
+        self.far_valid = np.zeros(0, dtype=bool)
+        # A legutóbbi frissítés sorszáma: a néző csoportok egymás utáni tickekben ugyanazt a
+        # sorszámot kapják, a távoli értékek sorszámonként csak egyszer frissülnek
+        self.far_seq = None
+
+    def forget(self, slot: int):
+        """A slot felszabadult: az új gazdája ne örökölje a régi távoli értéket."""
+        if slot < len(self.far_valid):
+            self.far_valid[slot] = False
+
+    def _update_far_values(self, slots: np.ndarray, values: np.ndarray, seq: int):
+        needed = int(slots.max()) + 1 if len(slots) else 0
+        if needed > len(self.far_valid):
+            size = max(needed, 2 * len(self.far_valid))
+            far_values = np.zeros((size, 4), dtype=np.int64)
+            far_values[:len(self.far_values)] = self.far_values
+            far_valid = np.zeros(size, dtype=bool)
+            far_valid[:len(self.far_valid)] = self.far_valid
+            self.far_values, self.far_valid = far_values, far_valid
+        due = ~self.far_valid[slots]
+        if seq != self.far_seq:
+            self.far_seq = seq
+            due |= (seq + slots) % self.far_update_interval == 0
+        self.far_values[slots[due]] = values[due]
+        self.far_valid[slots[due]] = True
+
+    def candidate_pairs(self, viewer_positions: np.ndarray, reach: int,
+                        target_positions: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (néző sor, célpont sor) jelölt párok: a célpont a néző cellája körüli
+        (2*reach+1)^2 cellás szomszédságban van.
+        """
+        size = self.cell_size
+        viewer_cells = np.floor(viewer_positions / size).astype(np.int64)
+        target_cells = np.floor(target_positions / size).astype(np.int64)
+        n_viewers = len(viewer_positions)
+        n_targets = len(target_positions)
+
+        # Nagy látókörnél (kevés cella / játékos) olcsóbb minden párt megnézni
+        if (2 * reach + 1) ** 2 >= n_targets:
+            return (np.repeat(np.arange(n_viewers), n_targets),
+                    np.tile(np.arange(n_targets), n_viewers))
+
+        # Cella kulcs: x * span + (y - y_min); a szomszédos cellák kulcsa is egyedi marad
+        y_min = min(viewer_cells[:, 1].min(), target_cells[:, 1].min()) - reach
+        y_max = max(viewer_cells[:, 1].max(), target_cells[:, 1].max()) + reach
+        span = y_max - y_min + 1
+        target_keys = target_cells[:, 0] * span + (target_cells[:, 1] - y_min)
+        order = np.argsort(target_keys)
+        sorted_keys = target_keys[order]
+        # A nézőket is cella szerint rendezzük: rendezett keresési kulcsokkal a searchsorted gyorsabb
+        viewer_keys = viewer_cells[:, 0] * span + (viewer_cells[:, 1] - y_min)
+        viewer_rows = np.argsort(viewer_keys)
+        base_keys = viewer_keys[viewer_rows]
+
+        # Az összes szomszéd cella kulcsa egyszerre: (eltolás, néző) mátrix, kiterítve
+        offsets = np.array([dx * span + dy for dx in range(-reach, reach + 1)
+                            for dy in range(-reach, reach + 1)], dtype=np.int64)
+        keys = (offsets[:, None] + base_keys[None, :]).ravel()
+        lo = np.searchsorted(sorted_keys, keys, 'left')
+        counts = np.searchsorted(sorted_keys, keys, 'right') - lo
+        total = int(counts.sum())
+        # Cellánként a rendezett tömb [lo, lo + count) szakasza, egyetlen tömbbe kiterítve
+        starts = np.repeat(lo - (np.cumsum(counts) - counts), counts)
+        viewers = np.repeat(np.tile(viewer_rows, len(offsets)), counts)
+        targets = order[starts + np.arange(total)]
+        return viewers, targets
+
+    def build_views(self, viewer_positions: np.ndarray, viewer_radii: np.ndarray,
+                    target_slots: np.ndarray, target_positions: np.ndarray,
+                    target_values: np.ndarray, seq: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Minden néző nézete egyszerre: (néző sor, célpont slot, kvantált értékek) tömbök,
+        néző, azon belül slot szerint rendezve. A látókör NEAR_FRACTION-jén kívüli
+        célpontok a slot utolsó esedékes (távoli) értékét kapják.
+        """
+        empty = np.zeros(0, dtype=np.int64)
+        if len(viewer_positions) == 0 or len(target_slots) == 0:
+            return empty, empty, np.zeros((0, 4), dtype=np.int64)
+        self._update_far_values(target_slots, target_values, seq)
+
+        reach = max(1, int(math.ceil(float(viewer_radii.max()) / self.cell_size)))
+        viewers, targets = self.candidate_pairs(viewer_positions, reach, target_positions)
+
+        # Koordinátánként külön (1D) tömbbel a fancy indexelés jóval gyorsabb
+        dx = np.ascontiguousarray(target_positions[:, 0])[targets]
+        dx -= np.ascontiguousarray(viewer_positions[:, 0])[viewers]
+        dy = np.ascontiguousarray(target_positions[:, 1])[targets]
+        dy -= np.ascontiguousarray(viewer_positions[:, 1])[viewers]
+        dist_sq = dx * dx
+        dist_sq += dy * dy
+        radii_sq = (viewer_radii * viewer_radii)[viewers]
+        inside = dist_sq <= radii_sq
+
+        # Rendezés (néző, slot) szerint: a távoli jelzőt is a kulcsba kódoljuk, így elég
+        # egyetlen tömböt szűrni és egy egyszerű np.sort-ot futtatni
+        far = dist_sq > radii_sq * (self.near_fraction ** 2)
+        keys = ((viewers * MAX_SLOTS + target_slots[targets]) << 1) | far
+        keys = keys[inside]
+        keys.sort()
+        far = keys & 1
+        keys >>= 1
+        viewers = keys // MAX_SLOTS
+        slots = keys % MAX_SLOTS
+
+        # Közeli: aktuális érték, távoli: a slot utolsó esedékes értéke (egy táblából, egy take-kel)
+        capacity = len(self.far_values)
+        table = np.empty((2 * capacity, 4), dtype=np.int64)
+        table[target_slots] = target_values
+        table[capacity:] = self.far_values
+        values = table.take(slots + far * capacity, axis=0)
+        return viewers, slots, values
@@ -0,0 +1,430 @@
+"""
+Terheléses teszt: sok fej nélküli bot (GameClient) egy vagy néhány folyamatban,
+szkriptelt mozgással és fokozatos felfutással, a helyi szerver ellen.
+Méri a snapshot késleltetést (a STATE szerver időbélyegéből), a kliensenkénti
+sávszélességet, a hibákat, és a szerver tick idejét (a /metrics végpontról).
+Küszöbök megadásával a kilépési kód jelzi a regressziót (CI kapu).
+
+Futtatás a network könyvtárból (a szerver külön fut):
+    python server.py
+    python loadtest.py --clients 1000 --ramp 20 --duration 30 --processes 2
+"""
+import argparse
+import asyncio
+import logging
+import math
+import multiprocessing
+import random
+import resource
+import time
+import urllib.request
+from array import array
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from protocol import (
+    encode_message, peek_state, MSG_TYPE_CLIENT_MOVE, MSG_TYPE_SERVER_STATE, MSG_TYPE_SERVER_ERROR,
+    MSG_TYPE_SERVER_WELCOME, COMMAND_RATE
+)
+from client import GameClient, SERVER_HOST, SERVER_PORT, INPUT_SEND_RATE, WIRE_FORMAT, TRANSPORT
+from udp_transport import TRANSPORT_TCP, TRANSPORT_UDP
+
+# --- Konfiguráció ---
+CONNECT_CONCURRENCY = 50      # Egyszerre ennyi folyamatban lévő csatlakozás (a szerver accept sora)
+METRICS_URL = "http://127.0.0.1:9100/metrics"
+MAX_LATENCY_SAMPLES = 200_000  # Folyamatonként legfeljebb ennyi késleltetés minta (véletlen ritkítás)
+PATTERNS = ("random", "circle", "patrol", "idle", "mixed")
+
+
+def pattern_direction(pattern: str, number: int, t: float, rng: random.Random,
+                      state: Dict[str, object]) -> str:
+    """A bot iránya a t. másodpercben a mozgásminta szerint."""
+    if pattern == "mixed":
+        pattern = ("random", "circle", "patrol")[number % 3]
+    if pattern == "idle":
+        return "none"
+    if pattern == "circle":
+        # Négyzet alakú kör, botonként eltolt fázissal
+        return ("up", "right", "down", "left")[int(t + number * 0.37) % 4]
+    if pattern == "patrol":
+        return "left" if int((t + number * 0.53) / 3.0) % 2 else "right"
+    # random: 2-10 mp-enként új irány
+    if t >= state.get("next_change", 0.0):
+        state["direction"] = rng.choice(("up", "down", "left", "right", "none"))
+        state["next_change"] = t + rng.uniform(2.0, 10.0)
+    return state["direction"]
+
+
+class LoadStats:
+    """Egy folyamat botjainak közös mérései."""
+    def __init__(self):
+        # Késleltetés minta: helyi monoton idő - szerver idő (mp). A legkisebb érték a
+        # (közös gépen azonos) órák eltolása + a legjobb kézbesítés; a többi ehhez képest késik.
+        self.delays = array('d')
+        self.delay_seen = 0
+        self.states = 0
+        self.errors: Counter = Counter()
+        self.rng = random.Random()
+
+    def add_delay(self, delay: float):
+        self.delay_seen += 1
+        if len(self.delays) < MAX_LATENCY_SAMPLES:
+            self.delays.append(delay)
+        else:
+            # Reservoir mintavétel: hosszú futásnál is egyenletes minta
+            slot = self.rng.randrange(self.delay_seen)
+            if slot < MAX_LATENCY_SAMPLES:
+                self.delays[slot] = delay
+
+
+class Bot(GameClient):
+    """
+    Fej nélküli GameClient: nincs render loop, nincs predikció, és a parancsokat
+    a közös LoadTest ütemező adja (nem botonként külön timer).
+    Alapból a STATE-nek csak a fejlécét olvassa (sorszám a nyugtához, szerver idő);
+    full_decode esetén a deltát is visszaállítja (hiányzó baseline = hiba).
+    """
+    def __init__(self, number: int, stats: LoadStats, transport: str, full_decode: bool = False,
+                 compression: bool = False):
+        super().__init__(transport, compression=compression)
+        self.number = number
+        self.full_decode = full_decode
+        self.stats = stats
+        self.pattern_state: Dict[str, object] = {}
+        self.connected_at = 0.0
+
+    def record_command(self, direction: str):
+        self.command_seq += 1
+        self.recent_commands.append(direction)
+
+    def send_commands_nowait(self):
+        if self.protocol is not None and self.is_connected:
+            self.protocol.write(encode_message(MSG_TYPE_CLIENT_MOVE, self.command_payload(), WIRE_FORMAT),
+                                reliable=False)
+
+    def on_frame(self, frame: memoryview):
+        header = None if self.full_decode else peek_state(frame)
+        if header is None:
+            super().on_frame(frame)
+            return
+        seq, _, server_time, _ = header
+        self.record_state(server_time)
+        if seq > self.snapshots.last_seq:
+            self.snapshots.last_seq = seq
+
+    def record_state(self, server_time_ms: int):
+        self.stats.add_delay(time.monotonic() - server_time_ms / 1000.0)
+        self.stats.states += 1
+
+    def process_server_message(self, message: Dict):
+        msg_type = message.get("type")
+        payload = message.get("payload", {})
+        if msg_type == MSG_TYPE_SERVER_STATE:
+            self.record_state(payload.get("time", 0))
+            # A delta visszaállítás kell a nyugtához (különben minden snapshot keyframe lenne)
+            self.snapshots.apply(payload)
+        elif msg_type == MSG_TYPE_SERVER_ERROR:
+            self.stats.errors[f"server: {payload.get('reason', 'unknown')}"] += 1
+        elif msg_type == MSG_TYPE_SERVER_WELCOME:
+            self.client_index = payload.get("index")
+
+    def on_entity_enter(self, index, player):
+        pass
+
+    def on_entity_leave(self, index):
+        pass
+
+    async def watch(self):
+        """A kapcsolat váratlan bontásának észlelése."""
+        exc = await self.protocol.closed_future
+        if self.is_connected:
+            self.is_connected = False
+            self.stats.errors["disconnected" if exc is None else "connection reset"] += 1
+
+
+class LoadTest:
+    """Egy folyamat botjai: felfutás, közös 60 Hz-es input ütemező, majd lebontás."""
+    def __init__(self, clients: int, first_number: int, ramp: float, duration: float,
+                 pattern: str, transport: str, host: str, port: int, full_decode: bool = False,
+                 compression: bool = False):
+        self.clients = clients
+        self.first_number = first_number
+        self.ramp = ramp
+        self.duration = duration
+        self.pattern = pattern
+        self.transport = transport
+        self.host = host
+        self.port = port
+        self.full_decode = full_decode
+        self.compression = compression
+        self.stats = LoadStats()
+        self.bots: List[Bot] = []
+        self.rng = random.Random(first_number)
+        self.connect_failures = 0
+        self.peak_connected = 0
+
+    async def connect_bot(self, number: int, semaphore: asyncio.Semaphore):
+        bot = Bot(number, self.stats, self.transport, self.full_decode, self.compression)
+        async with semaphore:
+            try:
+                await bot.connect(self.host, self.port)
+            except (OSError, asyncio.TimeoutError) as e:
+                self.connect_failures += 1
+                self.stats.errors[f"connect: {type(e).__name__}"] += 1
+                return
+        bot.connected_at = time.monotonic()
+        self.bots.append(bot)
+        asyncio.create_task(bot.watch())
+
+    async def run(self) -> Dict:
+        semaphore = asyncio.Semaphore(CONNECT_CONCURRENCY)
+        start = time.monotonic()
+        end = start + self.ramp + self.duration
+        spawned = 0
+        tick = 0
+        interval = 1.0 / COMMAND_RATE
+        per_packet = max(1, COMMAND_RATE // INPUT_SEND_RATE)
+        connect_tasks = []
+        steady_start = start + self.ramp
+        steady_bytes: Optional[Tuple[int, int, float]] = None
+
+        while True:
+            now = time.monotonic()
+            if now >= end:
+                break
+            # Felfutás: lineárisan érjük el a célszámot a ramp végére
+            target = self.clients if self.ramp <= 0 else min(
+                self.clients, math.ceil(self.clients * (now - start) / self.ramp))
+            while spawned < target:
+                connect_tasks.append(asyncio.create_task(
+                    self.connect_bot(self.first_number + spawned, semaphore)))
+                spawned += 1
+            if steady_bytes is None and now >= steady_start:
+                steady_bytes = self.traffic() + (now,)
+
+            # Minden bot egy parancsot kap tickenként; a küldés botonként eltolva (egyenletes terhelés)
+            t = now - start
+            for bot in self.bots:
+                if not bot.is_connected:
+                    continue
+                bot.record_command(pattern_direction(self.pattern, bot.number, t, self.rng,
+                                                     bot.pattern_state))
+                if (bot.command_seq + bot.number) % per_packet == 0:
+                    bot.send_commands_nowait()
+            if tick % COMMAND_RATE == 0:
+                connected = sum(1 for bot in self.bots if bot.is_connected)
+                self.peak_connected = max(self.peak_connected, connected)
+
+            tick += 1
+            await asyncio.sleep(max(0.0, start + tick * interval - time.monotonic()))
+
+        await asyncio.gather(*connect_tasks, return_exceptions=True)
+        finished = time.monotonic()
+        received, sent = self.traffic()
+        if steady_bytes is None:
+            steady_bytes = (0, 0, start)
+        steady_seconds = max(1e-6, finished - steady_bytes[2])
+        per_client = [(bot.protocol.bytes_received if bot.protocol else 0) for bot in self.bots]
+        connected = sum(1 for bot in self.bots if bot.is_connected)
+        for bot in self.bots:
+            bot.is_connected = False
+            bot.close()
+        await asyncio.sleep(0.1)
+        return {
+            "clients": self.clients,
+            "connected": connected,
+            "peak_connected": self.peak_connected,
+            "connect_failures": self.connect_failures,
+            "states": self.stats.states,
+            "delays": self.stats.delays.tobytes(),
+            "errors": dict(self.stats.errors),
+            "missing_baselines": sum(bot.snapshots.missing_baselines for bot in self.bots),
+            "steady_received": received - steady_bytes[0],
+            "steady_sent": sent - steady_bytes[1],
+            "steady_seconds": steady_seconds,
+            "client_rates": [b / max(1e-6, finished - bot.connected_at)
+                             for b, bot in zip(per_client, self.bots)],
+            "elapsed": finished - start,
+        }
+
+    def traffic(self) -> Tuple[int, int]:
+        received = sum(bot.protocol.bytes_received for bot in self.bots if bot.protocol)
+        sent = sum(bot.protocol.bytes_sent for bot in self.bots if bot.protocol)
+        return received, sent
+
+
+def raise_fd_limit(needed: int):
+    """Sok kapcsolathoz kevés lehet az alap fájlleíró korlát: a soft limitet a hard-ig emeljük."""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < needed:
+        new_soft = needed if hard == resource.RLIM_INFINITY else min(hard, needed)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (new_soft, hard))
+
+
+def run_process(args: Tuple) -> Dict:
+    clients, first_number, ramp, duration, pattern, transport, host, port, full_decode, compression = args
+    logging.getLogger().setLevel(logging.WARNING)
+    raise_fd_limit(clients + 256)
+    return asyncio.run(LoadTest(clients, first_number, ramp, duration, pattern,
+                                transport, host, port, full_decode, compression).run())
+
+
+# --- Szerver metrikák ---
+
+def scrape_histogram(urls: List[str], name: str) -> Optional[Tuple[List[Tuple[float, float]], float, float]]:
+    """A szerver(ek) hisztogramja: ([(felső határ, kumulált db)], összeg, darab), zónákon összegezve."""
+    buckets: Dict[float, float] = {}
+    total_sum = total_count = 0.0
+    found = False
+    for url in urls:
+        try:
+            text = urllib.request.urlopen(url, timeout=5).read().decode()
+        except OSError:
+            continue
+        for line in text.splitlines():
+            if line.startswith(f"{name}_bucket"):
+                bound = line[line.index('le="') + 4:line.index('"}')]
+                bound = math.inf if bound == "+Inf" else float(bound)
+                buckets[bound] = buckets.get(bound, 0.0) + float(line.rsplit(" ", 1)[1])
+                found = True
+            elif line.startswith(f"{name}_sum "):
+                total_sum += float(line.rsplit(" ", 1)[1])
+            elif line.startswith(f"{name}_count "):
+                total_count += float(line.rsplit(" ", 1)[1])
+    if not found:
+        return None
+    return sorted(buckets.items()), total_sum, total_count
+
+
+def histogram_delta(before, after):
+    if after is None:
+        return None
+    if before is None:
+        return after
+    previous = dict(before[0])
+    return ([(bound, count - previous.get(bound, 0.0)) for bound, count in after[0]],
+            after[1] - before[1], after[2] - before[2])
+
+
+def histogram_quantile(histogram, fraction: float) -> float:
+    """Becslés a vödrökből (a Prometheus histogram_quantile módjára, vödrön belül lineárisan)."""
+    buckets, _, count = histogram
+    if count <= 0:
+        return 0.0
+    rank = fraction * count
+    lower_bound, lower_count = 0.0, 0.0
+    for bound, cumulative in buckets:
+        if cumulative >= rank:
+            if math.isinf(bound):
+                return lower_bound
+            width = cumulative - lower_count
+            return lower_bound + (bound - lower_bound) * ((rank - lower_count) / width if width else 1.0)
+        lower_bound, lower_count = bound, cumulative
+    return lower_bound
+
+
+def percentile(samples, fraction):
+    if not len(samples):
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="RoguelikeShooter swarm load test")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--processes", type=int, default=1, help="Bot processes (clients are split)")
+    parser.add_argument("--ramp", type=float, default=10.0, help="Seconds to reach the full client count")
+    parser.add_argument("--duration", type=float, default=20.0, help="Steady-state seconds after the ramp")
+    parser.add_argument("--pattern", choices=PATTERNS, default="mixed")
+    parser.add_argument("--transport", choices=[TRANSPORT_TCP, TRANSPORT_UDP], default=TRANSPORT)
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--decode", action="store_true",
+                        help="Rebuild every delta snapshot (validates baselines, costs bot CPU)")
+    parser.add_argument("--compress", action="store_true",
+                        help="Bots request compressed snapshots (bandwidth vs. server CPU)")
+    parser.add_argument("--metrics-url", nargs="*", default=[METRICS_URL],
+                        help="Server /metrics endpoint(s); several for sharded zones")
+    # Kapu: ha valamelyik küszöb sérül, a kilépési kód 1
+    parser.add_argument("--max-tick-p99-ms", type=float, help="Fail if server tick p99 exceeds this")
+    parser.add_argument("--max-latency-p99-ms", type=float, help="Fail if snapshot latency p99 exceeds this")
+    parser.add_argument("--max-error-rate", type=float, help="Fail if errors per client exceed this")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    processes = max(1, min(args.processes, args.clients))
+    shares = [args.clients // processes + (i < args.clients % processes) for i in range(processes)]
+    jobs = [(share, sum(shares[:i]), args.ramp, args.duration, args.pattern, args.transport,
+             args.host, args.port, args.decode, args.compress) for i, share in enumerate(shares)]
+
+    tick_before = scrape_histogram(args.metrics_url, "roguelike_tick_seconds")
+    if processes == 1:
+        results = [run_process(jobs[0])]
+    else:
+        with multiprocessing.get_context("fork").Pool(processes) as pool:
+            results = pool.map(run_process, jobs)
+    tick = histogram_delta(tick_before, scrape_histogram(args.metrics_url, "roguelike_tick_seconds"))
+
+    # Késleltetés: a közös monoton órán a legkisebb eltolás a viszonyítási alap
+    delays = array('d')
+    for result in results:
+        delays.frombytes(result["delays"])
+    base = min(delays) if delays else 0.0
+    latency_ms = [(d - base) * 1000 for d in delays]
+
+    errors: Counter = Counter()
+    for result in results:
+        errors.update(result["errors"])
+    error_count = sum(errors.values()) + sum(r["missing_baselines"] for r in results)
+    connected = sum(r["connected"] for r in results)
+    steady_seconds = max(r["steady_seconds"] for r in results)
+    client_rates = [rate for r in results for rate in r["client_rates"]]
+    elapsed = max(r["elapsed"] for r in results)
+
+    print(f"Load test: {args.clients} clients ({args.pattern}, {args.transport}"
+          f"{', compressed' if args.compress else ''}) in {processes} process(es), "
+          f"ramp {args.ramp:.0f}s + steady {args.duration:.0f}s")
+    print(f"  connected at end   {connected}/{args.clients} "
+          f"(peak {sum(r['peak_connected'] for r in results)}, "
+          f"connect failures {sum(r['connect_failures'] for r in results)})")
+    states = sum(r["states"] for r in results)
+    print(f"  snapshots          {states} total, {states / max(1, args.clients) / elapsed:.1f}/s per client")
+    print(f"  snapshot latency   p50 {percentile(latency_ms, 0.5):.2f} ms, p95 {percentile(latency_ms, 0.95):.2f} ms, "
+          f"p99 {percentile(latency_ms, 0.99):.2f} ms (over the fastest delivery)")
+    down = sum(r["steady_received"] for r in results) / steady_seconds / max(1, connected) / 1024
+    up = sum(r["steady_sent"] for r in results) / steady_seconds / max(1, connected) / 1024
+    print(f"  bandwidth/client   down {down:.2f} kB/s (p95 {percentile(client_rates, 0.95) / 1024:.2f}), "
+          f"up {up:.2f} kB/s")
+    print(f"  errors             {error_count} ({error_count / max(1, args.clients):.3f} per client)")
+    for reason, count in errors.most_common():
+        print(f"    {count:>8}  {reason}")
+    missing = sum(r["missing_baselines"] for r in results)
+    if missing:
+        print(f"    {missing:>8}  missing snapshot baselines")
+    if tick is not None and tick[2] > 0:
+        tick_p99 = histogram_quantile(tick, 0.99) * 1000
+        print(f"  server tick        mean {tick[1] / tick[2] * 1000:.2f} ms, "
+              f"p50 ~{histogram_quantile(tick, 0.5) * 1000:.2f} ms, p99 ~{tick_p99:.2f} ms "
+              f"({int(tick[2])} ticks)")
+    else:
+        tick_p99 = None
+        print("  server tick        n/a (metrics endpoint not reachable)")
+
+    failures = []
+    if args.max_tick_p99_ms is not None and (tick_p99 is None or tick_p99 > args.max_tick_p99_ms):
+        failures.append("server tick p99")
+    if args.max_latency_p99_ms is not None and percentile(latency_ms, 0.99) > args.max_latency_p99_ms:
+        failures.append("snapshot latency p99")
+    if args.max_error_rate is not None and error_count / max(1, args.clients) > args.max_error_rate:
+        failures.append("error rate")
+    if failures:
+        print("FAILED: " + ", ".join(failures))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,87 @@
+import asyncio
+import logging
+from bisect import bisect_left
+from typing import Callable, Iterable, List, Sequence, Tuple
+
+# --- Konfiguráció ---
+METRICS_HOST = '127.0.0.1'   # Csak helyben (a scraper ugyanazon a gépen / tunnelen át olvas)
+METRICS_PORT = 9100
+TICK_BUCKETS = (0.0005, 0.001, 0.002, 0.004, 0.008, 0.012, 0.0167, 0.025, 0.05, 0.1, 0.25)
+REQUEST_TIMEOUT = 5.0        # mp, ennyi ideje van a scrapernek elküldeni a kérést
+
+# Egy minta: (címkék, érték); a címkék (név, érték) párok
+Sample = Tuple[Sequence[Tuple[str, object]], float]
+
+
+class Histogram:
+    """
+    Prometheus stílusú hisztogram fix vödrökkel. A megfigyelés egy bisect és két
+    összeadás (élesben is bekapcsolva hagyható); a kumulált számokat csak a lekérdezés számolja.
+    """
+    def __init__(self, buckets: Sequence[float] = TICK_BUCKETS):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)   # Az utolsó: +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, lines: List[str], name: str, help_text: str):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum {self.sum}")
+        lines.append(f"{name}_count {self.count}")
+
+
+def render_metric(lines: List[str], name: str, kind: str, help_text: str,
+                  samples: Iterable[Sample]):
+    """Egy counter / gauge metrika a Prometheus szöveges formátumában."""
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+    for labels, value in samples:
+        if labels:
+            label_text = ",".join(f'{key}="{value}"' for key, value in labels)
+            lines.append(f"{name}{{{label_text}}} {value}")
+        else:
+            lines.append(f"{name} {value}")
+
+
+async def serve_metrics(render: Callable[[], str], host: str = METRICS_HOST,
+                        port: int = METRICS_PORT) -> asyncio.AbstractServer:
+    """
+    Minimális HTTP végpont (GET /metrics): a render csak lekérdezéskor fut,
+    a játék loop-ban nincs extra munka.
+    """
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), REQUEST_TIMEOUT)
+            while (await asyncio.wait_for(reader.readline(), REQUEST_TIMEOUT)) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] in ("/", "/metrics"):
+                status, body = "200 OK", render().encode()
+            else:
+                status, body = "404 Not Found", b"Not found\n"
+            writer.write(f"HTTP/1.1 {status}\r\n"
+                         "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                         f"Content-Length: {len(body)}\r\n"
+                         "Connection: close\r\n\r\n".encode() + body)
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        except Exception as e:
+            logging.error(f"Metrics request failed: {e}")
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    logging.info(f"Metrics endpoint on http://{host}:{port}/metrics")
+    return server
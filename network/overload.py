@@ -0,0 +1,137 @@
+import logging
+import time
+from collections import deque
+from typing import Callable, Dict, List
+
+# --- Konfiguráció ---
+OVERLOAD_WINDOW = 120           # Ennyi utolsó tick idejéből számolunk percentilist (2 mp 60 Hz-en)
+OVERLOAD_PERCENTILE = 0.95
+OVERLOAD_HIGH = 0.8             # A tick intervallum ennyi része felett eggyel romlik a szint
+OVERLOAD_LOW = 0.5              # Ennyi alatt (RECOVERY_HOLD ideig) eggyel javul
+OVERLOAD_EVALUATE_INTERVAL = 1.0  # mp, ennyi időnként döntünk
+OVERLOAD_RECOVERY_HOLD = 5.0    # mp, ennyi ideig kell alacsonynak lennie a terhelésnek a javuláshoz
+
+# Degradációs szintek (egymásra épülnek: a magasabb szint az alacsonyabbak intézkedéseit is tartalmazza)
+LEVEL_NORMAL = 0
+LEVEL_REDUCE_FAR = 1       # Több entitás számít távolinak (ritkább frissítés)
+LEVEL_WIDEN_AOI = 2        # A távoli entitások még ritkábban frissülnek
+LEVEL_THROTTLE_JOINS = 3   # Új kapcsolatok korlátozott ütemben
+LEVEL_REJECT_JOINS = 4     # Új kapcsolat nem fogadható
+LEVEL_NAMES = ["normal", "reduce_far", "widen_aoi", "throttle_joins", "reject_joins"]
+
+# Szintenkénti AOI paraméterek: (közeli hányad, távoli frissítési intervallum)
+LEVEL_AOI = [
+    (0.5, 3),
+    (0.25, 3),
+    (0.25, 6),
+    (0.25, 6),
+    (0.25, 6),
+]
+THROTTLED_JOINS_PER_SECOND = 2.0
+
+
+class OverloadController:
+    """
+    Túlterhelés védelem: a tick idők percentilise alapján lépcsőzetesen rontja a
+    kiszolgálás minőségét (AOI frissítés ritkítása, csatlakozások korlátozása, majd
+    elutasítása), és a terhelés csökkenésével magától visszaáll.
+    Egyszerre csak egy szintet lép; a javuláshoz tartósan alacsony terhelés kell (hiszterézis).
+    """
+    def __init__(self, tick_interval: float,
+                 on_level_change: Callable[[int, int], None] = lambda old, new: None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.tick_interval = tick_interval
+        self.on_level_change = on_level_change
+        self.clock = clock
+        self.samples: deque = deque(maxlen=OVERLOAD_WINDOW)
+        self.level = LEVEL_NORMAL
+        now = clock()
+        self.last_evaluate = now
+        self.low_since = None     # Mióta alacsony a terhelés (None: nem alacsony)
+        self.last_percentile = 0.0
+
+        # Statisztika
+        self.level_changes = 0
+        self.escalations = 0      # Ebből romlás (a többi visszaállás)
+        self.rejected_joins = 0
+        self.throttled_joins = 0
+
+        # Csatlakozás korlátozás (token vödör) a THROTTLE_JOINS szinten
+        self.join_tokens = THROTTLED_JOINS_PER_SECOND
+        self.last_join_refill = now
+
+    def record_tick(self, duration: float):
+        """Egy tick teljes ideje (szimuláció + az esetleges snapshot küldés), mp-ben."""
+        self.samples.append(duration)
+
+    def percentile(self) -> float:
+        if not self.samples:
+            return 0.0
+        ordered: List[float] = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * OVERLOAD_PERCENTILE))]
+
+    def evaluate(self):
+        """Időnként (a tick loop-ból hívva) a szint igazítása a mért terheléshez."""
+        now = self.clock()
+        # Szintváltás után friss mintákra várunk, hogy az intézkedés hatása látsszon
+        if (now - self.last_evaluate < OVERLOAD_EVALUATE_INTERVAL
+                or len(self.samples) < OVERLOAD_WINDOW // 2):
+            return
+        self.last_evaluate = now
+        load = self.percentile() / self.tick_interval
+        self.last_percentile = load
+
+        if load > OVERLOAD_HIGH:
+            self.low_since = None
+            if self.level < LEVEL_REJECT_JOINS:
+                self.set_level(self.level + 1, load)
+        elif load < OVERLOAD_LOW:
+            if self.low_since is None:
+                self.low_since = now
+            elif self.level > LEVEL_NORMAL and now - self.low_since >= OVERLOAD_RECOVERY_HOLD:
+                self.low_since = now
+                self.set_level(self.level - 1, load)
+        else:
+            self.low_since = None
+
+    def set_level(self, level: int, load: float = 0.0):
+        old = self.level
+        if level == old:
+            return
+        self.level = level
+        self.level_changes += 1
+        self.samples.clear()
+        if level > old:
+            self.escalations += 1
+            logging.warning(f"Overload: level {LEVEL_NAMES[old]} -> {LEVEL_NAMES[level]} "
+                            f"(tick p{int(OVERLOAD_PERCENTILE * 100)} at {load:.0%} of budget)")
+        else:
+            logging.info(f"Overload: level {LEVEL_NAMES[old]} -> {LEVEL_NAMES[level]} "
+                         f"(tick p{int(OVERLOAD_PERCENTILE * 100)} at {load:.0%} of budget)")
+        self.on_level_change(old, level)
+
+    def admit_join(self) -> bool:
+        """Fogadható-e most új kapcsolat (a döntést számolja is)."""
+        if self.level >= LEVEL_REJECT_JOINS:
+            self.rejected_joins += 1
+            return False
+        if self.level >= LEVEL_THROTTLE_JOINS:
+            now = self.clock()
+            refill = (now - self.last_join_refill) * THROTTLED_JOINS_PER_SECOND
+            self.join_tokens = min(THROTTLED_JOINS_PER_SECOND, self.join_tokens + refill)
+            self.last_join_refill = now
+            if self.join_tokens < 1:
+                self.throttled_joins += 1
+                return False
+            self.join_tokens -= 1
+        return True
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "level": LEVEL_NAMES[self.level],
+            "tick_load": f"{self.last_percentile:.0%}",
+            "level_changes": self.level_changes,
+            "escalations": self.escalations,
+            "throttled_joins": self.throttled_joins,
+            "rejected_joins": self.rejected_joins,
+        }
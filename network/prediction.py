@@ -0,0 +1,147 @@
+import math
+from collections import deque
+from typing import Dict, Any, Optional, Tuple
+
+from protocol import PlayerState, FIELD_NAMES, apply_direction, step_player
+
+# --- Konfiguráció ---
+INTERPOLATION_DELAY = 0.1   # mp: ennyivel a becsült szerver idő mögött renderelünk (2 snapshot 20 Hz-en)
+JITTER_BUFFER_SIZE = 32     # Ennyi időbélyegzett snapshotot tartunk meg
+MAX_EXTRAPOLATION = 0.1     # mp: ha nincs újabb snapshot, legfeljebb ennyit extrapolálunk
+CLOCK_FAST_ADAPT = 0.5      # Kisebb késleltetésű mintát gyorsan elfogadunk
+CLOCK_SLOW_ADAPT = 0.02     # Nagyobb késleltetésű mintát lassan követünk (óra drift)
+ERROR_SMOOTHING = 10.0      # 1/mp: a predikciós hiba ilyen ütemben tűnik el a renderből
+SNAP_DISTANCE = 5.0         # Ennél nagyobb eltérést nem simítunk (teleport)
+MAX_PENDING_COMMANDS = 256  # Nyugtázatlan parancsok felső korlátja
+
+
+class ClockSync:
+    """
+    Szerver idő becslése: offset = szerver idő - helyi idő.
+    A minták a hálózati késleltetéssel torzítanak lefelé, ezért a legkevésbé késett
+    (legnagyobb) mintákhoz igazodunk gyorsan, a kisebbekhez csak lassan (drift).
+    """
+    def __init__(self):
+        self.offset: Optional[float] = None
+        self.samples = 0
+
+    def add_sample(self, server_time: float, local_time: float):
+        sample = server_time - local_time
+        self.samples += 1
+        if self.offset is None:
+            self.offset = sample
+        elif sample > self.offset:
+            self.offset += (sample - self.offset) * CLOCK_FAST_ADAPT
+        else:
+            self.offset += (sample - self.offset) * CLOCK_SLOW_ADAPT
+
+    def server_now(self, local_time: float) -> Optional[float]:
+        if self.offset is None:
+            return None
+        return local_time + self.offset
+
+
+class InterpolationBuffer:
+    """
+    Jitter puffer: időbélyegzett snapshotok, amelyek között a távoli játékosok
+    pozícióját INTERPOLATION_DELAY-jel a szerver idő mögött interpoláljuk.
+    """
+    def __init__(self, delay: float = INTERPOLATION_DELAY, size: int = JITTER_BUFFER_SIZE):
+        self.delay = delay
+        self.snapshots: deque = deque(maxlen=size)  # (szerver idő, {index: játékos szótár})
+        self.late = 0           # Elkésett (a legújabbnál régebbi) snapshotok
+        self.extrapolated = 0   # Renderelések, amikor kifutottunk a pufferből
+
+    def push(self, server_time: float, players: Dict[int, Dict[str, Any]]):
+        if self.snapshots and server_time <= self.snapshots[-1][0]:
+            self.late += 1
+            return
+        self.snapshots.append((server_time, players))
+
+    def sample(self, render_time: float) -> Dict[int, Dict[str, Any]]:
+        """Játékos állapotok a render_time pillanatban (interpolálva / korlátosan extrapolálva)."""
+        snapshots = self.snapshots
+        if not snapshots:
+            return {}
+        # A render időnél régebbi snapshotok közül csak a legutolsó kell
+        while len(snapshots) >= 2 and snapshots[1][0] <= render_time:
+            snapshots.popleft()
+
+        t0, older = snapshots[0]
+        if render_time <= t0:
+            return older
+        if len(snapshots) < 2:
+            self.extrapolated += 1
+            dt = min(render_time - t0, MAX_EXTRAPOLATION)
+            return {index: dict(p, x=p["x"] + p["vx"] * dt, y=p["y"] + p["vy"] * dt)
+                    for index, p in older.items()}
+
+        t1, newer = snapshots[1]
+        alpha = (render_time - t0) / (t1 - t0)
+        result = {}
+        for index, p1 in newer.items():
+            p0 = older.get(index)
+            if p0 is None:
+                result[index] = p1
+                continue
+            entry = {"index": index}
+            for name in FIELD_NAMES:
+                entry[name] = p0[name] + (p1[name] - p0[name]) * alpha
+            result[index] = entry
+        return result
+
+
+class PlayerPredictor:
+    """
+    Saját játékos predikciója: minden kiadott parancsot azonnal alkalmaz, a szerver
+    állapotánál az input_ack-ig nyugtázott parancsokat eldobja, a maradékot újrajátssza.
+    Az egyeztetés okozta ugrást a render fokozatosan simítja el.
+    """
+    def __init__(self, command_dt: float):
+        self.command_dt = command_dt
+        self.state = PlayerState("local")
+        self.pending: deque = deque(maxlen=MAX_PENDING_COMMANDS)  # (sorszám, irány)
+        self.initialized = False
+        self.error_x = 0.0
+        self.error_y = 0.0
+        self.corrections = 0   # Egyeztetések, amikor a predikció eltért
+
+    def apply_command(self, seq: int, direction: str):
+        self.pending.append((seq, direction))
+        if self.initialized:
+            apply_direction(self.state, direction)
+            step_player(self.state, self.command_dt)
+
+    def reconcile(self, authoritative: Dict[str, Any], input_ack: int):
+        while self.pending and self.pending[0][0] <= input_ack:
+            self.pending.popleft()
+
+        predicted_x, predicted_y = self.state.x, self.state.y
+        state = self.state
+        state.x = authoritative["x"]
+        state.y = authoritative["y"]
+        state.vx = authoritative["vx"]
+        state.vy = authoritative["vy"]
+        for _, direction in self.pending:
+            apply_direction(state, direction)
+            step_player(state, self.command_dt)
+
+        if not self.initialized:
+            self.initialized = True
+            return
+        dx = predicted_x - state.x
+        dy = predicted_y - state.y
+        if dx * dx + dy * dy > SNAP_DISTANCE * SNAP_DISTANCE:
+            self.error_x = self.error_y = 0.0
+        else:
+            self.error_x += dx
+            self.error_y += dy
+        if abs(dx) > 0.01 or abs(dy) > 0.01:
+            self.corrections += 1
+
+    def render_position(self, dt: float) -> Tuple[float, float]:
+        """A megjelenített pozíció: predikció + fogyó korrekciós hiba."""
+        decay = math.exp(-ERROR_SMOOTHING * dt)
+        self.error_x *= decay
+        self.error_y *= decay
+        return self.state.x + self.error_x, self.state.y + self.error_y
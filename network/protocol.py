@@ -1,28 +1,117 @@
 import json
 import struct
 import time
-from typing import Dict, Any, List, Optional
+import zlib
+from typing import Dict, Any, List, Optional, Iterable
+
+import numpy as np
+
+from compression import deflate, inflate
 
 # --- Konstansok és Konfiguráció ---
 # 4 bájtos kis-endian ('<I') egész szám a csomag hosszának tárolására.
-HEADER_FORMAT = '<I' 
+HEADER_FORMAT = '<I'
 HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
 ENCODING = 'utf-8'
 
 # Üzenettípusok (Client -> Server)
-MSG_TYPE_CLIENT_MOVE = "MOVE"  # Játékos mozgási szándékot küld
+MSG_TYPE_CLIENT_MOVE = "MOVE"  # Sorszámozott input parancsok (az utolsó néhány, redundánsan)
+MSG_TYPE_CLIENT_HELLO = "HELLO"  # Csatlakozás után: a kliens képességei (pl. tömörítés)
 
 # Üzenettípusok (Server -> Client)
 MSG_TYPE_SERVER_STATE = "STATE"  # Teljes játéktér állapotának broadcastolása
 MSG_TYPE_SERVER_ERROR = "ERROR"  # Hiba, pl. rate limit
 MSG_TYPE_SERVER_ACK = "ACK"    # Általános nyugtázás
+MSG_TYPE_SERVER_WELCOME = "WELCOME"  # Csatlakozáskor: a kliens saját játékos indexe
+
+# --- Bináris formátum ---
+# Üzenet törzs: [verzió (B)] [üzenet azonosító (B)] [flagek (B)] [típusfüggő adat]
+# A JSON debug üzenetek '{'-vel kezdődnek, így a dekódoló mindkettőt felismeri.
+PROTOCOL_VERSION = 4
+BODY_HEADER = struct.Struct('<BBB')
+# Flagek: tömörített üzenetnél a fejléc után a teljes eredeti törzs jön (raw deflate, szótárral),
+# így JSON debug üzenet is tömöríthető; a fejléc azonosítója a belső üzeneté
+FLAG_COMPRESSED = 0x01
+COMPRESSION_THRESHOLD = 192   # bájt, ennél kisebb törzset nem tömörítünk (nem éri meg)
+
+WIRE_FORMAT_BINARY = "binary"
+WIRE_FORMAT_JSON = "json"   # Olvasható debug mód (a régi formátum)
+
+MSG_IDS = {
+    MSG_TYPE_CLIENT_MOVE: 1,
+    MSG_TYPE_SERVER_STATE: 2,
+    MSG_TYPE_SERVER_ERROR: 3,
+    MSG_TYPE_SERVER_ACK: 4,
+    MSG_TYPE_SERVER_WELCOME: 5,
+    MSG_TYPE_CLIENT_HELLO: 6,
+}
+MSG_NAMES = {msg_id: name for name, msg_id in MSG_IDS.items()}
+
+# Kvantálás: pozíció 1/100 egység (i32), sebesség 1/100 egység/mp (i16)
+POSITION_SCALE = 100.0
+VELOCITY_SCALE = 100.0
+VELOCITY_LIMIT = 32767 / VELOCITY_SCALE
+
+# STATE (delta snapshot):
+#   fejléc: snapshot sorszám (I), alap snapshot (I, 0 = teljes keyframe),
+#           szerver idő ms-ban (I, órakülönbség becsléshez / interpolációhoz),
+#           a címzett utolsó alkalmazott input parancsa (I, predikció egyeztetéshez),
+#           változott entitások száma (H), eltűnt entitások száma (H)
+#   változott entitásonként: index (H), mező maszk (B), majd csak a maszkban jelölt mezők
+#   eltűnt entitásonként: index (H)
+STATE_HEADER = struct.Struct('<IIIIHH')
+STATE_REMOVED = struct.Struct('<H')
+FIELD_NAMES = ("x", "y", "vx", "vy")
+FIELD_FORMATS = ("i", "i", "h", "h")
+FIELD_SCALES = (POSITION_SCALE, POSITION_SCALE, VELOCITY_SCALE, VELOCITY_SCALE)
+FIELD_ALL = (1 << len(FIELD_NAMES)) - 1
+NO_BASELINE = 0
+
+# Maszkonként előre összeállított layout és a benne szereplő mezők indexei
+MASK_FIELDS = [tuple(i for i in range(len(FIELD_NAMES)) if mask & (1 << i))
+               for mask in range(FIELD_ALL + 1)]
+MASK_LAYOUTS = [struct.Struct('<HB' + ''.join(FIELD_FORMATS[i] for i in fields))
+                for fields in MASK_FIELDS]
+# Ugyanezek numpy rekord típusként (tömbös kódoláshoz, bájtra azonos a struct layouttal)
+MASK_DTYPES = [np.dtype([("index", "<u2"), ("mask", "u1")] +
+                        [(FIELD_NAMES[i], "<" + FIELD_FORMATS[i]) for i in fields])
+               for fields in MASK_FIELDS]
+# Tömbös kódolás: minden sor a teljes layouttal készül, majd maszkonként csak a jelölt mezők
+# bájtjai maradnak meg (MASK_KEEP[maszk] = megtartott bájtok a teljes rekordban)
+FULL_RECORD_DTYPE = MASK_DTYPES[FIELD_ALL]
+MASK_KEEP = np.zeros((FIELD_ALL + 1, FULL_RECORD_DTYPE.itemsize), dtype=bool)
+for _mask, _fields in enumerate(MASK_FIELDS):
+    MASK_KEEP[_mask, :3] = True
+    for _i in _fields:
+        _offset = FULL_RECORD_DTYPE.fields[FIELD_NAMES[_i]][1]
+        MASK_KEEP[_mask, _offset:_offset + struct.calcsize(FIELD_FORMATS[_i])] = True
+MASK_SIZES = MASK_KEEP.sum(axis=1)
+# Keret eleje egyben: hossz előtag + BODY_HEADER + STATE_HEADER
+STATE_FRAME_DTYPE = np.dtype([("length", "<u4"), ("version", "u1"), ("msg_id", "u1"), ("flags", "u1"),
+                              ("seq", "<u4"), ("baseline", "<u4"), ("time", "<u4"), ("input_ack", "<u4"),
+                              ("changed", "<u2"), ("removed", "<u2")])
+
+# MOVE: utolsó megkapott snapshot sorszáma (I) - ez a kliens nyugtája,
+#       a legújabb parancs sorszáma (I), parancsok száma (B), majd parancsonként irány (B).
+#       A parancsok egymást követő sorszámúak, a legújabb az utolsó.
+DIRECTIONS = ("none", "up", "down", "left", "right")
+DIRECTION_IDS = {name: i for i, name in enumerate(DIRECTIONS)}
+MOVE_LAYOUT = struct.Struct('<IIB')
+MAX_MOVE_COMMANDS = 255
+
+# WELCOME: játékos index (H) + UUID (16 bájt)
+WELCOME_LAYOUT = struct.Struct('<H16s')
+
+# Szöveges mező (ERROR): hossz (H) + UTF-8
+TEXT_LENGTH = struct.Struct('<H')
 
 # --- Adatmodellek ---
 
 class PlayerState:
     """Egy játékos pillanatnyi állapotát tároló adatosztály."""
-    def __init__(self, player_id: str):
+    def __init__(self, player_id: str, index: int = 0):
         self.id: str = player_id
+        self.index: int = index  # Kompakt azonosító a hálózaton (a UUID helyett)
         self.x: float = 0.0
         self.y: float = 0.0
         self.vx: float = 0.0 # Velocity (sebesség) x
@@ -32,64 +121,349 @@ class PlayerState:
     def to_dict(self) -> Dict[str, Any]:
         """Konvertálás szótárrá hálózati küldéshez."""
         return {
-            "id": self.id,
+            "index": self.index,
             "x": round(self.x, 2),
             "y": round(self.y, 2),
             "vx": round(self.vx, 2),
             "vy": round(self.vy, 2)
         }
-    
+
     @staticmethod
     def from_dict(data: Dict[str, Any]) -> 'PlayerState':
-        """Szótárból való visszaállítás."""
-        state = PlayerState(data['id'])
+        """Szótárból való visszaállítás (a UUID a hálózaton nem utazik)."""
+        state = PlayerState(str(data['index']), data['index'])
         state.x = data.get('x', 0.0)
         state.y = data.get('y', 0.0)
         state.vx = data.get('vx', 0.0)
         state.vy = data.get('vy', 0.0)
         return state
 
+# --- Közös mozgás szabályok (szerver szimuláció és kliens predikció) ---
+
+PLAYER_SPEED = 10.0
+COMMAND_RATE = 60                 # Hz: egy input parancs a játékost egy ilyen hosszú lépéssel viszi
+COMMAND_DT = 1.0 / COMMAND_RATE
+
+def apply_direction(state: 'PlayerState', direction: str):
+    """Egy input parancs hatása: a sebesség beállítása az irány szerint."""
+    state.vx = 0.0
+    state.vy = 0.0
+    if direction == "up":
+        state.vy = -PLAYER_SPEED
+    elif direction == "down":
+        state.vy = PLAYER_SPEED
+    elif direction == "left":
+        state.vx = -PLAYER_SPEED
+    elif direction == "right":
+        state.vx = PLAYER_SPEED
+
+def step_player(state: 'PlayerState', delta_time: float):
+    """Mozgás integrálása egy tickre."""
+    state.x += state.vx * delta_time
+    state.y += state.vy * delta_time
+
+# --- Típusonkénti bináris kódolók ---
+
+def _quantize_velocity(value: float) -> int:
+    value = max(-VELOCITY_LIMIT, min(VELOCITY_LIMIT, value))
+    return int(round(value * VELOCITY_SCALE))
+
+def quantize_player(state: 'PlayerState') -> tuple:
+    """Egy játékos hálózati (kvantált) mezői: (x, y, vx, vy) egészként."""
+    return (round(state.x * POSITION_SCALE), round(state.y * POSITION_SCALE),
+            _quantize_velocity(state.vx), _quantize_velocity(state.vy))
+
+def _pack_snapshot(seq: int, baseline: int, changes: List[tuple], removed: List[int],
+                   server_time: int = 0, input_ack: int = 0) -> bytes:
+    parts = [STATE_HEADER.pack(seq, baseline, server_time, input_ack, len(changes), len(removed))]
+    for index, mask, values in changes:
+        if mask == FIELD_ALL:
+            parts.append(MASK_LAYOUTS[mask].pack(index, mask, *values))
+        else:
+            parts.append(MASK_LAYOUTS[mask].pack(index, mask, *[values[i] for i in MASK_FIELDS[mask]]))
+    if removed:
+        parts.append(struct.pack(f'<{len(removed)}H', *removed))
+    return b"".join(parts)
+
+def _snapshot_dict(seq: int, baseline: int, changes: List[tuple], removed: List[int],
+                   server_time: int = 0, input_ack: int = 0) -> Dict[str, Any]:
+    players = []
+    for index, mask, values in changes:
+        entry = {"index": index}
+        for i in MASK_FIELDS[mask]:
+            entry[FIELD_NAMES[i]] = values[i] / FIELD_SCALES[i]
+        players.append(entry)
+    return {"seq": seq, "baseline": baseline, "time": server_time, "input_ack": input_ack,
+            "players": players, "removed": list(removed)}
+
+def _encode_state(data: Dict[str, Any]) -> bytes:
+    changes = []
+    for p in data.get("players", []):
+        mask = 0
+        values = [0] * len(FIELD_NAMES)
+        for i, name in enumerate(FIELD_NAMES):
+            if name in p:
+                mask |= 1 << i
+                values[i] = round(p[name] * FIELD_SCALES[i])
+        changes.append((p["index"], mask, values))
+    return _pack_snapshot(data.get("seq", 0), data.get("baseline", NO_BASELINE),
+                          changes, data.get("removed", []),
+                          data.get("time", 0), data.get("input_ack", 0))
+
+def _decode_state(body: memoryview) -> Dict[str, Any]:
+    seq, baseline, server_time, input_ack, changed_count, removed_count = STATE_HEADER.unpack_from(body, 0)
+    offset = STATE_HEADER.size
+    players = []
+    for _ in range(changed_count):
+        mask = body[offset + 2]
+        if mask > FIELD_ALL:
+            raise ValueError(f"Invalid field mask: {mask}")
+        layout = MASK_LAYOUTS[mask]
+        values = layout.unpack_from(body, offset)
+        offset += layout.size
+        entry = {"index": values[0]}
+        for value, i in zip(values[2:], MASK_FIELDS[mask]):
+            entry[FIELD_NAMES[i]] = value / FIELD_SCALES[i]
+        players.append(entry)
+    removed = list(struct.unpack_from(f'<{removed_count}H', body, offset))
+    return {"seq": seq, "baseline": baseline, "time": server_time, "input_ack": input_ack,
+            "players": players, "removed": removed}
+
+def _encode_move(data: Dict[str, Any]) -> bytes:
+    directions = data.get("directions", [])
+    if len(directions) > MAX_MOVE_COMMANDS:
+        raise ValueError(f"Too many commands in one MOVE: {len(directions)}")
+    ids = bytes(DIRECTION_IDS.get(d, 0) for d in directions)
+    return MOVE_LAYOUT.pack(data.get("ack", 0), data.get("seq", 0), len(ids)) + ids
+
+def _decode_move(body: memoryview) -> Dict[str, Any]:
+    ack, seq, count = MOVE_LAYOUT.unpack_from(body, 0)
+    ids = body[MOVE_LAYOUT.size:MOVE_LAYOUT.size + count]
+    if len(ids) != count:
+        raise ValueError("Truncated MOVE commands")
+    if count > seq:
+        raise ValueError(f"Invalid command sequence: {seq} with {count} commands")
+    directions = []
+    for direction in ids:
+        if direction >= len(DIRECTIONS):
+            raise ValueError(f"Invalid direction id: {direction}")
+        directions.append(DIRECTIONS[direction])
+    return {"ack": ack, "seq": seq, "directions": directions}
+
+def _encode_welcome(data: Dict[str, Any]) -> bytes:
+    player_id = data.get("id", "")
+    return WELCOME_LAYOUT.pack(data["index"], bytes.fromhex(player_id.replace("-", "")) if player_id else b"")
+
+def _decode_welcome(body: memoryview) -> Dict[str, Any]:
+    index, raw_id = WELCOME_LAYOUT.unpack_from(body, 0)
+    hex_id = raw_id.hex()
+    player_id = f"{hex_id[:8]}-{hex_id[8:12]}-{hex_id[12:16]}-{hex_id[16:20]}-{hex_id[20:]}"
+    return {"index": index, "id": player_id}
+
+def _encode_error(data: Dict[str, Any]) -> bytes:
+    reason = data.get("reason", "").encode(ENCODING)
+    return TEXT_LENGTH.pack(len(reason)) + reason
+
+def _decode_error(body: memoryview) -> Dict[str, Any]:
+    length, = TEXT_LENGTH.unpack_from(body, 0)
+    start = TEXT_LENGTH.size
+    return {"reason": bytes(body[start:start + length]).decode(ENCODING)}
+
+def _encode_json_payload(data: Dict[str, Any]) -> bytes:
+    return json.dumps(data).encode(ENCODING) if data else b""
+
+def _decode_json_payload(body: memoryview) -> Dict[str, Any]:
+    return json.loads(bytes(body).decode(ENCODING)) if len(body) else {}
+
+# Üzenet azonosító -> (kódoló, dekódoló). Fix layout nélküli típusok JSON payloadot visznek.
+CODECS = {
+    MSG_IDS[MSG_TYPE_CLIENT_MOVE]: (_encode_move, _decode_move),
+    MSG_IDS[MSG_TYPE_SERVER_STATE]: (_encode_state, _decode_state),
+    MSG_IDS[MSG_TYPE_SERVER_ERROR]: (_encode_error, _decode_error),
+    MSG_IDS[MSG_TYPE_SERVER_ACK]: (_encode_json_payload, _decode_json_payload),
+    MSG_IDS[MSG_TYPE_SERVER_WELCOME]: (_encode_welcome, _decode_welcome),
+    MSG_IDS[MSG_TYPE_CLIENT_HELLO]: (_encode_json_payload, _decode_json_payload),
+}
+
 # --- Protokollréteg funkciói ---
 
-def encode_message(msg_type: str, data: Optional[Dict[str, Any]] = None) -> bytes:
+def _frame(body: bytes) -> bytes:
+    """Hossz előtag (header) hozzáadása."""
+    return struct.pack(HEADER_FORMAT, len(body)) + body
+
+def compress_frame(frame: bytes, msg_type: str) -> bytes:
+    """
+    Kész keret tömörítése: [hossz] [verzió, azonosító, FLAG_COMPRESSED] [deflate(eredeti törzs)].
+    A küszöb alatti, vagy tömörítve nem kisebb keret változatlanul megy.
+    """
+    body = memoryview(frame)[HEADER_SIZE:]
+    if len(body) < COMPRESSION_THRESHOLD:
+        return frame
+    compressed = deflate(body)
+    if len(compressed) + BODY_HEADER.size >= len(body):
+        return frame
+    return _frame(BODY_HEADER.pack(PROTOCOL_VERSION, MSG_IDS[msg_type], FLAG_COMPRESSED) + compressed)
+
+def _inflate_body(data) -> bytes:
+    """Tömörített üzenet eredeti törzse (egymásba ágyazott tömörítést nem fogadunk el)."""
+    inner = inflate(memoryview(data)[BODY_HEADER.size:])
+    if inner[:1] != b'{' and len(inner) >= BODY_HEADER.size and inner[2] & FLAG_COMPRESSED:
+        raise ValueError("Nested compressed message")
+    return inner
+
+def encode_message(msg_type: str, data: Optional[Dict[str, Any]] = None,
+                   wire_format: str = WIRE_FORMAT_BINARY, compress: bool = False) -> bytes:
     """
     Üzenet kódolása bájtokká a hálózaton való küldéshez.
-    Formátum: [4-byte hossz] [JSON tartalom]
+    Formátum: [4-byte hossz] [verzió, azonosító, flagek + bináris adat]
+    JSON debug módban: [4-byte hossz] [JSON tartalom]
+    compress: a küszöb feletti üzenet tömörítve megy (csak ha a túloldal egyeztette)
     """
     if data is None:
         data = {}
-        
-    message = {
-        "type": msg_type,
-        "payload": data
-    }
-    
-    # 1. JSON szerializálás
-    json_data = json.dumps(message)
-    message_bytes = json_data.encode(ENCODING)
-    
-    # 2. Hossz előtag (header) hozzáadása
-    # struct.pack: C-struktúrák szerint csomagolja be az adatot
-    header = struct.pack(HEADER_FORMAT, len(message_bytes))
-    
-    return header + message_bytes
+
+    if wire_format == WIRE_FORMAT_JSON:
+        message = {
+            "type": msg_type,
+            "payload": data
+        }
+        frame = _frame(json.dumps(message).encode(ENCODING))
+    else:
+        msg_id = MSG_IDS[msg_type]
+        encoder, _ = CODECS[msg_id]
+        frame = _frame(BODY_HEADER.pack(PROTOCOL_VERSION, msg_id, 0) + encoder(data))
+    return compress_frame(frame, msg_type) if compress else frame
+
+def encode_snapshot(seq: int, baseline: int, changes: List[tuple], removed: List[int],
+                    wire_format: str = WIRE_FORMAT_BINARY,
+                    server_time: int = 0, input_ack: int = 0) -> bytes:
+    """
+    STATE üzenet közvetlenül kvantált változásokból (szótárak építése nélkül).
+    changes: [(index, mező maszk, (x, y, vx, vy) kvantálva)], removed: [index]
+    server_time: szerver idő ms-ban, input_ack: a címzett utolsó alkalmazott parancsa
+    """
+    if wire_format == WIRE_FORMAT_JSON:
+        return encode_message(MSG_TYPE_SERVER_STATE,
+                              _snapshot_dict(seq, baseline, changes, removed, server_time, input_ack),
+                              wire_format)
+    header = BODY_HEADER.pack(PROTOCOL_VERSION, MSG_IDS[MSG_TYPE_SERVER_STATE], 0)
+    return _frame(header + _pack_snapshot(seq, baseline, changes, removed, server_time, input_ack))
+
+def encode_snapshots(seq: int, server_time: int, baselines: List[int], input_acks: List[int],
+                     viewers: np.ndarray, slots: np.ndarray, masks: np.ndarray, values: np.ndarray,
+                     removed_viewers: np.ndarray, removed_slots: np.ndarray,
+                     wire_format: str = WIRE_FORMAT_BINARY) -> List[bytes]:
+    """
+    Egy snapshot összes STATE üzenete egyszerre, tömbökből (néző soronként egy keret).
+    A változott sorok és a keret fejlécek egy-egy numpy tömbként kódolódnak, a nézők
+    üzenete ezek szeleteiből áll össze (nézőnként csak három szelet).
+    viewers / removed_viewers: néző sor (0..len(baselines)-1), növekvő sorrendben.
+    """
+    count = len(baselines)
+    rows = np.arange(count + 1)
+    if wire_format == WIRE_FORMAT_JSON:
+        bounds = np.searchsorted(viewers, rows).tolist()
+        removed_bounds = np.searchsorted(removed_viewers, rows).tolist()
+        slot_list, mask_list, value_list = slots.tolist(), masks.tolist(), values.tolist()
+        removed_list = removed_slots.tolist()
+        frames = []
+        for i in range(count):
+            changes = [(slot_list[j], mask_list[j], value_list[j]) for j in range(bounds[i], bounds[i + 1])]
+            removed = removed_list[removed_bounds[i]:removed_bounds[i + 1]]
+            frames.append(encode_snapshot(seq, baselines[i], changes, removed, wire_format,
+                                          server_time, input_acks[i]))
+        return frames
+
+    # Változott sorok: teljes rekordok, majd a maszk szerinti bájtok kiválasztása (a sorok
+    # néző szerint rendezettek, így a nézők adatai egymás után, folytonosan következnek)
+    records = np.empty(len(slots), dtype=FULL_RECORD_DTYPE)
+    records["index"] = slots
+    records["mask"] = masks
+    for i, name in enumerate(FIELD_NAMES):
+        records[name] = values[:, i]
+    record_bytes = records.view(np.uint8).reshape(len(slots), FULL_RECORD_DTYPE.itemsize)
+    changed_data = record_bytes[MASK_KEEP[masks]].tobytes()
+    changed_counts = np.bincount(viewers, minlength=count)
+    changed_sizes = np.bincount(viewers, weights=MASK_SIZES[masks], minlength=count).astype(np.int64)
+    changed_offsets = np.concatenate(([0], np.cumsum(changed_sizes))).tolist()
+    removed_data = removed_slots.astype("<u2").tobytes()
+    removed_counts = np.bincount(removed_viewers, minlength=count)
+    removed_offsets = np.concatenate(([0], np.cumsum(removed_counts) * STATE_REMOVED.size)).tolist()
+
+    headers = np.empty(count, dtype=STATE_FRAME_DTYPE)
+    headers["length"] = (BODY_HEADER.size + STATE_HEADER.size + changed_sizes
+                         + removed_counts * STATE_REMOVED.size)
+    headers["version"] = PROTOCOL_VERSION
+    headers["msg_id"] = MSG_IDS[MSG_TYPE_SERVER_STATE]
+    headers["flags"] = 0
+    headers["seq"] = seq
+    headers["baseline"] = baselines
+    headers["time"] = server_time
+    headers["input_ack"] = input_acks
+    headers["changed"] = changed_counts
+    headers["removed"] = removed_counts
+    header_data = headers.tobytes()
+    header_size = STATE_FRAME_DTYPE.itemsize
+
+    return [b"".join((header_data[i * header_size:(i + 1) * header_size],
+                      changed_data[changed_offsets[i]:changed_offsets[i + 1]],
+                      removed_data[removed_offsets[i]:removed_offsets[i + 1]]))
+            for i in range(count)]
+
+def encode_state(players: Iterable[PlayerState], seq: int = 0,
+                 wire_format: str = WIRE_FORMAT_BINARY) -> bytes:
+    """Teljes (keyframe) STATE üzenet PlayerState objektumokból."""
+    changes = [(p.index, FIELD_ALL, quantize_player(p)) for p in players]
+    return encode_snapshot(seq, NO_BASELINE, changes, [], wire_format)
+
+def _decode_json(data: bytes) -> Dict[str, Any]:
+    message = json.loads(bytes(data).decode(ENCODING))
+
+    # Validálás
+    if 'type' not in message or 'payload' not in message:
+        raise ValueError("Invalid message format: missing 'type' or 'payload'")
+    return message
+
+def peek_state(data) -> Optional[tuple]:
+    """
+    Bináris STATE fejléce a játékosok dekódolása nélkül: (seq, baseline, szerver idő ms,
+    input_ack), vagy None, ha a keret nem bináris STATE (terheléses teszt botjaihoz).
+    """
+    if len(data) < BODY_HEADER.size + STATE_HEADER.size or data[0] == ord('{'):
+        return None
+    version, msg_id, flags = BODY_HEADER.unpack_from(data, 0)
+    if version != PROTOCOL_VERSION or msg_id != MSG_IDS[MSG_TYPE_SERVER_STATE]:
+        return None
+    if flags & FLAG_COMPRESSED:
+        # A fejléc is a tömörített részben van: csak a kibontás után olvasható
+        try:
+            return peek_state(_inflate_body(data))
+        except (ValueError, zlib.error):
+            return None
+    return STATE_HEADER.unpack_from(data, BODY_HEADER.size)[:4]
+
 
 def decode_message(data: bytes) -> Optional[Dict[str, Any]]:
     """
-    Bájtok dekódolása üzenetté.
+    Bájtok dekódolása üzenetté ({"type": ..., "payload": ...}).
+    A formátumot az első bájt dönti el: '{' = JSON debug, különben bináris.
     """
     try:
-        json_data = data.decode(ENCODING)
-        message = json.loads(json_data)
-        
-        # Validálás
-        if 'type' not in message or 'payload' not in message:
-            raise ValueError("Invalid message format: missing 'type' or 'payload'")
-            
-        return message
-    except (json.JSONDecodeError, UnicodeDecodeError, ValueError) as e:
+        if len(data) == 0:
+            raise ValueError("Empty message")
+        if data[0] == ord('{'):
+            return _decode_json(data)
+
+        version, msg_id, flags = BODY_HEADER.unpack_from(data, 0)
+        if version != PROTOCOL_VERSION:
+            raise ValueError(f"Unsupported protocol version: {version}")
+        if flags & FLAG_COMPRESSED:
+            return decode_message(_inflate_body(data))
+        codec = CODECS.get(msg_id)
+        if codec is None:
+            raise ValueError(f"Unknown message id: {msg_id}")
+        payload = codec[1](memoryview(data)[BODY_HEADER.size:])
+        return {"type": MSG_NAMES[msg_id], "payload": payload}
+    except (json.JSONDecodeError, UnicodeDecodeError, ValueError, struct.error, zlib.error) as e:
         print(f"ERROR: Failed to decode message: {e}")
         return None
-
-# Az ismétlődő kód itt a struct.pack/unpack és a JSON.
-# Ezeket a funkciókat (encode_message, decode_message) hoztuk létre a tisztaság érdekében.
\ No newline at end of file
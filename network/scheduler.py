@@ -0,0 +1,117 @@
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+# --- Konfiguráció ---
+MAX_CATCHUP_TICKS = 5   # Lemaradáskor egy ébredésre legfeljebb ennyi tick fut (a többi kimarad)
+
+
+class TickScheduler:
+    """
+    Drift mentes, fix lépésű tick ütemező monoton órával.
+    A tickek a kezdéshez képest abszolút időpontokra esnek (start + n * interval),
+    így a késések nem adódnak össze; lemaradáskor legfeljebb MAX_CATCHUP_TICKS tick
+    pótlódik egyszerre, a többit kihagyjuk (és számoljuk).
+    A snapshot ütem a tick sorszámából adódik, így nem kell a tick ráta egész osztójának lennie.
+    A nézők csoportokra oszlanak (snapshot intervallumonként ahány tick), a csoportok ütemezése
+    tickenként el van tolva: egy tick csak a nézők egy részének kódol snapshotot.
+    """
+    def __init__(self, tick_rate: float, snapshot_rate: float,
+                 max_catchup: int = MAX_CATCHUP_TICKS,
+                 clock: Callable[[], float] = time.monotonic):
+        self.tick_rate = tick_rate
+        self.interval = 1.0 / tick_rate
+        self.snapshot_rate = min(snapshot_rate, tick_rate)
+        self.max_catchup = max(1, max_catchup)
+        # Néző csoportok száma: ennyi tickre oszlik el egy snapshot kör
+        self.snapshot_groups_count = max(1, int(self.tick_rate // self.snapshot_rate))
+        self.clock = clock
+
+        self.start_time = clock()
+        self.tick = 0               # Lefutott (vagy kihagyott) tickek száma
+        # Statisztika
+        self.ticks_run = 0
+        self.snapshots = 0
+        self.catchup_ticks = 0      # Késve (egy ébredésen belül pótlásként) futott tickek
+        self.skipped_ticks = 0      # A pótlási korlát miatt kihagyott tickek
+        self.overruns = 0           # Tickek, amelyek tovább tartottak az intervallumnál
+        self.max_tick_ms = 0.0
+        self.max_broadcast_ms = 0.0
+
+    def start(self, epoch: Optional[float] = None):
+        """
+        Az ütemezés (újra)indítása. Alapból a 0. tick határideje most van; közös epoch
+        (monoton idő) esetén több folyamat tickjei és snapshot sorszámai egybeesnek.
+        """
+        if epoch is None:
+            self.start_time = self.clock()
+            self.tick = 0
+        else:
+            self.start_time = epoch
+            self.tick = max(0, int((self.clock() - epoch) / self.interval))
+
+    def snapshot_index(self, tick: int) -> int:
+        """Hány snapshot esedékes a tickig (közös epoch mellett folyamatok közt egyező)."""
+        return int(tick * self.snapshot_rate // self.tick_rate)
+
+    def deadline(self, tick: int) -> float:
+        return self.start_time + tick * self.interval
+
+    def due_ticks(self) -> int:
+        """Hány tick esedékes most (0, ha még korai). A korlát feletti lemaradást eldobja."""
+        now = self.clock()
+        due = int((now - self.start_time) / self.interval) + 1 - self.tick
+        if due <= 0:
+            return 0
+        if due > self.max_catchup:
+            # Túl nagy lemaradás (pl. hosszú GC vagy felfüggesztett folyamat): nem pörgetjük
+            # végig a kimaradt tickeket, csak a legutóbbiakat futtatjuk
+            skipped = due - self.max_catchup
+            self.skipped_ticks += skipped
+            self.tick += skipped
+            due = self.max_catchup
+        self.catchup_ticks += due - 1
+        return due
+
+    def snapshot_due(self, tick: int) -> bool:
+        """Esedékes-e snapshot a tick után: a snapshot sorszáma ebben a tickben lép."""
+        return self.snapshot_index(tick) != self.snapshot_index(tick - 1)
+
+    def snapshot_groups(self, tick: int) -> List[Tuple[int, int]]:
+        """
+        (csoport, snapshot sorszám) párok, amelyeknek a tick után snapshot jár.
+        A g. csoport ütemezése g tickkel előbbre tolt, így a sorszáma is a tolt tickből
+        adódik: kapcsolatonként folytonos, és közös epoch mellett folyamatok közt egyező.
+        """
+        return [(group, self.snapshot_index(tick + group))
+                for group in range(self.snapshot_groups_count) if self.snapshot_due(tick + group)]
+
+    def record_tick(self, duration: float):
+        self.tick += 1
+        self.ticks_run += 1
+        duration_ms = duration * 1000
+        if duration_ms > self.max_tick_ms:
+            self.max_tick_ms = duration_ms
+        if duration > self.interval:
+            self.overruns += 1
+
+    def record_broadcast(self, duration: float):
+        self.snapshots += 1
+        self.max_broadcast_ms = max(self.max_broadcast_ms, duration * 1000)
+
+    def sleep_time(self) -> float:
+        """Mennyit kell aludni a következő tick határidejéig."""
+        return max(0.0, self.deadline(self.tick) - self.clock())
+
+    def stats(self) -> Dict[str, float]:
+        stats = {
+            "ticks": self.ticks_run,
+            "snapshots": self.snapshots,
+            "catchup_ticks": self.catchup_ticks,
+            "skipped_ticks": self.skipped_ticks,
+            "overruns": self.overruns,
+            "max_tick_ms": round(self.max_tick_ms, 2),
+            "max_broadcast_ms": round(self.max_broadcast_ms, 2),
+        }
+        # A maximumok az utolsó lekérdezés óta értendők
+        self.max_tick_ms = self.max_broadcast_ms = 0.0
+        return stats
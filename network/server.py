@@ -1,32 +1,83 @@
 import asyncio
+import argparse
 import time
 import logging
 import uuid
-import struct # <-- Ez az import kell a struct.unpack-hez!
-from typing import Dict, Optional, Tuple, Any
+from collections import deque
+from typing import Dict, List, Optional, Tuple, Any
+
+import numpy as np
 
 # Import a protokoll modulból: Ezt a sort érdemes ellenőrizni!
 from protocol import (
-    PlayerState, 
     encode_message, 
+    encode_snapshots,
+    compress_frame,
     decode_message, 
-    HEADER_SIZE, 
-    HEADER_FORMAT, # <-- Ennek itt kell lennie!
     MSG_TYPE_CLIENT_MOVE, 
+    MSG_TYPE_CLIENT_HELLO,
     MSG_TYPE_SERVER_STATE, 
-    MSG_TYPE_SERVER_ERROR
+    MSG_TYPE_SERVER_ERROR,
+    MSG_TYPE_SERVER_WELCOME,
+    MSG_TYPE_SERVER_ACK,
+    WIRE_FORMAT_BINARY,
+    WIRE_FORMAT_JSON,
+    NO_BASELINE,
+    DIRECTION_IDS,
+    COMMAND_DT,
+    COMMAND_RATE,
+    HEADER_SIZE,
+    COMPRESSION_THRESHOLD
 )
+from compression import DICTIONARY_ID
+from snapshot import SnapshotRing, diff_views, KEYFRAME_INTERVAL, SNAPSHOT_RING_SIZE
+from interest import InterestManager, AOI_RADIUS
+from world import PlayerStore
+from scheduler import TickScheduler
+from overload import OverloadController, LEVEL_AOI, LEVEL_REJECT_JOINS
+from metrics import Histogram, render_metric, serve_metrics, METRICS_HOST, METRICS_PORT
+from framing import FramedProtocol
+from udp_transport import UdpServerProtocol, NetworkSimulator, TRANSPORT_TCP, TRANSPORT_UDP
 
 # --- Konfiguráció ---
 SERVER_HOST = '127.0.0.1'
 SERVER_PORT = 8888
-TICK_RATE = 60  # Hz
-TICK_INTERVAL = 1.0 / TICK_RATE  # Secundumonkénti frissítés
+# Szimuláció: fix lépésű tick (monoton órához igazítva). Tickenként egy input parancs fogy,
+# ezért a kliens parancs rátájával (COMMAND_RATE) egyezzen
+TICK_RATE = COMMAND_RATE  # Hz
+# Snapshot küldés gyakorisága: a kliens predikál és interpolál, így 20 Hz elég
+BROADCAST_RATE = 20  # Hz
+
+# Szállítás: TRANSPORT_UDP esetén a STATE nem megbízható (az elveszett snapshotot a következő
+# pótolja), a vezérlő üzenetek (WELCOME, ERROR) megbízhatóan, sorrendben mennek
+TRANSPORT = TRANSPORT_TCP
+
+# Hálózati formátum: WIRE_FORMAT_JSON olvasható debug forgalomhoz (a dekódolás mindkettőt elfogadja)
+WIRE_FORMAT = WIRE_FORMAT_BINARY
+
+# Rate Limiting: input parancsokban mérve (a redundánsan ismételt parancs nem számít,
+# minden csomag legalább egy parancsnak számít). A kliens tickenként egy parancsot küld.
+MAX_COMMANDS_PER_SECOND = 90
+TOKEN_REFILL_RATE = MAX_COMMANDS_PER_SECOND
+MAX_TOKENS = 2 * MAX_COMMANDS_PER_SECOND # Burst limit
+
+# Input parancsok: tickenként egyet alkalmazunk (kettőt, ha a sor COMMAND_CATCHUP_BACKLOG-nál
+# hosszabb); ha a sor MAX_COMMAND_BACKLOG-nál hosszabb, a legrégebbiek kiesnek
+# (a kliens órája siet, vagy torlódás után egyszerre érkezett sok parancs)
+MAX_COMMAND_BACKLOG = 8
+COMMAND_CATCHUP_BACKLOG = 4
+
+# Kimenő sor: kapcsolatonként max. ennyi várakozó (nem STATE) üzenet; a STATE-ből mindig
+# csak a legfrissebb vár (a régebbit lecseréli)
+SEND_QUEUE_LIMIT = 32
+QUEUE_STATS_INTERVAL = 10.0  # mp, ennyi időnként naplózzuk a sor statisztikát
+# Metrikák: a hálózati forgalom számlálói (a protokoll objektumok mezői), a lezárt
+# kapcsolatoké is megmarad; RTT: a snapshot küldése és a nyugtája közti idő (simítva)
+TRAFFIC_COUNTERS = ("bytes_received", "bytes_sent", "frames_received", "frames_sent")
+RTT_SMOOTHING = 0.125
 
-# Rate Limiting
-MAX_MESSAGES_PER_SECOND = 10 
-TOKEN_REFILL_RATE = MAX_MESSAGES_PER_SECOND
-MAX_TOKENS = 3 * MAX_MESSAGES_PER_SECOND # Burst limit
+# Túlterhelés miatt elutasított kapcsolat: ennyi idő múlva bontjuk (a hibaüzenet kimehessen)
+REJECT_CLOSE_DELAY = 1.0  # mp
 
 # --- Logolás beállítása ---
 logging.basicConfig(level=logging.INFO, 
@@ -39,11 +90,11 @@ class RateLimiter:
         self.max_tokens = max_tokens
         self.refill_rate = refill_rate
         self.tokens = max_tokens
-        self.last_refill = time.time()
+        self.last_refill = time.monotonic()
 
     def consume(self, amount: float = 1.0) -> bool:
         """Megpróbál token-t fogyasztani. True, ha sikeres."""
-        now = time.time()
+        now = time.monotonic()
         time_passed = now - self.last_refill
         
         # Tokenek újratöltése
@@ -57,179 +108,657 @@ class RateLimiter:
 
 class PlayerConnection:
     """Egyetlen klienskapcsolatot és annak állapotát kezelő osztály."""
-    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, server: 'GameServer'):
-        self.reader = reader
-        self.writer = writer
+    def __init__(self, protocol, server: 'GameServer', player_id: Optional[str] = None,
+                 slot: Optional[int] = None):
+        self.protocol = protocol
         self.server = server
-        self.player_id: str = str(uuid.uuid4())
-        self.addr: Tuple[str, int] = writer.get_extra_info('peername')
+        self.player_id: str = player_id or str(uuid.uuid4())
+        self.addr: Tuple[str, int] = protocol.peername
         self.limiter = RateLimiter(MAX_TOKENS, TOKEN_REFILL_RATE)
-        self.state: PlayerState = PlayerState(self.player_id)
+
+        # Input parancsok: a legutóbb fogadott / alkalmazott sorszám és a várakozó parancsok
+        self.last_input_seq = 0
+        self.last_applied_input_seq = 0
+        self.input_queue: deque = deque()
+        self.duplicate_commands = 0   # Redundancia miatt már ismert parancsok
+        self.dropped_commands = 0     # Túl hosszú sor miatt kihagyott parancsok
+        self.rate_limited = 0         # Rate limit miatt elutasított üzenetek
+        # Üzenet tömörítés: csak ha a kliens a HELLO-ban azonos szótárat jelzett
+        self.compression = False
+
+        # A játékos állapota a szerver PlayerStore tömbjeiben van; a slot egyben a hálózati index
+        # (sharded módban a front folyamat osztja ki, és zónaváltáskor sem változik)
+        self.slot: int = server.world.add(self.player_id, slot)
+
+        # Delta snapshot állapot: a kliens által nyugtázott utolsó snapshot
+        self.acked_seq = NO_BASELINE
+        self.sent_seq = NO_BASELINE          # A kliensnek legutóbb küldött snapshot
+        self.last_keyframe_seq = NO_BASELINE
+        self.sent_at = [(NO_BASELINE, 0.0)] * SNAPSHOT_RING_SIZE   # (sorszám, küldés ideje) az RTT-hez
+        self.rtt: Optional[float] = None   # mp, snapshot -> nyugta (a kliens input kötegelésével együtt)
+
+        # Érdeklődési terület: a kliensnek küldött nézetek (slotok, értékek) tömbpárként
+        # (a delta ezekhez képest készül)
+        self.aoi_radius = AOI_RADIUS
+        self.sent_views = SnapshotRing()
+
+        # Kimenő sor: a tick csak sorba tesz, a küldést (és a drain-t) a write_loop végzi
+        self.send_queue: deque = deque()
+        self.pending_state: Optional[bytes] = None
+        self.send_event = asyncio.Event()
+        self.writer_idle = False    # A write_loop üres sorral vár (nincs folyamatban lévő küldés)
+        self.closed = False
+        self.sent_messages = 0
+        self.sent_bytes = 0
+        self.dropped_messages = 0   # Megtelt sor miatt eldobott üzenetek
+        self.coalesced_states = 0   # Újabbra cserélt, el nem küldött STATE-ek
+        self.max_queue_depth = 0
         
         logging.info(f"New connection established: ID={self.player_id} from {self.addr[0]}")
 
-    async def handle_read(self):
-        """Bejövő üzenetek folyamatos olvasása a klienstől."""
+    def start(self, welcome: bool = True):
+        """A kapcsolat felvétele a játékba és a küldő task indítása."""
+        self.protocol.on_frame = self.on_frame
+        self.protocol.on_close = self.on_close
+
+        # A kliens megkapja a saját kompakt indexét (a STATE-ben csak ez szerepel);
+        # zónaváltásnál már ismeri, ott nem küldjük újra
+        if welcome:
+            self.send_message(MSG_TYPE_SERVER_WELCOME,
+                              {"index": self.slot, "id": self.player_id})
+        asyncio.create_task(self.write_loop())
+
+    def handoff_state(self) -> Dict[str, Any]:
+        """A játékos átadható állapota (zónaváltás): pozíció, sebesség és az input sor."""
+        world = self.server.world
+        x, y = world.position[self.slot].tolist()
+        vx, vy = world.velocity[self.slot].tolist()
+        return {
+            "x": x, "y": y, "vx": vx, "vy": vy,
+            "last_input_seq": self.last_input_seq,
+            "last_applied_input_seq": self.last_applied_input_seq,
+            "input_queue": list(self.input_queue),
+            "aoi_radius": self.aoi_radius,
+            "compression": self.compression,
+        }
+
+    def restore_state(self, state: Dict[str, Any]):
+        """A handoff_state párja. A snapshot baseline nem jön át: az új zóna keyframe-mel indul."""
+        world = self.server.world
+        world.position[self.slot] = (state["x"], state["y"])
+        world.velocity[self.slot] = (state["vx"], state["vy"])
+        self.last_input_seq = state["last_input_seq"]
+        self.last_applied_input_seq = state["last_applied_input_seq"]
+        self.input_queue.extend((seq, direction) for seq, direction in state["input_queue"])
+        self.aoi_radius = state["aoi_radius"]
+        self.compression = state["compression"]
+
+    def on_frame(self, frame: memoryview):
+        """Egy teljes bejövő keret (a FramedProtocol hívja, a pufferbe mutató szelettel)."""
         try:
-            # Hozzáadjuk az állapotot a szerver központi állapotkezelőjéhez
-            self.server.players[self.player_id] = self.state
-
-            while True:
-                # 1. Hossz (header) olvasása
-                header_data = await self.reader.readexactly(HEADER_SIZE)
-                
-                # struct.unpack: ITT VAN FELHASZNÁLVA A HEADER_FORMAT
-                msg_len, = struct.unpack(HEADER_FORMAT, header_data)
-
-                # 2. Üzenet olvasása a jelzett hossznak megfelelően
-                message_data = await self.reader.readexactly(msg_len)
-                
-                # 3. Rate Limiting ellenőrzése
-                if not self.limiter.consume():
-                    await self.send_error("Rate limit exceeded. Too many messages.")
-                    logging.warning(f"Rate limit hit for ID={self.player_id} ({self.addr[0]}).")
-                    continue
-                    
-                # 4. Üzenet feldolgozása
-                message = decode_message(message_data)
-                if message:
-                    await self.server.process_message(self.player_id, message)
-
-        except asyncio.IncompleteReadError:
-            logging.info(f"Client disconnected gracefully: ID={self.player_id}")
-        except ConnectionResetError:
-            logging.info(f"Client disconnected abruptly: ID={self.player_id}")
+            message = decode_message(frame)
+            if not message:
+                return
+
+            # Rate Limiting: az új parancsok száma szerint
+            if not self.limiter.consume(self.command_cost(message)):
+                self.rate_limited += 1
+                self.send_error("Rate limit exceeded. Too many commands.")
+                logging.warning(f"Rate limit hit for ID={self.player_id} ({self.addr[0]}).")
+                return
+
+            self.server.process_message(self.player_id, message)
         except Exception as e:
             logging.error(f"Error in PlayerConnection {self.player_id}: {e}")
-        finally:
-            self.server.remove_player(self.player_id)
+            self.protocol.close()
 
-    async def send_message(self, msg_type: str, data: Optional[Dict[str, Any]] = None):
-        """Üzenet kódolása és küldése a kliensnek."""
+    def on_close(self, exc: Optional[Exception]):
+        if exc is None:
+            logging.info(f"Client disconnected gracefully: ID={self.player_id}")
+        else:
+            logging.info(f"Client disconnected abruptly: ID={self.player_id}")
+        self.server.remove_player(self.player_id)
+
+    def command_cost(self, message: Dict[str, Any]) -> int:
+        """Hány tokenbe kerül az üzenet: MOVE-nál az új (még nem látott) parancsok száma."""
+        if message.get("type") != MSG_TYPE_CLIENT_MOVE:
+            return 1
+        payload = message.get("payload", {})
+        new_commands = min(len(payload.get("directions", [])),
+                           payload.get("seq", 0) - self.last_input_seq)
+        return max(1, new_commands)
+
+    def receive_commands(self, last_seq: int, directions: List[str]):
+        """Parancsok sorba állítása sorszám szerint; a már látottakat eldobja."""
+        first_seq = last_seq - len(directions) + 1
+        for offset, direction in enumerate(directions):
+            seq = first_seq + offset
+            if seq <= self.last_input_seq:
+                self.duplicate_commands += 1
+                continue
+            self.input_queue.append((seq, direction))
+            self.last_input_seq = seq
+        while len(self.input_queue) > MAX_COMMAND_BACKLOG:
+            self.input_queue.popleft()
+            self.dropped_commands += 1
+
+    def next_commands(self) -> List[str]:
+        """A tick parancsai: egy, lemaradásnál kettő (üres, ha nem jött parancs)."""
+        count = 2 if len(self.input_queue) > COMMAND_CATCHUP_BACKLOG else 1
+        directions = []
+        while self.input_queue and len(directions) < count:
+            seq, direction = self.input_queue.popleft()
+            self.last_applied_input_seq = seq
+            directions.append(direction)
+        return directions
+
+    def queue_depth(self) -> int:
+        return len(self.send_queue) + (self.pending_state is not None)
+
+    def _wake_writer(self):
+        depth = self.queue_depth()
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+        self.send_event.set()
+
+    def send_message(self, msg_type: str, data: Optional[Dict[str, Any]] = None):
+        """Üzenet kódolása és sorba állítása (nem vár a socketre). Megtelt sornál eldobja."""
+        if self.closed:
+            return
+        if len(self.send_queue) >= SEND_QUEUE_LIMIT:
+            self.dropped_messages += 1
+            return
+        frame = encode_message(msg_type, data, WIRE_FORMAT)
+        if self.compression:
+            frame = self.server.compress(frame, msg_type)
+        self.send_queue.append(frame)
+        self._wake_writer()
+
+    def send_state(self, state_message: bytes):
+        """STATE sorba állítása: ha az előző még nem ment ki, a legújabb lecseréli."""
+        if self.closed:
+            return
+        if (self.writer_idle and not self.send_queue and self.pending_state is None
+                and not self.protocol.write_paused):
+            # Szabad kapcsolat: rögtön a transportnak adjuk (a writer task felébresztése
+            # többe kerülne, mint maga az írás); torlódásnál marad a write_loop
+            try:
+                self.protocol.write_frames([], state_message)
+            except (ConnectionResetError, BrokenPipeError):
+                self.protocol.close()
+                return
+            self.sent_messages += 1
+            self.sent_bytes += len(state_message)
+            return
+        if self.pending_state is not None:
+            self.coalesced_states += 1
+        self.pending_state = state_message
+        self._wake_writer()
+
+    async def write_loop(self):
+        """A kapcsolat saját küldő taskja: kiüríti a sort, és csak itt vár a drain-re."""
         try:
-            encoded_msg = encode_message(msg_type, data)
-            self.writer.write(encoded_msg)
-            await self.writer.drain()
-        except ConnectionResetError:
+            while not self.closed:
+                self.writer_idle = True
+                await self.send_event.wait()
+                self.writer_idle = False
+                self.send_event.clear()
+                while (self.send_queue or self.pending_state is not None) and not self.closed:
+                    # Előbb a vezérlő üzenetek (sorrendben), a végén a legfrissebb STATE,
+                    # mind egyetlen writelines hívásban
+                    # (UDP-n a STATE nem megbízható csatornán megy)
+                    frames = list(self.send_queue)
+                    self.send_queue.clear()
+                    state = self.pending_state
+                    self.pending_state = None
+                    self.protocol.write_frames(frames, state)
+                    if state is not None:
+                        frames.append(state)
+                    self.sent_messages += len(frames)
+                    self.sent_bytes += sum(len(f) for f in frames)
+                    # Lassú kliensnél itt várunk; közben a tick legfeljebb lecseréli a STATE-et
+                    await self.protocol.drain()
+        except (ConnectionResetError, BrokenPipeError):
             pass
         except Exception as e:
             logging.error(f"Error sending message to {self.player_id}: {e}")
+        finally:
             self.server.remove_player(self.player_id)
 
-    async def send_error(self, message: str):
+    def baseline_for(self, seq: int) -> Tuple[int, Optional[Tuple[np.ndarray, np.ndarray]]]:
+        """
+        Melyik elküldött nézethez képest kapja a kliens a deltát: (sorszám, nézet),
+        keyframe-nél (NO_BASELINE, None).
+        """
+        if self.acked_seq == NO_BASELINE or seq - self.last_keyframe_seq >= KEYFRAME_INTERVAL:
+            return NO_BASELINE, None
+        view = self.sent_views.get(self.acked_seq)
+        if view is None:
+            return NO_BASELINE, None
+        return self.acked_seq, view
+
+    def send_error(self, message: str):
         """Hibajelzés küldése a kliensnek."""
-        await self.send_message(MSG_TYPE_SERVER_ERROR, {"reason": message})
+        self.send_message(MSG_TYPE_SERVER_ERROR, {"reason": message})
 
 
 class GameServer:
     """A fő játékszerver, amely a loop-ot és a központi állapotot kezeli."""
-    def __init__(self):
-        self.players: Dict[str, PlayerState] = {}
+    def __init__(self, transport: str = TRANSPORT, simulator: Optional[NetworkSimulator] = None,
+                 tick_rate: float = TICK_RATE, broadcast_rate: float = BROADCAST_RATE,
+                 epoch: Optional[float] = None, metrics_port: Optional[int] = METRICS_PORT):
+        self.transport = transport
+        self.simulator = simulator  # Csak UDP-n: helyi csomagvesztés/késleltetés szimuláció
+        # Játékos állapot tömbökben (slot = hálózati index, free-listtel újrahasznosítva)
+        self.world = PlayerStore()
         self.connections: Dict[str, PlayerConnection] = {}
+        # Delta snapshotok és érdeklődési terület (AOI)
+        self.snapshot_seq = NO_BASELINE
+        self.interest = InterestManager()
         self.is_running = False
-        self.last_tick_time = time.time()
         self.server_start_time = time.time()
+        # Közös epoch (monoton idő): több szerver folyamat ideje és tickjei egyeznek
+        self.epoch = epoch
+        self.monotonic_start = time.monotonic() if epoch is None else epoch
+        # Szimuláció és snapshot küldés külön rátával, közös monoton ütemezővel
+        self.scheduler = TickScheduler(tick_rate, broadcast_rate)
+        self.last_queue_stats_time = time.monotonic()
+        # Túlterhelés védelem: a tick idők alapján ritkítja az AOI frissítést, korlátozza a csatlakozást
+        self.overload = OverloadController(self.scheduler.interval, self.apply_overload_level)
+        # Metrikák (a /metrics végpont csak lekérdezéskor számol, itt csak számlálók vannak)
+        self.metrics_port = metrics_port
+        self.tick_histogram = Histogram()
+        self.sim_histogram = Histogram()
+        self.broadcast_histogram = Histogram()
+        self.retired_traffic = dict.fromkeys(TRAFFIC_COUNTERS, 0)
+        self.retired_rate_limited = 0
+        # Tömörítés költsége és haszna (a küszöb alatti, kihagyott üzenetek nélkül)
+        self.compressed_messages = 0
+        self.compression_input_bytes = 0
+        self.compression_output_bytes = 0
+        self.compression_seconds = 0.0
 
     async def start(self):
         """A szerver indítása és a fő feladatok ütemezése."""
         self.is_running = True
         
-        server = await asyncio.start_server(
-            self.handle_client, SERVER_HOST, SERVER_PORT
-        )
-        
+        await self.start_metrics()
         asyncio.create_task(self.game_loop())
-        
-        addr = server.sockets[0].getsockname()
-        logging.info(f"GameServer running on {addr}")
-        
-        async with server:
-            await server.serve_forever()
+        await serve_clients(self.transport, self.handle_client, self.simulator, "GameServer")
 
-    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    def handle_client(self, protocol, player_id: Optional[str] = None,
+                      slot: Optional[int] = None) -> Optional[PlayerConnection]:
         """Callback új klienskapcsolat esetén."""
-        connection = PlayerConnection(reader, writer, self)
+        if not self.overload.admit_join():
+            self.reject_client(protocol)
+            return None
+        connection = PlayerConnection(protocol, self, player_id, slot)
         self.connections[connection.player_id] = connection
-        asyncio.create_task(connection.handle_read())
+        connection.start()
+        return connection
+
+    def reject_client(self, protocol):
+        """Túlterhelés: a kapcsolat nem kerül játékba, hibaüzenet után bontjuk."""
+        if self.overload.level >= LEVEL_REJECT_JOINS:
+            reason = "Server overloaded, not accepting new players."
+        else:
+            reason = "Server busy, retry later."
+        logging.warning(f"Join rejected from {protocol.peername[0]}: {reason}")
+        protocol.write(encode_message(MSG_TYPE_SERVER_ERROR, {"reason": reason}, WIRE_FORMAT))
+        asyncio.get_running_loop().call_later(REJECT_CLOSE_DELAY, protocol.close)
+
+    def apply_overload_level(self, old_level: int, new_level: int):
+        """Az AOI paraméterei a túlterhelési szint szerint."""
+        self.interest.near_fraction, self.interest.far_update_interval = LEVEL_AOI[new_level]
+
+    def place_player(self, connection: PlayerConnection, x: float, y: float):
+        """Játékos áthelyezése (spawn pont, teszt)."""
+        self.world.position[connection.slot] = (x, y)
 
     def remove_player(self, player_id: str):
         """Játékos eltávolítása a központi állapotból és a kapcsolatok közül."""
-        if player_id in self.connections:
-            self.connections[player_id].writer.close()
-            del self.connections[player_id]
-        if player_id in self.players:
-            del self.players[player_id]
-        logging.info(f"Player removed: ID={player_id}. Current active players: {len(self.players)}")
-
-    async def process_message(self, player_id: str, message: Dict[str, Any]):
+        connection = self.connections.pop(player_id, None)
+        if connection is None:
+            return
+        connection.closed = True
+        connection.send_event.set()  # A write_loop kilép
+        connection.protocol.close()
+        self.world.remove(connection.slot)
+        self.interest.forget(connection.slot)
+        for name in TRAFFIC_COUNTERS:
+            self.retired_traffic[name] += getattr(connection.protocol, name)
+        self.retired_rate_limited += connection.rate_limited
+        logging.info(f"Player removed: ID={player_id}. Current active players: {len(self.world)}")
+
+    def process_message(self, player_id: str, message: Dict[str, Any]):
         """Bejövő üzenetek feldolgozása a kliensektől."""
         msg_type = message.get("type")
         payload = message.get("payload", {})
         
-        player_state = self.players.get(player_id)
-        if not player_state:
+        connection = self.connections.get(player_id)
+        if not connection:
             return
-            
+
         if msg_type == MSG_TYPE_CLIENT_MOVE:
-            speed = 10.0 
-            direction = payload.get("direction", "none") 
-            
-            player_state.vx = 0.0
-            player_state.vy = 0.0
-            
-            if direction == "up":
-                player_state.vy = -speed
-            elif direction == "down":
-                player_state.vy = speed
-            elif direction == "left":
-                player_state.vx = -speed
-            elif direction == "right":
-                player_state.vx = speed
-            
-            player_state.last_update_time = time.time()
-            logging.debug(f"Player {player_id[:4]} moved: ({player_state.vx}, {player_state.vy})")
+            # A parancsokat csak sorba állítjuk, a tick alkalmazza őket sorrendben
+            connection.receive_commands(payload.get("seq", 0), payload.get("directions", []))
+
+            # A MOVE a kliens snapshot nyugtáját is hozza
+            ack = payload.get("ack", NO_BASELINE)
+            if connection.acked_seq < ack <= connection.sent_seq:
+                connection.acked_seq = ack
+                self.sample_rtt(connection, ack)
+
+        elif msg_type == MSG_TYPE_CLIENT_HELLO:
+            # Tömörítés csak azonos szótárral: a kliens a saját szótára azonosítóját küldi
+            connection.compression = bool(DICTIONARY_ID) and payload.get("compression") == DICTIONARY_ID
+            connection.send_message(MSG_TYPE_SERVER_ACK, {"compression": connection.compression})
+            logging.info(f"Compression {'enabled' if connection.compression else 'not available'} "
+                         f"for ID={player_id}")
 
     def update_game_state(self, delta_time: float):
         """A fő játéklogika, amely minden tick-ben lefut."""
-        for player_id, state in self.players.items():
-            state.x += state.vx * delta_time
-            state.y += state.vy * delta_time
-            
-    async def broadcast_state(self):
-        """Minden csatlakoztatott kliensnek elküldi a teljes játékállapotot."""
-        all_states = [state.to_dict() for state in self.players.values()]
-        state_message = encode_message(MSG_TYPE_SERVER_STATE, {"players": all_states})
-        
-        tasks = []
+        # A játékosokat az input parancsok viszik: parancsonként egy COMMAND_DT lépés,
+        # sorszám szerinti sorrendben (így a kliens predikciója pontosan újrajátszható).
+        # Itt csak összegyűjtjük a parancsokat, a lépés vektorizált (körönként egy parancs).
+        rounds = ([], [], [], [])   # (slotok, irányok) az első és a pótló parancsokhoz
         for conn in self.connections.values():
-            conn.writer.write(state_message) 
-            tasks.append(conn.writer.drain())
+            for round_index, direction in enumerate(conn.next_commands()):
+                rounds[2 * round_index].append(conn.slot)
+                rounds[2 * round_index + 1].append(DIRECTION_IDS.get(direction, 0))
+        for round_index in range(2):
+            slots = rounds[2 * round_index]
+            if slots:
+                self.world.apply_commands(np.array(slots), np.array(rounds[2 * round_index + 1]),
+                                          COMMAND_DT)
+            
+    def broadcast_due(self, groups: Dict[int, int]):
+        """Az esedékes néző csoportok snapshotjai ({csoport: sorszám}, a scheduler.snapshot_groups-ból)."""
+        for group, seq in groups.items():
+            self.broadcast_state(seq, group)
+
+    def broadcast_state(self, seq: int, group: Optional[int] = None):
+        """
+        Minden kliens csak a látókörén belüli entitásokat kapja (AOI), és azokból is csak
+        a nyugtázott nézete óta változott entitásokat/mezőket.
+        group: csak a slot % csoportszám == group kapcsolatok kapnak snapshotot (None = mind).
+        Csak sorba állít: a socketre a kapcsolatok write_loop-jai várnak, nem a tick.
+        """
+        self.snapshot_seq = max(self.snapshot_seq, seq)
+        server_time = self.server_time_ms()
+        if group is None:
+            conns = list(self.connections.values())
+        else:
+            groups_count = self.scheduler.snapshot_groups_count
+            conns = [c for c in self.connections.values() if c.slot % groups_count == group]
+        if not conns:
+            return
+        sent_at = (seq, time.monotonic())
+
+        world = self.world
+        target_slots, target_positions, target_values = self.broadcast_targets()
+        viewer_slots = np.fromiter((c.slot for c in conns), dtype=np.int64, count=len(conns))
+        viewer_radii = np.fromiter((c.aoi_radius for c in conns), dtype=np.float64, count=len(conns))
+        viewers, slots, values = self.interest.build_views(
+            world.position[viewer_slots], viewer_radii,
+            target_slots, target_positions, target_values, seq)
+
+        # Nézőnként: a nézet eltárolása és a baseline kiválasztása (csak szeletek, másolás nélkül)
+        bounds = np.searchsorted(viewers, np.arange(len(conns) + 1)).tolist()
+        baselines, input_acks = [], []
+        base_slots, base_values, base_counts = [], [], []
+        for i, conn in enumerate(conns):
+            baseline_seq, baseline = conn.baseline_for(seq)
+            baselines.append(baseline_seq)
+            input_acks.append(conn.last_applied_input_seq)
+            if baseline is None:
+                conn.last_keyframe_seq = seq
+                base_counts.append(0)
+            else:
+                base_slots.append(baseline[0])
+                base_values.append(baseline[1])
+                base_counts.append(len(baseline[0]))
+            conn.sent_seq = seq
+            conn.sent_at[seq % SNAPSHOT_RING_SIZE] = sent_at
+            conn.sent_views.store(seq, (slots[bounds[i]:bounds[i + 1]], values[bounds[i]:bounds[i + 1]]))
+
+        # Delta és kódolás egyszerre minden nézőre
+        if base_slots:
+            base_slots = np.concatenate(base_slots)
+            base_values = np.concatenate(base_values)
+        else:
+            base_slots = np.zeros(0, dtype=np.int64)
+            base_values = np.zeros((0, 4), dtype=np.int64)
+        base_viewers = np.repeat(np.arange(len(conns)), base_counts)
+        changed, removed = diff_views(viewers, slots, values, base_viewers, base_slots, base_values)
+        frames = encode_snapshots(seq, server_time, baselines, input_acks, *changed, *removed,
+                                  wire_format=WIRE_FORMAT)
+        for conn, frame in zip(conns, frames):
+            conn.send_state(self.compress(frame, MSG_TYPE_SERVER_STATE) if conn.compression else frame)
+
+    def compress(self, frame: bytes, msg_type: str) -> bytes:
+        """Keret tömörítése (a küszöb felett) az arány és a CPU idő számlálásával."""
+        if len(frame) - HEADER_SIZE < COMPRESSION_THRESHOLD:
+            return frame
+        start = time.perf_counter()
+        compressed = compress_frame(frame, msg_type)
+        self.compression_seconds += time.perf_counter() - start
+        self.compressed_messages += 1
+        self.compression_input_bytes += len(frame)
+        self.compression_output_bytes += len(compressed)
+        return compressed
+
+    def compression_stats(self) -> Dict[str, object]:
+        messages = max(1, self.compressed_messages)
+        return {
+            "messages": self.compressed_messages,
+            "ratio": round(self.compression_input_bytes / max(1, self.compression_output_bytes), 2),
+            "saved_bytes": self.compression_input_bytes - self.compression_output_bytes,
+            "us_per_message": round(self.compression_seconds / messages * 1e6, 1),
+        }
+
+    def sample_rtt(self, connection: PlayerConnection, ack: int):
+        seq, sent_at = connection.sent_at[ack % SNAPSHOT_RING_SIZE]
+        if seq != ack:
+            return
+        sample = time.monotonic() - sent_at
+        if connection.rtt is None:
+            connection.rtt = sample
+        else:
+            connection.rtt += (sample - connection.rtt) * RTT_SMOOTHING
+
+    def broadcast_targets(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """A látható entitások: (slotok, pozíciók, kvantált értékek). Itt minden élő slot."""
+        slots = self.world.active_slots()
+        return slots, self.world.position[slots], self.world.quantized(slots)
 
-        if tasks:
-            await asyncio.gather(*tasks, return_exceptions=True)
+    def server_time_ms(self) -> int:
+        """Szerver idő ms-ban az indulás óta (u32, a kliens órakülönbség becsléséhez)."""
+        return int((time.monotonic() - self.monotonic_start) * 1000) & 0xFFFFFFFF
+
+    def queue_stats(self) -> Dict[str, int]:
+        """Kimenő sorok összesítése (mélység, eldobott és összevont üzenetek)."""
+        conns = list(self.connections.values())
+        return {
+            "connections": len(conns),
+            "queue_depth": sum(c.queue_depth() for c in conns),
+            "max_queue_depth": max((c.max_queue_depth for c in conns), default=0),
+            "dropped_messages": sum(c.dropped_messages for c in conns),
+            "coalesced_states": sum(c.coalesced_states for c in conns),
+            "duplicate_commands": sum(c.duplicate_commands for c in conns),
+            "dropped_commands": sum(c.dropped_commands for c in conns),
+            "sent_bytes": sum(c.sent_bytes for c in conns),
+            # Keretezés: rendszerhívások vs. keretek (egy olvasás/írás több keretet is visz)
+            "recv_reads": sum(c.protocol.reads for c in conns),
+            "recv_frames": sum(c.protocol.frames_received for c in conns),
+            "send_writes": sum(c.protocol.writes for c in conns),
+            "send_frames": sum(c.protocol.frames_sent for c in conns),
+        }
+
+    async def start_metrics(self):
+        """A /metrics végpont indítása (ha van port); hiba esetén a szerver fut tovább nélküle."""
+        if not self.metrics_port:
+            return
+        try:
+            await serve_metrics(self.render_metrics, METRICS_HOST, self.metrics_port)
+        except OSError as e:
+            logging.error(f"Metrics endpoint unavailable on port {self.metrics_port}: {e}")
+
+    def render_metrics(self) -> str:
+        """Minden metrika Prometheus szöveges formátumban (csak lekérdezéskor fut)."""
+        conns = list(self.connections.values())
+        lines: List[str] = []
+        self.tick_histogram.render(lines, "roguelike_tick_seconds",
+                                   "Tick duration (simulation plus broadcast on snapshot ticks).")
+        self.sim_histogram.render(lines, "roguelike_simulation_seconds", "Simulation step duration.")
+        self.broadcast_histogram.render(lines, "roguelike_broadcast_seconds",
+                                        "Snapshot build and encode duration.")
+
+        traffic = [
+            ("bytes_received", "roguelike_received_bytes_total", "Bytes received from clients."),
+            ("bytes_sent", "roguelike_sent_bytes_total", "Bytes sent to clients."),
+            ("frames_received", "roguelike_received_messages_total", "Messages received from clients."),
+            ("frames_sent", "roguelike_sent_messages_total", "Messages sent to clients."),
+        ]
+        for counter, name, help_text in traffic:
+            total = self.retired_traffic[counter] + sum(getattr(c.protocol, counter) for c in conns)
+            render_metric(lines, name, "counter", help_text, [((), total)])
+        compression = [
+            ("compressed_messages", "roguelike_compressed_messages_total",
+             "Messages above the threshold passed to the compressor."),
+            ("compression_input_bytes", "roguelike_compression_input_bytes_total",
+             "Bytes before compression."),
+            ("compression_output_bytes", "roguelike_compression_output_bytes_total",
+             "Bytes after compression (uncompressible messages count at full size)."),
+            ("compression_seconds", "roguelike_compression_seconds_total", "CPU time spent compressing."),
+        ]
+        for counter, name, help_text in compression:
+            render_metric(lines, name, "counter", help_text, [((), getattr(self, counter))])
+        render_metric(lines, "roguelike_rate_limited_total", "counter",
+                      "Client messages rejected by the rate limiter.",
+                      [((), self.retired_rate_limited + sum(c.rate_limited for c in conns))])
+
+        render_metric(lines, "roguelike_players", "gauge", "Connected players.", [((), len(self.world))])
+        render_metric(lines, "roguelike_send_queue_depth", "gauge", "Pending outgoing messages per connection.",
+                      [((("player", c.slot),), c.queue_depth()) for c in conns])
+        render_metric(lines, "roguelike_rtt_seconds", "gauge",
+                      "Smoothed snapshot-to-ack round trip per connection.",
+                      [((("player", c.slot),), round(c.rtt, 6)) for c in conns if c.rtt is not None])
+
+        scheduler = self.scheduler
+        render_metric(lines, "roguelike_tick_overruns_total", "counter",
+                      "Ticks that took longer than the tick interval.", [((), scheduler.overruns)])
+        render_metric(lines, "roguelike_skipped_ticks_total", "counter",
+                      "Ticks skipped beyond the catch-up limit.", [((), scheduler.skipped_ticks)])
+        render_metric(lines, "roguelike_overload_level", "gauge",
+                      "Current overload degradation level (0 = normal).", [((), self.overload.level)])
+        render_metric(lines, "roguelike_rejected_joins_total", "counter", "Joins refused due to overload.",
+                      [((), self.overload.rejected_joins + self.overload.throttled_joins)])
+        return "\n".join(lines) + "\n"
+
+    def log_queue_stats(self):
+        stats = self.queue_stats()
+        if stats["connections"]:
+            logging.info("Send queues: " + ", ".join(f"{k}={v}" for k, v in stats.items()))
+        if self.compressed_messages:
+            logging.info("Compression: " + ", ".join(f"{k}={v}" for k, v in self.compression_stats().items()))
+        logging.info("Overload: " + ", ".join(f"{k}={v}" for k, v in self.overload.stats().items()))
+        logging.info("Ticks: " + ", ".join(f"{k}={v}" for k, v in self.scheduler.stats().items()))
 
     async def game_loop(self):
-        """A szerver fő, ismétlődő tick loop-ja (pl. 60 Hz)."""
-        logging.info(f"Starting Game Loop at {TICK_RATE} Hz.")
-        
+        """A szerver fő tick loop-ja: fix lépésű szimuláció, ritkább snapshot küldés."""
+        scheduler = self.scheduler
+        if scheduler.tick_rate != COMMAND_RATE:
+            logging.warning(f"Tick rate {scheduler.tick_rate} Hz differs from the command rate "
+                            f"{COMMAND_RATE} Hz: input queues will drift.")
+        logging.info(f"Starting Game Loop at {scheduler.tick_rate} Hz, "
+                     f"snapshots at {scheduler.snapshot_rate} Hz.")
+        scheduler.start(self.epoch)
+
         while self.is_running:
-            start_time = time.time()
-            delta_time = start_time - self.last_tick_time
-            self.last_tick_time = start_time
-            
-            self.update_game_state(delta_time)
-            await self.broadcast_state()
+            # Lemaradáskor több tick fut egymás után (korlátosan), de csoportonként csak egy snapshot megy
+            due_groups: Dict[int, int] = {}
+            tick_times = []
+            for _ in range(scheduler.due_ticks()):
+                start_time = time.monotonic()
+                self.update_game_state(scheduler.interval)
+                tick_times.append(time.monotonic() - start_time)
+                scheduler.record_tick(tick_times[-1])
+                self.sim_histogram.observe(tick_times[-1])
+                due_groups.update(scheduler.snapshot_groups(scheduler.tick))
+            if due_groups:
+                start_time = time.monotonic()
+                self.broadcast_due(due_groups)
+                broadcast_time = time.monotonic() - start_time
+                scheduler.record_broadcast(broadcast_time)
+                self.broadcast_histogram.observe(broadcast_time)
+                # A snapshotos tick ideje a küldéssel együtt számít a túlterhelés méréshez
+                tick_times[-1] += broadcast_time
+            for tick_time in tick_times:
+                self.overload.record_tick(tick_time)
+                self.tick_histogram.observe(tick_time)
+            self.overload.evaluate()
+
+            now = time.monotonic()
+            if now - self.last_queue_stats_time >= QUEUE_STATS_INTERVAL:
+                self.last_queue_stats_time = now
+                self.log_queue_stats()
+
+            await asyncio.sleep(scheduler.sleep_time())
+
+async def serve_clients(transport: str, on_connect, simulator: Optional[NetworkSimulator],
+                        name: str):
+    """Kliensek fogadása (TCP vagy UDP); minden új kapcsolat protokollja az on_connect-be megy."""
+    loop = asyncio.get_running_loop()
+    if transport == TRANSPORT_UDP:
+        udp_transport, endpoint = await loop.create_datagram_endpoint(
+            lambda: UdpServerProtocol(on_connect, simulator),
+            local_addr=(SERVER_HOST, SERVER_PORT)
+        )
+        logging.info(f"{name} running on {udp_transport.get_extra_info('sockname')} (UDP)")
+        try:
+            await asyncio.Future()
+        finally:
+            endpoint.close()
+        return
+
+    server = await loop.create_server(
+        lambda: FramedProtocol(on_open=on_connect), SERVER_HOST, SERVER_PORT
+    )
+    logging.info(f"{name} running on {server.sockets[0].getsockname()}")
+    async with server:
+        await server.serve_forever()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="RoguelikeShooter game server")
+    parser.add_argument("--transport", choices=[TRANSPORT_TCP, TRANSPORT_UDP], default=TRANSPORT)
+    parser.add_argument("--tick-rate", type=float, default=TICK_RATE, help="Simulation rate (Hz)")
+    parser.add_argument("--snapshot-rate", type=float, default=BROADCAST_RATE,
+                        help="Per-client snapshot send rate (Hz)")
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT,
+                        help="Prometheus /metrics port (0 = disabled; zone workers use the next ports)")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Sharded mode: number of zone worker processes (0 = single process)")
+    parser.add_argument("--sim-loss", type=float, default=0.0, help="UDP: simulated packet loss (0..1)")
+    parser.add_argument("--sim-latency", type=float, default=0.0, help="UDP: simulated one-way latency (s)")
+    parser.add_argument("--sim-jitter", type=float, default=0.0, help="UDP: simulated extra random delay (s)")
+    return parser.parse_args()
 
-            elapsed_time = time.time() - start_time
-            sleep_time = TICK_INTERVAL - elapsed_time
-            
-            if sleep_time > 0:
-                await asyncio.sleep(sleep_time)
 
 if __name__ == "__main__":
+    args = parse_args()
     try:
-        server = GameServer()
-        asyncio.run(server.start())
+        simulator = NetworkSimulator(args.sim_loss, args.sim_latency, args.sim_jitter)
+        if args.workers > 0:
+            # Sharded mód: front folyamat + zónánként egy worker folyamat
+            from shard import ShardGateway
+            ShardGateway(args.workers, args.transport, simulator,
+                         args.tick_rate, args.snapshot_rate, metrics_port=args.metrics_port).run()
+        else:
+            server = GameServer(args.transport, simulator, args.tick_rate, args.snapshot_rate,
+                                metrics_port=args.metrics_port)
+            asyncio.run(server.start())
     except KeyboardInterrupt:
         logging.info("Server shutting down due to KeyboardInterrupt.")
     except Exception as e:
@@ -0,0 +1,470 @@
+"""
+Sharded szerver: a világ x tengely menti sávokra (zónákra) oszlik, minden zónát egy
+külön worker folyamat szimulál (saját GameServer loop-pal, saját maggal).
+A front folyamat (ShardGateway) fogadja a klienseket, és a kereteiket helyi IPC-n
+(socketpair) a játékos zónájának workeréhez továbbítja. Határátlépéskor a worker
+átadja a játékost (állapottal együtt) a front-on keresztül a szomszéd zónának;
+a kliens ebből csak egy keyframe-et lát, a hálózati indexe nem változik.
+
+Futtatás a network könyvtárból:
+    python server.py --workers 4
+"""
+import asyncio
+import json
+import logging
+import multiprocessing
+import socket
+import struct
+import time
+import uuid
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from protocol import HEADER_FORMAT, encode_message, MSG_TYPE_SERVER_ERROR
+from framing import FramedProtocol
+from interest import AOI_RADIUS
+from world import quantize_arrays, MAX_PLAYERS
+from udp_transport import NetworkSimulator
+from server import (
+    GameServer, PlayerConnection, serve_clients,
+    TRANSPORT, TICK_RATE, BROADCAST_RATE, WIRE_FORMAT, QUEUE_STATS_INTERVAL
+)
+
+# --- Konfiguráció ---
+ZONE_WIDTH = 500.0          # Egy zóna sáv szélessége; a sávok körbeforgó sorrendben a workereké
+HANDOFF_MARGIN = 5.0        # Ennyivel kell a szomszéd zónába lépni az átadáshoz (nincs pingpong)
+GHOST_MARGIN = AOI_RADIUS + 10.0  # A határhoz ennyire közeli játékosokat a többi zóna is látja
+INDEX_REUSE_DELAY = 5.0     # mp: a felszabadult hálózati index csak ennyi idő múlva osztható ki újra
+
+# IPC üzenetek (front <-> worker): hossz előtagos keret, törzse <BI (típus, index) + adat
+LINK_HEADER = struct.Struct('<BI')
+LINK_JOIN = 1             # front -> worker: új vagy átadott játékos (JSON: id, addr, spawn / state)
+LINK_FRAME = 2            # front -> worker: a kliens egy bejövő kerete (törzs)
+LINK_LEAVE = 3            # front -> worker: a kliens lecsatlakozott
+LINK_SEND = 4             # worker -> front: kimenő keret (megbízható)
+LINK_SEND_UNRELIABLE = 5  # worker -> front: kimenő STATE (UDP-n nem megbízható, torlódáskor eldobható)
+LINK_CLOSE = 6            # worker -> front: a kapcsolat bontása
+LINK_HANDOFF = 7          # worker -> front: zónaváltás (adat: cél zóna bájt + JSON állapot)
+LINK_GHOSTS = 8           # worker -> front -> többi worker: határ menti játékosok (index = forrás zóna)
+
+_LINK_PREFIX = struct.Struct(HEADER_FORMAT)
+
+
+def encode_link(kind: int, index: int, data: bytes = b"") -> bytes:
+    return b"".join((_LINK_PREFIX.pack(LINK_HEADER.size + len(data)),
+                     LINK_HEADER.pack(kind, index), data))
+
+
+def zone_of(x, zones: int, zone_width: float = ZONE_WIDTH):
+    """Az x koordináta zónája (skalár vagy numpy tömb)."""
+    return np.floor_divide(x, zone_width).astype(np.int64) % zones
+
+
+def encode_ghosts(slots: np.ndarray, position: np.ndarray, velocity: np.ndarray) -> bytes:
+    return (slots.astype('<i8').tobytes() + position.astype('<f8').tobytes()
+            + velocity.astype('<f8').tobytes())
+
+
+def decode_ghosts(data: bytes) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Vissza: (slotok, pozíciók, kvantált értékek)."""
+    count = len(data) // 40
+    slots = np.frombuffer(data, dtype='<i8', count=count).astype(np.int64)
+    position = np.frombuffer(data, dtype='<f8', count=2 * count, offset=8 * count).reshape(count, 2)
+    velocity = np.frombuffer(data, dtype='<f8', count=2 * count, offset=24 * count).reshape(count, 2)
+    return slots, position, quantize_arrays(position, velocity)
+
+
+# --- Worker oldal ---
+
+class ZoneClientProtocol:
+    """
+    Egy kliens kapcsolat a worker oldalán: a FramedProtocol / UdpConnection felülete,
+    de a keretek a front folyamattal közös IPC csatornán mennek.
+    """
+    def __init__(self, worker: 'ZoneWorker', index: int, peername: Tuple[str, int]):
+        self.worker = worker
+        self.index = index
+        self.peername = peername
+        self.on_frame = None
+        self.on_close = None
+        self.closed = False
+        self.handed_off = False   # Zónaváltás: a front nem bontja a kapcsolatot
+        self.reads = self.frames_received = self.bytes_received = 0
+        self.writes = self.frames_sent = self.bytes_sent = 0
+
+    @property
+    def write_paused(self) -> bool:
+        return self.worker.link.write_paused
+
+    def receive(self, body: memoryview):
+        self.reads += 1
+        self.frames_received += 1
+        self.bytes_received += len(body)
+        if self.on_frame:
+            self.on_frame(body)
+
+    def write(self, frame: bytes, reliable: bool = True):
+        self.write_frames([frame] if reliable else [], None if reliable else frame)
+
+    def write_frames(self, frames: List[bytes], unreliable_frame: Optional[bytes] = None):
+        if self.closed:
+            return
+        batch = [encode_link(LINK_SEND, self.index, frame) for frame in frames]
+        if unreliable_frame is not None:
+            batch.append(encode_link(LINK_SEND_UNRELIABLE, self.index, unreliable_frame))
+        self.writes += 1
+        self.frames_sent += len(batch)
+        self.bytes_sent += sum(len(frame) for frame in batch)
+        self.worker.link.write_frames(batch)
+
+    async def drain(self):
+        if self.closed:
+            raise ConnectionResetError("Connection lost")
+        await self.worker.link.drain()
+
+    def close(self):
+        """A worker bontja a kapcsolatot (hiba, elutasítás) vagy átadta a játékost."""
+        if self.closed:
+            return
+        self.closed = True
+        self.worker.clients.pop(self.index, None)
+        if self.handed_off:
+            return
+        self.worker.link.write(encode_link(LINK_CLOSE, self.index))
+        if self.on_close:
+            self.on_close(None)
+
+    def connection_lost(self):
+        """A kliens a front felé bontott."""
+        if self.closed:
+            return
+        self.closed = True
+        if self.on_close:
+            self.on_close(None)
+
+
+class ZoneWorker(GameServer):
+    """
+    Egy zóna szimulációja: a GameServer logikája változatlan, a kliensek a front
+    folyamaton keresztül érkeznek. A tick és a snapshot sorszám a közös epoch-hoz igazodik,
+    így zónaváltás után a kliens sorszámai és szerver ideje folytonos marad.
+    """
+    def __init__(self, zone: int, zones: int, zone_width: float, tick_rate: float,
+                 broadcast_rate: float, epoch: float, metrics_port: Optional[int] = None):
+        super().__init__(TRANSPORT, None, tick_rate, broadcast_rate, epoch, metrics_port)
+        self.zone = zone
+        self.zones = zones
+        self.zone_width = zone_width
+        self.link: Optional[FramedProtocol] = None
+        self.clients: Dict[int, ZoneClientProtocol] = {}
+        # Más zónák határ menti játékosai (forrás zóna -> (slotok, pozíciók, kvantált értékek))
+        self.ghosts: Dict[int, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        self.handoffs_in = 0
+        self.handoffs_out = 0
+
+    async def run(self, sock: socket.socket):
+        loop = asyncio.get_running_loop()
+        _, self.link = await loop.connect_accepted_socket(
+            lambda: FramedProtocol(on_frame=self.on_link_frame), sock)
+        self.is_running = True
+        await self.start_metrics()
+        asyncio.create_task(self.game_loop())
+        logging.info(f"Zone {self.zone}/{self.zones} worker running.")
+        await self.link.closed_future
+        self.is_running = False
+
+    def on_link_frame(self, frame: memoryview):
+        kind, index = LINK_HEADER.unpack_from(frame)
+        data = frame[LINK_HEADER.size:]
+        if kind == LINK_FRAME:
+            client = self.clients.get(index)
+            if client is not None:
+                client.receive(data)
+        elif kind == LINK_JOIN:
+            self.join(index, json.loads(bytes(data)))
+        elif kind == LINK_LEAVE:
+            client = self.clients.pop(index, None)
+            if client is not None:
+                client.connection_lost()
+        elif kind == LINK_GHOSTS:
+            self.ghosts[index] = decode_ghosts(bytes(data))
+
+    def join(self, index: int, info: Dict):
+        client = ZoneClientProtocol(self, index, tuple(info["addr"]))
+        self.clients[index] = client
+        state = info.get("state")
+        if state is None:
+            connection = self.handle_client(client, info["id"], index)
+            if connection is not None:
+                self.place_player(connection, *info["spawn"])
+            return
+        # Átvett játékos: a belépés már engedélyezett volt, a WELCOME-ot ismeri
+        connection = PlayerConnection(client, self, info["id"], index)
+        connection.restore_state(state)
+        self.connections[connection.player_id] = connection
+        connection.start(welcome=False)
+        self.handoffs_in += 1
+
+    def update_game_state(self, delta_time: float):
+        super().update_game_state(delta_time)
+        self.check_handoffs()
+
+    def check_handoffs(self):
+        """A zónából (HANDOFF_MARGIN-nel) kilépett játékosok átadása a cél zónának."""
+        slots = self.world.active_slots()
+        if len(slots) == 0:
+            return
+        x = self.world.position[slots, 0]
+        owner = zone_of(x, self.zones, self.zone_width)
+        leaving = ((owner != self.zone)
+                   & (zone_of(x - HANDOFF_MARGIN, self.zones, self.zone_width) == owner)
+                   & (zone_of(x + HANDOFF_MARGIN, self.zones, self.zone_width) == owner))
+        for i in np.flatnonzero(leaving).tolist():
+            connection = self.connections.get(self.world.player_ids[slots[i]])
+            if connection is not None:
+                self.hand_off(connection, int(owner[i]))
+
+    def hand_off(self, connection: PlayerConnection, target: int):
+        state = connection.handoff_state()
+        connection.protocol.handed_off = True
+        self.remove_player(connection.player_id)
+        self.link.write(encode_link(LINK_HANDOFF, connection.slot,
+                                    bytes([target]) + json.dumps(state).encode()))
+        self.handoffs_out += 1
+        logging.debug(f"Player {connection.slot} handed off to zone {target}")
+
+    def broadcast_targets(self):
+        slots, positions, values = super().broadcast_targets()
+        ghosts = [ghost for ghost in self.ghosts.values() if len(ghost[0])]
+        if not ghosts:
+            return slots, positions, values
+        ghost_slots = np.concatenate([g[0] for g in ghosts])
+        ghost_positions = np.concatenate([g[1] for g in ghosts])
+        ghost_values = np.concatenate([g[2] for g in ghosts])
+        # Az épp átvett (már helyi) játékos régi ghost példánya kimarad
+        active = self.world.active
+        local = (ghost_slots < len(active)) & active[np.minimum(ghost_slots, len(active) - 1)]
+        keep = ~local
+        return (np.concatenate([slots, ghost_slots[keep]]),
+                np.concatenate([positions, ghost_positions[keep]]),
+                np.concatenate([values, ghost_values[keep]]))
+
+    def broadcast_due(self, groups):
+        # A snapshot sorszám a közös epoch-hoz kötött tickből adódik, a csoport a slotból:
+        # zónaváltáskor a kliens sorszámai folytonosak maradnak
+        super().broadcast_due(groups)
+        # Ghostok snapshot ütemben (a 0. csoport körönként egyszer esedékes)
+        if self.zones > 1 and 0 in groups:
+            self.send_ghosts()
+
+    def send_ghosts(self):
+        """A zónahatár közelében lévő saját játékosok a többi zónának (üresen is: törli a régit)."""
+        slots = self.world.active_slots()
+        offset = np.mod(self.world.position[slots, 0], self.zone_width)
+        border = slots[(offset < GHOST_MARGIN) | (offset > self.zone_width - GHOST_MARGIN)]
+        self.link.write(encode_link(LINK_GHOSTS, self.zone, encode_ghosts(
+            border, self.world.position[border], self.world.velocity[border])))
+
+    def log_queue_stats(self):
+        super().log_queue_stats()
+        if self.connections:
+            logging.info(f"Zone {self.zone}: players={len(self.world)}, "
+                         f"ghosts={sum(len(g[0]) for g in self.ghosts.values())}, "
+                         f"handoffs_in={self.handoffs_in}, handoffs_out={self.handoffs_out}")
+
+
+def run_worker(zone: int, zones: int, zone_width: float, sock: socket.socket,
+               inherited: List[socket.socket], tick_rate: float, broadcast_rate: float, epoch: float,
+               metrics_port: Optional[int]):
+    """A worker folyamat belépési pontja."""
+    # A fork-kal örökölt front oldali socketvégek bezárása: így a front kilépésekor
+    # a worker is EOF-ot lát (és nem tartja életben a többi worker csatornáját)
+    for other in inherited:
+        other.close()
+    for handler in logging.getLogger().handlers:
+        handler.setFormatter(logging.Formatter(
+            f'%(asctime)s | ZONE {zone} | %(levelname)s | %(message)s', datefmt='%H:%M:%S'))
+    worker = ZoneWorker(zone, zones, zone_width, tick_rate, broadcast_rate, epoch, metrics_port)
+    try:
+        asyncio.run(worker.run(sock))
+    except KeyboardInterrupt:
+        pass
+
+
+# --- Front oldal ---
+
+class ShardClient:
+    """Egy kliens a front folyamatban: a kapcsolata és a zóna, amelyik szimulálja."""
+    __slots__ = ("protocol", "player_id", "zone")
+
+    def __init__(self, protocol, player_id: str, zone: int):
+        self.protocol = protocol
+        self.player_id = player_id
+        self.zone = zone
+
+
+class ShardGateway:
+    """
+    Front folyamat: elindítja a zóna workereket, fogadja a klienseket (TCP vagy UDP),
+    és a kereteket a játékos aktuális zónájához irányítja. Kódolást és szimulációt nem
+    végez, csak továbbít, így a terhelés a workerek közt (magonként) oszlik el.
+    """
+    def __init__(self, workers: int, transport: str = TRANSPORT,
+                 simulator: Optional[NetworkSimulator] = None,
+                 tick_rate: float = TICK_RATE, broadcast_rate: float = BROADCAST_RATE,
+                 zone_width: float = ZONE_WIDTH, metrics_port: Optional[int] = None):
+        self.workers = workers
+        self.transport = transport
+        self.simulator = simulator
+        self.tick_rate = tick_rate
+        self.broadcast_rate = broadcast_rate
+        self.zone_width = zone_width
+        # Metrikák zónánként: a workerek a metrics_port + 1 + zóna porton szolgálnak ki
+        self.metrics_port = metrics_port
+
+        self.processes: List[multiprocessing.Process] = []
+        self.link_sockets: List[socket.socket] = []
+        self.links: List[FramedProtocol] = []
+        self.clients: Dict[int, ShardClient] = {}
+        self.free_indices: deque = deque()   # (felszabadulás ideje, index)
+        self.high_water = 0
+        self.next_spawn_zone = 0
+        # Statisztika
+        self.handoffs = 0
+        self.dropped_states = 0   # Lassú kliens miatt eldobott STATE (a worker már a következőt küldi)
+
+    def run(self):
+        """Workerek indítása (még az asyncio loop előtt, fork-kal), majd a front loop."""
+        epoch = time.monotonic()   # Linuxon a monoton óra folyamatok közt közös
+        context = multiprocessing.get_context("fork")
+        for zone in range(self.workers):
+            parent, child = socket.socketpair()
+            process = context.Process(
+                target=run_worker, name=f"zone-{zone}", daemon=True,
+                args=(zone, self.workers, self.zone_width, child, self.link_sockets + [parent],
+                      self.tick_rate, self.broadcast_rate, epoch,
+                      self.metrics_port + 1 + zone if self.metrics_port else None))
+            process.start()
+            child.close()
+            self.processes.append(process)
+            self.link_sockets.append(parent)
+        try:
+            asyncio.run(self.serve())
+        finally:
+            for process in self.processes:
+                process.terminate()
+            for process in self.processes:
+                process.join()
+
+    async def serve(self):
+        loop = asyncio.get_running_loop()
+        for zone, sock in enumerate(self.link_sockets):
+            _, link = await loop.connect_accepted_socket(
+                lambda zone=zone: FramedProtocol(
+                    on_frame=lambda frame: self.on_worker_frame(zone, frame),
+                    on_close=lambda exc: self.on_worker_lost(zone)),
+                sock)
+            self.links.append(link)
+        asyncio.create_task(self.stats_loop())
+        await serve_clients(self.transport, self.handle_client, self.simulator,
+                            f"ShardGateway ({self.workers} zones)")
+
+    # --- Kliensek ---
+
+    def allocate_index(self) -> Optional[int]:
+        """
+        Hálózati index kiosztása. A felszabadult index csak INDEX_REUSE_DELAY után
+        kerül újra ki, hogy egy úton lévő régi IPC üzenet ne érje el az új gazdáját.
+        """
+        if self.free_indices and time.monotonic() - self.free_indices[0][0] >= INDEX_REUSE_DELAY:
+            return self.free_indices.popleft()[1]
+        if self.high_water < MAX_PLAYERS:
+            self.high_water += 1
+            return self.high_water - 1
+        if self.free_indices:
+            return self.free_indices.popleft()[1]
+        return None
+
+    def handle_client(self, protocol):
+        index = self.allocate_index()
+        if index is None:
+            protocol.write(encode_message(MSG_TYPE_SERVER_ERROR, {"reason": "Server full."},
+                                          WIRE_FORMAT))
+            protocol.close()
+            return
+        # Új játékosok körbeforgó sorrendben a zónák közepén jelennek meg
+        zone = self.next_spawn_zone
+        self.next_spawn_zone = (zone + 1) % self.workers
+        client = ShardClient(protocol, str(uuid.uuid4()), zone)
+        self.clients[index] = client
+        protocol.on_frame = lambda frame: self.forward_frame(index, frame)
+        protocol.on_close = lambda exc: self.client_closed(index)
+        peer = protocol.peername
+        self.links[zone].write(encode_link(LINK_JOIN, index, json.dumps({
+            "id": client.player_id, "addr": [peer[0], peer[1]],
+            "spawn": [(zone + 0.5) * self.zone_width, 0.0]}).encode()))
+
+    def forward_frame(self, index: int, frame: memoryview):
+        client = self.clients.get(index)
+        if client is not None:
+            self.links[client.zone].write(encode_link(LINK_FRAME, index, frame))
+
+    def client_closed(self, index: int):
+        client = self.clients.pop(index, None)
+        if client is None:
+            return
+        self.links[client.zone].write(encode_link(LINK_LEAVE, index))
+        self.free_indices.append((time.monotonic(), index))
+
+    # --- Workerek ---
+
+    def on_worker_frame(self, zone: int, frame: memoryview):
+        kind, index = LINK_HEADER.unpack_from(frame)
+        if kind == LINK_GHOSTS:
+            data = bytes(frame)
+            forwarded = _LINK_PREFIX.pack(len(data)) + data
+            for other, link in enumerate(self.links):
+                if other != zone:
+                    link.write(forwarded)
+            return
+
+        client = self.clients.get(index)
+        if client is None or client.zone != zone:
+            return   # Már lecsatlakozott vagy átadott játékos késő üzenete
+        data = frame[LINK_HEADER.size:]
+        if kind == LINK_SEND:
+            client.protocol.write(bytes(data))
+        elif kind == LINK_SEND_UNRELIABLE:
+            if client.protocol.write_paused:
+                self.dropped_states += 1
+                return
+            client.protocol.write(bytes(data), reliable=False)
+        elif kind == LINK_CLOSE:
+            client.protocol.close()
+        elif kind == LINK_HANDOFF:
+            target = data[0]
+            client.zone = target
+            peer = client.protocol.peername
+            self.links[target].write(encode_link(LINK_JOIN, index, json.dumps({
+                "id": client.player_id, "addr": [peer[0], peer[1]],
+                "state": json.loads(bytes(data[1:]))}).encode()))
+            self.handoffs += 1
+
+    def on_worker_lost(self, zone: int):
+        logging.error(f"Zone {zone} worker link lost, closing its clients.")
+        for client in list(self.clients.values()):
+            if client.zone == zone:
+                client.protocol.close()
+
+    async def stats_loop(self):
+        while True:
+            await asyncio.sleep(QUEUE_STATS_INTERVAL)
+            if not self.clients:
+                continue
+            per_zone = [0] * self.workers
+            for client in self.clients.values():
+                per_zone[client.zone] += 1
+            logging.info(f"Shard: clients={len(self.clients)}, per_zone={per_zone}, "
+                         f"handoffs={self.handoffs}, dropped_states={self.dropped_states}")
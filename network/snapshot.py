@@ -0,0 +1,152 @@
+from typing import Dict, Any, List, Optional, Tuple, Iterable
+
+import numpy as np
+
+from protocol import (
+    PlayerState, quantize_player, FIELD_NAMES, FIELD_ALL, NO_BASELINE
+)
+
+# Hány snapshotot őrzünk meg (20 Hz-es küldésnél ~3 mp): ennél régebbi nyugtához keyframe megy
+SNAPSHOT_RING_SIZE = 64
+# Legkésőbb ennyi snapshotonként teljes állapot (helyreállás, új kliens), 20 Hz-en ~1 mp
+KEYFRAME_INTERVAL = 20
+
+# Snapshot: {játékos index: (x, y, vx, vy) kvantálva}
+Snapshot = Dict[int, tuple]
+
+
+def build_snapshot(players: Iterable[PlayerState]) -> Snapshot:
+    """Az aktuális állapot kvantált snapshotja (összehasonlítható egészek)."""
+    return {p.index: quantize_player(p) for p in players}
+
+
+def diff_snapshots(current: Snapshot, baseline: Snapshot) -> Tuple[List[tuple], List[int]]:
+    """
+    Változások a baseline-hoz képest.
+    Vissza: ([(index, mező maszk, értékek)], [eltűnt indexek]). Változatlan entitás nem kerül bele.
+    """
+    changes = []
+    for index, values in current.items():
+        base = baseline.get(index)
+        if base is None:
+            changes.append((index, FIELD_ALL, values))
+        elif base != values:
+            mask = 0
+            for i in range(len(values)):
+                if values[i] != base[i]:
+                    mask |= 1 << i
+            changes.append((index, mask, values))
+    removed = [index for index in baseline if index not in current]
+    return changes, removed
+
+
+# Mezőnkénti maszk bit (a FIELD_NAMES sorrendjében)
+FIELD_BITS = np.array([1 << i for i in range(len(FIELD_NAMES))], dtype=np.int64)
+VIEW_KEY_SCALE = 0x10000   # (néző sor, slot) -> egyetlen rendezhető kulcs
+
+
+def diff_views(viewers: np.ndarray, slots: np.ndarray, values: np.ndarray,
+               base_viewers: np.ndarray, base_slots: np.ndarray, base_values: np.ndarray):
+    """
+    A diff_snapshots tömbös megfelelője egyszerre minden nézőre.
+    Bemenet: (néző sor, slot, értékek) az aktuális nézetekből és a nézőnként választott
+    baseline nézetekből, mindkettő (néző, slot) szerint rendezve.
+    Vissza: (néző, slot, maszk, értékek) a változott sorokra, és (néző, slot) az eltűntekre.
+    """
+    keys = viewers * VIEW_KEY_SCALE + slots
+    base_keys = base_viewers * VIEW_KEY_SCALE + base_slots
+    if len(base_keys):
+        pos = np.minimum(np.searchsorted(base_keys, keys), len(base_keys) - 1)
+        found = base_keys[pos] == keys
+        masks = (values != base_values[pos]) @ FIELD_BITS
+        masks[~found] = FIELD_ALL
+        back = np.minimum(np.searchsorted(keys, base_keys), max(len(keys) - 1, 0))
+        removed = ~(keys[back] == base_keys) if len(keys) else np.ones(len(base_keys), dtype=bool)
+    else:
+        masks = np.full(len(keys), FIELD_ALL, dtype=np.int64)
+        removed = np.zeros(0, dtype=bool)
+    changed = masks != 0
+    return ((viewers[changed], slots[changed], masks[changed], values[changed]),
+            (base_viewers[removed], base_slots[removed]))
+
+
+class SnapshotRing:
+    """Az utolsó N snapshot, sorszám szerint (szerver oldal)."""
+    def __init__(self, size: int = SNAPSHOT_RING_SIZE):
+        self.size = size
+        self.seqs = [NO_BASELINE] * size
+        self.snapshots: List[Optional[Snapshot]] = [None] * size
+
+    def store(self, seq: int, snapshot: Snapshot):
+        slot = seq % self.size
+        self.seqs[slot] = seq
+        self.snapshots[slot] = snapshot
+
+    def get(self, seq: int) -> Optional[Snapshot]:
+        if seq == NO_BASELINE:
+            return None
+        slot = seq % self.size
+        if self.seqs[slot] != seq:
+            return None
+        return self.snapshots[slot]
+
+
+class SnapshotReceiver:
+    """
+    Kliens oldali delta visszaállítás: a megkapott snapshotokat sorszám szerint őrzi,
+    és minden deltát a szerver által megjelölt baseline-ra alkalmaz.
+    A látókörbe belépő / onnan kilépő entitásokról callbackek értesítenek
+    (spawn / despawn a kliens világában).
+    """
+    def __init__(self, size: int = SNAPSHOT_RING_SIZE):
+        self.ring = SnapshotRing(size)
+        self.last_seq = NO_BASELINE   # Ezt nyugtázza a kliens
+        self.missing_baselines = 0
+
+        self.visible = set()
+        self.on_enter = []   # callback(index, játékos szótár)
+        self.on_leave = []   # callback(index)
+
+    def apply(self, payload: Dict[str, Any]) -> Optional[Dict[int, Dict[str, Any]]]:
+        """Delta alkalmazása. Vissza: {index: játékos szótár}, vagy None, ha hiányzik a baseline."""
+        seq = payload.get("seq", NO_BASELINE)
+        baseline_seq = payload.get("baseline", NO_BASELINE)
+
+        if baseline_seq == NO_BASELINE:
+            players = {}
+        else:
+            baseline = self.ring.get(baseline_seq)
+            if baseline is None:
+                # Túl régi baseline: megvárjuk a következő keyframe-et
+                self.missing_baselines += 1
+                return None
+            players = {index: dict(p) for index, p in baseline.items()}
+
+        for change in payload.get("players", []):
+            index = change["index"]
+            entry = players.get(index)
+            if entry is None:
+                entry = {"index": index}
+                entry.update((name, 0.0) for name in FIELD_NAMES)
+                players[index] = entry
+            for name in FIELD_NAMES:
+                if name in change:
+                    entry[name] = change[name]
+        for index in payload.get("removed", []):
+            players.pop(index, None)
+
+        self.ring.store(seq, players)
+        if seq > self.last_seq:
+            self.last_seq = seq
+            self._notify(players)
+        return players
+
+    def _notify(self, players: Dict[int, Dict[str, Any]]):
+        visible = set(players)
+        for index in visible - self.visible:
+            for callback in self.on_enter:
+                callback(index, players[index])
+        for index in self.visible - visible:
+            for callback in self.on_leave:
+                callback(index)
+        self.visible = visible
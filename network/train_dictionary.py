@@ -0,0 +1,134 @@
+"""
+A snapshot tömörítés szótárának tanítása valódi szerver kódból vett STATE mintákon.
+A bench_server szimulált játékosaival futtatja a szervert (bináris és JSON formátumban),
+a kimenő STATE törzsekből szótárat tanít, majd a félretett mintákon kiírja a tömörítési
+arányt és a CPU költséget (szótárral és anélkül).
+
+Futtatás a network könyvtárból (a szótár a snapshot_dictionary.bin fájlba kerül):
+    python train_dictionary.py --players 50 200 --spread 500 100
+A szótár cseréje után a régi kliensek nem egyeztetnek tömörítést (más DICTIONARY_ID).
+"""
+import argparse
+import asyncio
+import logging
+import random
+import time
+import zlib
+
+from protocol import DIRECTIONS, COMMAND_RATE, MSG_TYPE_CLIENT_MOVE, HEADER_SIZE, COMPRESSION_THRESHOLD
+from compression import (train_dictionary, DICTIONARY_PATH, DICTIONARY_SIZE,
+                         COMPRESSION_LEVEL, WINDOW_BITS)
+from bench_server import BenchProtocol
+import server as game_server
+
+
+class CaptureProtocol(BenchProtocol):
+    """A bench protokollja, amely a STATE kereteket (a nem megbízható csatornát) el is teszi."""
+    def __init__(self, number: int, samples: list):
+        super().__init__(number)
+        self.samples = samples
+
+    def write_frames(self, frames, unreliable_frame=None):
+        super().write_frames(frames, unreliable_frame)
+        if unreliable_frame is not None:
+            self.samples.append(bytes(unreliable_frame[HEADER_SIZE:]))
+
+
+async def capture(count: int, ticks: int, seed: int, spread: float, wire_format: str) -> list:
+    """STATE törzsek egy szimulált játékból (a bench_server terhelésével)."""
+    game_server.WIRE_FORMAT = wire_format
+    rng = random.Random(seed)
+    server = game_server.GameServer()
+    samples: list = []
+    for number in range(count):
+        server.handle_client(CaptureProtocol(number, samples))
+    connections = list(server.connections.values())
+    for conn in connections:
+        server.place_player(conn, rng.uniform(-spread, spread), rng.uniform(-spread, spread))
+    directions = [rng.choice(DIRECTIONS) for _ in connections]
+
+    for tick in range(1, ticks + 1):
+        for i, conn in enumerate(connections):
+            if rng.random() < 0.02:
+                directions[i] = rng.choice(DIRECTIONS)
+            server.process_message(conn.player_id, {
+                "type": MSG_TYPE_CLIENT_MOVE,
+                "payload": {"ack": conn.sent_seq, "seq": tick, "directions": [directions[i]]}})
+        server.update_game_state(1.0 / COMMAND_RATE)
+        server.broadcast_due(dict(server.scheduler.snapshot_groups(tick)))
+        await asyncio.sleep(0)
+
+    server.is_running = False
+    for conn in connections:
+        server.remove_player(conn.player_id)
+    await asyncio.sleep(0)
+    return samples
+
+
+def evaluate(samples: list, dictionary: bytes):
+    """(eredeti bájt, tömörített bájt, µs/üzenet tömörítés, µs/üzenet kibontás) a küszöb feletti mintákon."""
+    template = zlib.compressobj(COMPRESSION_LEVEL, zlib.DEFLATED, WINDOW_BITS,
+                                **({"zdict": dictionary} if dictionary else {}))
+    samples = [sample for sample in samples if len(sample) >= COMPRESSION_THRESHOLD]
+    compressed = []
+    start = time.perf_counter()
+    for sample in samples:
+        compressor = template.copy()
+        compressed.append(compressor.compress(sample) + compressor.flush())
+    compress_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for data in compressed:
+        decompressor = zlib.decompressobj(WINDOW_BITS, **({"zdict": dictionary} if dictionary else {}))
+        decompressor.decompress(data)
+    decompress_time = time.perf_counter() - start
+    count = max(1, len(samples))
+    return (sum(len(s) for s in samples), sum(len(c) for c in compressed),
+            compress_time / count * 1e6, decompress_time / count * 1e6)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Snapshot tömörítő szótár tanítása")
+    parser.add_argument("--players", type=int, nargs="+", default=[50, 200])
+    parser.add_argument("--ticks", type=int, default=600)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--spread", type=float, nargs="+", default=[500.0, 100.0],
+                        help="Kezdőpozíciók tartománya (a sűrű jelenetben nagyok a snapshotok)")
+    parser.add_argument("--max-samples", type=int, default=4000,
+                        help="Formátumonként legfeljebb ennyi minta (a tanítás ideje miatt)")
+    parser.add_argument("--size", type=int, default=DICTIONARY_SIZE)
+    parser.add_argument("--output", default=DICTIONARY_PATH)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    rng = random.Random(args.seed)
+    training, held_out = {}, {}
+    for wire_format in (game_server.WIRE_FORMAT_BINARY, game_server.WIRE_FORMAT_JSON):
+        samples = []
+        for count in args.players:
+            for spread in args.spread:
+                samples += asyncio.run(capture(count, args.ticks, args.seed, spread, wire_format))
+        rng.shuffle(samples)
+        samples = samples[:args.max_samples]
+        split = len(samples) * 4 // 5
+        training[wire_format], held_out[wire_format] = samples[:split], samples[split:]
+
+    # A bináris a fő formátum: a szótár nagyobb része annak jut
+    binary = train_dictionary(training[game_server.WIRE_FORMAT_BINARY], args.size * 3 // 4)
+    text = train_dictionary(training[game_server.WIRE_FORMAT_JSON], args.size - len(binary))
+    # A gyakoribb (bináris) rész a végére, ahol a legolcsóbb rá hivatkozni
+    dictionary = text + binary
+    with open(args.output, "wb") as f:
+        f.write(dictionary)
+    print(f"Dictionary: {len(dictionary)} bytes, id {zlib.crc32(dictionary)} -> {args.output}")
+
+    print(f"{'format':>8} {'dict':>5} {'messages':>9} {'ratio':>6} {'compress us':>12} {'inflate us':>11}")
+    for wire_format, samples in held_out.items():
+        for label, zdict in (("no", None), ("yes", dictionary)):
+            original, compressed, compress_us, inflate_us = evaluate(samples, zdict)
+            messages = sum(1 for s in samples if len(s) >= COMPRESSION_THRESHOLD)
+            print(f"{wire_format:>8} {label:>5} {messages:>9} {original / max(1, compressed):>6.2f} "
+                  f"{compress_us:>12.1f} {inflate_us:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,496 @@
+import asyncio
+import random
+import secrets
+import socket
+import struct
+import time
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+from protocol import HEADER_SIZE
+
+TRANSPORT_TCP = "tcp"
+TRANSPORT_UDP = "udp"
+
+# --- Csomag formátum ---
+# [típus (B)] [kapcsolat azonosító (I)] [sorszám (H)] (+ darabolt csomagnál: [darab index (B)] [darabszám (B)])
+# A payload ugyanaz az üzenet törzs, mint TCP-n (a 4 bájtos hossz előtag nélkül).
+PACKET_HEADER = struct.Struct('<BIH')
+FRAGMENT_HEADER = struct.Struct('<BB')
+NONCE = struct.Struct('<I')
+
+PKT_CONNECT = 1      # Kliens -> szerver: kézfogás (payload: kliens nonce)
+PKT_ACCEPT = 2       # Szerver -> kliens: elfogadva (payload: nonce vissza), kapcsolat azonosító a fejlécben
+PKT_DISCONNECT = 3
+PKT_KEEPALIVE = 4
+PKT_ACK = 5          # Megbízható csomag nyugtája (a sorszám a fejlécben)
+PKT_UNRELIABLE = 6   # Sorszámozott, nem megbízható (pl. STATE): csak az újabb jut át
+PKT_RELIABLE = 7     # Megbízható, sorrendhelyes (pl. WELCOME, ERROR)
+PKT_FRAGMENT = 0x80  # Flag: darabolt üzenet része
+
+# --- Konfiguráció ---
+MAX_DATAGRAM_SIZE = 1200   # Biztonságos méret az átlagos MTU alatt
+MAX_FRAGMENT_PAYLOAD = MAX_DATAGRAM_SIZE - PACKET_HEADER.size - FRAGMENT_HEADER.size
+MAX_FRAGMENTS = 255
+CONNECT_RETRY_INTERVAL = 0.25
+CONNECT_TIMEOUT = 5.0
+CONNECTION_TIMEOUT = 5.0   # Ennyi csend után a kapcsolat halott
+KEEPALIVE_INTERVAL = 1.0
+UPDATE_INTERVAL = 0.01     # Újraküldés / időtúllépés ellenőrzés gyakorisága
+MIN_RTO = 0.05
+MAX_RTO = 1.0
+MAX_RESENDS = 20
+RELIABLE_WINDOW = 1024     # Ennyi nyugtázatlan megbízható csomag felett a kapcsolatot bontjuk
+SOCKET_BUFFER_SIZE = 1024 * 1024  # Nagyobb kernel puffer: egy tick kimenete ne csorduljon túl
+
+SEQ_MASK = 0xFFFF
+
+
+def seq_greater(a: int, b: int) -> bool:
+    """16 bites sorszám összehasonlítás körbefordulással."""
+    return a != b and ((a - b) & SEQ_MASK) < 0x8000
+
+
+class NetworkSimulator:
+    """
+    Helyi csomagvesztés / késleltetés / duplikálás szimulátor a küldő oldalon,
+    hogy valódi hálózat nélkül is tesztelhető legyen a megbízhatósági réteg.
+    """
+    def __init__(self, loss: float = 0.0, latency: float = 0.0, jitter: float = 0.0,
+                 duplicate: float = 0.0, seed: Optional[int] = None):
+        self.loss = loss
+        self.latency = latency
+        self.jitter = jitter
+        self.duplicate = duplicate
+        self.rng = random.Random(seed)
+        self.dropped = 0
+
+    @property
+    def active(self) -> bool:
+        return self.loss > 0 or self.latency > 0 or self.jitter > 0 or self.duplicate > 0
+
+    def send(self, transport, data: bytes, addr):
+        copies = 2 if self.rng.random() < self.duplicate else 1
+        for _ in range(copies):
+            if self.rng.random() < self.loss:
+                self.dropped += 1
+                continue
+            delay = self.latency + self.rng.uniform(0.0, self.jitter)
+            if delay > 0:
+                asyncio.get_running_loop().call_later(delay, self._deliver, transport, data, addr)
+            else:
+                self._deliver(transport, data, addr)
+
+    @staticmethod
+    def _deliver(transport, data, addr):
+        if not transport.is_closing():
+            transport.sendto(data, addr)
+
+
+class UdpConnection:
+    """
+    Egy UDP kapcsolat megbízhatósági rétege. A FramedProtocol-lal azonos felületet ad
+    (on_frame, on_close, write, write_frames, drain, close), így a szerver és a kliens
+    logikája szállítástól független.
+    """
+    def __init__(self, endpoint: 'UdpEndpoint', addr, connection_id: int):
+        self.endpoint = endpoint
+        self.addr = addr
+        self.peername = addr
+        self.connection_id = connection_id
+
+        self.on_frame: Optional[Callable[[memoryview], None]] = None
+        self.on_close: Optional[Callable[[Optional[Exception]], None]] = None
+        self.closed = False
+        self.closed_future = asyncio.get_running_loop().create_future()
+
+        now = time.monotonic()
+        self.last_received = now
+        self.last_sent = now
+
+        # Nem megbízható csatorna
+        self.unreliable_seq = 0
+        self.last_unreliable_seq: Optional[int] = None
+        self.partial_unreliable: Dict[int, List[Optional[bytes]]] = {}
+
+        # Megbízható csatorna: küldő oldal (sorszám -> [csomag, utolsó küldés, küldések száma])
+        self.reliable_seq = 0
+        self.pending: Dict[int, list] = {}
+        # Fogadó oldal: a következő várt sorszám, sorrenden kívüli csomagok, darabok
+        self.expected_seq = 0
+        self.reorder: Dict[int, Tuple[int, bytes]] = {}
+        self.reliable_parts: List[bytes] = []
+
+        # RTT becslés (csak az elsőre nyugtázott csomagokból)
+        self.srtt: Optional[float] = None
+        self.rttvar = 0.0
+        self.rto = 0.2
+
+        # Statisztika (a FramedProtocol számlálóival azonos nevek)
+        self.reads = 0
+        self.frames_received = 0
+        self.bytes_received = 0
+        self.writes = 0
+        self.frames_sent = 0
+        self.bytes_sent = 0
+        self.resends = 0
+        self.duplicates = 0
+        self.stale_unreliable = 0
+
+    @property
+    def rtt(self) -> Optional[float]:
+        return self.srtt
+
+    # --- Küldés ---
+
+    def _send_packet(self, packet: bytes):
+        self.endpoint.send_datagram(packet, self.addr)
+        self.last_sent = time.monotonic()
+        self.writes += 1
+        self.bytes_sent += len(packet)
+
+    def _fragments(self, body: bytes) -> List[bytes]:
+        if len(body) <= MAX_DATAGRAM_SIZE - PACKET_HEADER.size:
+            return [body]
+        count = (len(body) + MAX_FRAGMENT_PAYLOAD - 1) // MAX_FRAGMENT_PAYLOAD
+        if count > MAX_FRAGMENTS:
+            raise ValueError(f"Message too large for UDP transport: {len(body)} bytes")
+        return [body[i * MAX_FRAGMENT_PAYLOAD:(i + 1) * MAX_FRAGMENT_PAYLOAD] for i in range(count)]
+
+    def send_body(self, body: bytes, reliable: bool = True):
+        """Egy üzenet törzs küldése (szükség esetén darabolva)."""
+        if self.closed:
+            return
+        parts = self._fragments(body)
+        fragmented = len(parts) > 1
+        self.frames_sent += 1
+
+        if not reliable:
+            seq = self.unreliable_seq
+            self.unreliable_seq = (seq + 1) & SEQ_MASK
+            for i, part in enumerate(parts):
+                if fragmented:
+                    header = PACKET_HEADER.pack(PKT_UNRELIABLE | PKT_FRAGMENT, self.connection_id, seq) \
+                             + FRAGMENT_HEADER.pack(i, len(parts))
+                else:
+                    header = PACKET_HEADER.pack(PKT_UNRELIABLE, self.connection_id, seq)
+                self._send_packet(header + part)
+            return
+
+        if len(self.pending) + len(parts) > RELIABLE_WINDOW:
+            self.close(ConnectionResetError("Reliable send window overflow"))
+            return
+        now = time.monotonic()
+        for i, part in enumerate(parts):
+            seq = self.reliable_seq
+            self.reliable_seq = (seq + 1) & SEQ_MASK
+            if fragmented:
+                header = PACKET_HEADER.pack(PKT_RELIABLE | PKT_FRAGMENT, self.connection_id, seq) \
+                         + FRAGMENT_HEADER.pack(i, len(parts))
+            else:
+                header = PACKET_HEADER.pack(PKT_RELIABLE, self.connection_id, seq)
+            packet = header + part
+            self.pending[seq] = [packet, now, 1]
+            self._send_packet(packet)
+
+    def send_control(self, packet_type: int, seq: int = 0, payload: bytes = b""):
+        self._send_packet(PACKET_HEADER.pack(packet_type, self.connection_id, seq) + payload)
+
+    # FramedProtocol kompatibilis felület (a keretek 4 bájtos hossz előtagja UDP-n nem kell)
+
+    def write(self, frame: bytes, reliable: bool = True):
+        self.send_body(frame[HEADER_SIZE:], reliable)
+
+    def write_frames(self, frames: List[bytes], unreliable_frame: Optional[bytes] = None):
+        for frame in frames:
+            self.send_body(frame[HEADER_SIZE:], True)
+        if unreliable_frame is not None:
+            self.send_body(unreliable_frame[HEADER_SIZE:], False)
+
+    @property
+    def write_paused(self) -> bool:
+        # A megbízható ablak saját korláttal bír, a nem megbízható csomag sosem vár
+        return False
+
+    async def drain(self):
+        if self.closed:
+            raise ConnectionResetError("Connection lost")
+
+    def close(self, exc: Optional[Exception] = None, notify_peer: bool = True):
+        if self.closed:
+            return
+        if exc is None and notify_peer:
+            # Udvarias bontás (elveszhet, a másik oldalt akkor az időtúllépés zárja)
+            self.send_control(PKT_DISCONNECT)
+        self.closed = True
+        self.endpoint.connection_closed(self)
+        if not self.closed_future.done():
+            self.closed_future.set_result(exc)
+        if self.on_close:
+            self.on_close(exc)
+
+    # --- Fogadás ---
+
+    def packet_received(self, packet_type: int, seq: int, data: memoryview):
+        now = time.monotonic()
+        self.last_received = now
+        self.reads += 1
+        self.bytes_received += len(data) + PACKET_HEADER.size
+
+        kind = packet_type & ~PKT_FRAGMENT
+        fragmented = bool(packet_type & PKT_FRAGMENT)
+
+        if kind == PKT_ACK:
+            entry = self.pending.pop(seq, None)
+            if entry is not None and entry[2] == 1:
+                self._update_rtt(now - entry[1])
+        elif kind == PKT_RELIABLE:
+            # Mindig nyugtázunk (a duplikátumot is: az előző ACK elveszhetett)
+            self.send_control(PKT_ACK, seq)
+            if seq == self.expected_seq or seq_greater(seq, self.expected_seq):
+                if seq not in self.reorder:
+                    self.reorder[seq] = (packet_type, bytes(data))
+                self._deliver_reliable()
+            else:
+                self.duplicates += 1
+        elif kind == PKT_UNRELIABLE:
+            self._receive_unreliable(seq, fragmented, data)
+        elif kind == PKT_DISCONNECT:
+            self.close(None, notify_peer=False)
+        # PKT_KEEPALIVE: elég a last_received frissítése
+
+    def _deliver_reliable(self):
+        while self.expected_seq in self.reorder:
+            packet_type, data = self.reorder.pop(self.expected_seq)
+            self.expected_seq = (self.expected_seq + 1) & SEQ_MASK
+            if packet_type & PKT_FRAGMENT:
+                index, count = FRAGMENT_HEADER.unpack_from(data, 0)
+                self.reliable_parts.append(data[FRAGMENT_HEADER.size:])
+                if index + 1 < count:
+                    continue
+                body = b"".join(self.reliable_parts)
+                self.reliable_parts = []
+            else:
+                body = data
+            self._deliver(memoryview(body))
+
+    def _receive_unreliable(self, seq: int, fragmented: bool, data: memoryview):
+        if self.last_unreliable_seq is not None and not seq_greater(seq, self.last_unreliable_seq):
+            self.stale_unreliable += 1
+            return
+        if fragmented:
+            index, count = FRAGMENT_HEADER.unpack_from(data, 0)
+            parts = self.partial_unreliable.get(seq)
+            if parts is None or len(parts) != count:
+                parts = [None] * count
+                self.partial_unreliable[seq] = parts
+            if index < count:
+                parts[index] = bytes(data[FRAGMENT_HEADER.size:])
+            if any(part is None for part in parts):
+                return
+            del self.partial_unreliable[seq]
+            body = memoryview(b"".join(parts))
+        else:
+            body = data
+        self.last_unreliable_seq = seq
+        # A kézbesítettnél régebbi, félkész darabokra már nincs szükség
+        for old in [s for s in self.partial_unreliable if not seq_greater(s, seq)]:
+            del self.partial_unreliable[old]
+        self._deliver(body)
+
+    def _deliver(self, body: memoryview):
+        self.frames_received += 1
+        if self.on_frame:
+            self.on_frame(body)
+
+    # --- Időzítés ---
+
+    def _update_rtt(self, sample: float):
+        if self.srtt is None:
+            self.srtt = sample
+            self.rttvar = sample / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - sample)
+            self.srtt = 0.875 * self.srtt + 0.125 * sample
+        self.rto = min(MAX_RTO, max(MIN_RTO, self.srtt + 4 * self.rttvar))
+
+    def update(self, now: float):
+        """Újraküldés, keepalive és időtúllépés (az endpoint hívja rendszeresen)."""
+        if self.closed:
+            return
+        if now - self.last_received > CONNECTION_TIMEOUT:
+            self.close(TimeoutError("Connection timed out"))
+            return
+        for seq, entry in self.pending.items():
+            packet, sent_at, sends = entry
+            # Exponenciális visszalépés az újraküldések között
+            if now - sent_at >= self.rto * (1 << min(sends - 1, 4)):
+                if sends > MAX_RESENDS:
+                    self.close(TimeoutError("Reliable message not acknowledged"))
+                    return
+                entry[1] = now
+                entry[2] = sends + 1
+                self.resends += 1
+                self._send_packet(packet)
+        if now - self.last_sent > KEEPALIVE_INTERVAL:
+            self.send_control(PKT_KEEPALIVE)
+
+
+class UdpEndpoint(asyncio.DatagramProtocol):
+    """Közös alap: datagram küldés (szimulátoron át) és a kapcsolatok rendszeres frissítése."""
+    def __init__(self, simulator: Optional[NetworkSimulator] = None):
+        self.transport: Optional[asyncio.DatagramTransport] = None
+        self.simulator = simulator if simulator is not None and simulator.active else None
+        self.update_task: Optional[asyncio.Task] = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        sock = transport.get_extra_info('socket')
+        if sock is not None:
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_SIZE)
+            except OSError:
+                pass
+        self.update_task = asyncio.create_task(self.update_loop())
+
+    def connection_lost(self, exc):
+        if self.update_task is not None:
+            self.update_task.cancel()
+
+    def send_datagram(self, data: bytes, addr):
+        if self.transport is None or self.transport.is_closing():
+            return
+        if self.simulator is not None:
+            self.simulator.send(self.transport, data, addr)
+        else:
+            self.transport.sendto(data, addr)
+
+    def connections(self) -> List[UdpConnection]:
+        return []
+
+    def connection_closed(self, connection: UdpConnection):
+        pass
+
+    async def update_loop(self):
+        while True:
+            await asyncio.sleep(UPDATE_INTERVAL)
+            now = time.monotonic()
+            for connection in self.connections():
+                connection.update(now)
+
+
+class UdpServerProtocol(UdpEndpoint):
+    """Szerver oldali UDP végpont: kézfogás, kapcsolatok cím szerint, on_connect callback."""
+    def __init__(self, on_connect: Callable[[UdpConnection], None],
+                 simulator: Optional[NetworkSimulator] = None):
+        super().__init__(simulator)
+        self.on_connect = on_connect
+        self.by_addr: Dict[tuple, UdpConnection] = {}
+        self.nonces: Dict[tuple, int] = {}
+
+    def connections(self) -> List[UdpConnection]:
+        return list(self.by_addr.values())
+
+    def connection_closed(self, connection: UdpConnection):
+        if self.by_addr.get(connection.addr) is connection:
+            del self.by_addr[connection.addr]
+            self.nonces.pop(connection.addr, None)
+
+    def datagram_received(self, data: bytes, addr):
+        if len(data) < PACKET_HEADER.size:
+            return
+        packet_type, connection_id, seq = PACKET_HEADER.unpack_from(data, 0)
+        payload = memoryview(data)[PACKET_HEADER.size:]
+
+        if packet_type == PKT_CONNECT:
+            if len(payload) < NONCE.size:
+                return
+            nonce, = NONCE.unpack_from(payload, 0)
+            connection = self.by_addr.get(addr)
+            if connection is not None and self.nonces.get(addr) == nonce:
+                # Az ACCEPT elveszett: újraküldjük
+                connection.send_control(PKT_ACCEPT, 0, NONCE.pack(nonce))
+                return
+            if connection is not None:
+                # Ugyanarról a címről új kapcsolat: a régit lezárjuk
+                connection.close(ConnectionResetError("Replaced by new connection"))
+            connection = UdpConnection(self, addr, secrets.randbits(32) or 1)
+            self.by_addr[addr] = connection
+            self.nonces[addr] = nonce
+            connection.send_control(PKT_ACCEPT, 0, NONCE.pack(nonce))
+            self.on_connect(connection)
+            return
+
+        connection = self.by_addr.get(addr)
+        if connection is None or connection.connection_id != connection_id:
+            return
+        connection.packet_received(packet_type, seq, payload)
+
+    def close(self):
+        for connection in self.connections():
+            connection.close()
+        if self.transport is not None:
+            self.transport.close()
+
+
+class UdpClientProtocol(UdpEndpoint):
+    """Kliens oldali UDP végpont egyetlen szerver kapcsolattal."""
+    def __init__(self, on_frame: Callable[[memoryview], None],
+                 simulator: Optional[NetworkSimulator] = None):
+        super().__init__(simulator)
+        self.on_frame = on_frame
+        self.connection: Optional[UdpConnection] = None
+        self.nonce = secrets.randbits(32)
+        self.accepted: asyncio.Future = asyncio.get_running_loop().create_future()
+
+    def connections(self) -> List[UdpConnection]:
+        return [self.connection] if self.connection is not None else []
+
+    def connection_closed(self, connection: UdpConnection):
+        if self.transport is not None:
+            self.transport.close()
+
+    def datagram_received(self, data: bytes, addr):
+        if len(data) < PACKET_HEADER.size:
+            return
+        packet_type, connection_id, seq = PACKET_HEADER.unpack_from(data, 0)
+        payload = memoryview(data)[PACKET_HEADER.size:]
+
+        if packet_type == PKT_ACCEPT:
+            if self.connection is None and len(payload) >= NONCE.size \
+                    and NONCE.unpack_from(payload, 0)[0] == self.nonce:
+                # A callback azonnal kell: az első megbízható üzenet (WELCOME) az ACCEPT után jön
+                self.connection = UdpConnection(self, addr, connection_id)
+                self.connection.on_frame = self.on_frame
+                if not self.accepted.done():
+                    self.accepted.set_result(self.connection)
+            return
+
+        if self.connection is not None and connection_id == self.connection.connection_id:
+            self.connection.packet_received(packet_type, seq, payload)
+
+    async def handshake(self, addr) -> UdpConnection:
+        deadline = time.monotonic() + CONNECT_TIMEOUT
+        while time.monotonic() < deadline:
+            self.send_datagram(PACKET_HEADER.pack(PKT_CONNECT, 0, 0) + NONCE.pack(self.nonce), addr)
+            try:
+                return await asyncio.wait_for(asyncio.shield(self.accepted), CONNECT_RETRY_INTERVAL)
+            except asyncio.TimeoutError:
+                continue
+        raise ConnectionRefusedError(f"No UDP handshake response from {addr[0]}:{addr[1]}")
+
+
+async def udp_connect(host: str, port: int, on_frame: Callable[[memoryview], None],
+                      simulator: Optional[NetworkSimulator] = None) -> UdpConnection:
+    """UDP kapcsolat felépítése kézfogással. Vissza: a kész UdpConnection."""
+    loop = asyncio.get_running_loop()
+    transport, endpoint = await loop.create_datagram_endpoint(
+        lambda: UdpClientProtocol(on_frame, simulator), remote_addr=(host, port))
+    try:
+        connection = await endpoint.handshake((host, port))
+    except Exception:
+        transport.close()
+        raise
+    logging.debug(f"UDP connection established (id={connection.connection_id})")
+    return connection
@@ -0,0 +1,123 @@
+from typing import List, Optional
+
+import numpy as np
+
+from protocol import POSITION_SCALE, VELOCITY_SCALE, VELOCITY_LIMIT, PLAYER_SPEED, DIRECTIONS
+
+MAX_PLAYERS = 0x10000   # A slot egyben a hálózati index (u16)
+
+# Irány azonosító -> sebesség vektor (a protocol.apply_direction tömbös megfelelője)
+DIRECTION_VELOCITY = np.zeros((len(DIRECTIONS), 2), dtype=np.float64)
+DIRECTION_VELOCITY[DIRECTIONS.index("up")] = (0.0, -PLAYER_SPEED)
+DIRECTION_VELOCITY[DIRECTIONS.index("down")] = (0.0, PLAYER_SPEED)
+DIRECTION_VELOCITY[DIRECTIONS.index("left")] = (-PLAYER_SPEED, 0.0)
+DIRECTION_VELOCITY[DIRECTIONS.index("right")] = (PLAYER_SPEED, 0.0)
+
+
+class PlayerStore:
+    """
+    Szerver oldali játékos állapot struct-of-arrays formában: minden mező egy numpy tömb,
+    amelyet a játékos slotja indexel. A slot egyben a hálózati index; lecsatlakozáskor
+    a free-listre kerül és újra kiosztható (a többi slot nem mozdul).
+    """
+    def __init__(self, capacity: int = 64):
+        self.position = np.zeros((capacity, 2), dtype=np.float64)
+        self.velocity = np.zeros((capacity, 2), dtype=np.float64)
+        self.active = np.zeros(capacity, dtype=bool)
+        self.player_ids: List[Optional[str]] = [None] * capacity
+
+        self.free_slots: List[int] = []
+        self.high_water = 0    # A [0, high_water) slotok voltak már kiosztva
+        self.count = 0
+        self._active_slots: Optional[np.ndarray] = None   # Gyorsítótár (spawn/despawn érvényteleníti)
+
+    def __len__(self) -> int:
+        return self.count
+
+    # --- Slotok ---
+
+    def add(self, player_id: str, slot: Optional[int] = None) -> int:
+        """
+        Új játékos slot (a free-listről, ha van). Vissza: a slot (= hálózati index).
+        Adott slot is kérhető (zónák közti átadás: a hálózati index nem változik).
+        """
+        if slot is not None:
+            self._claim(slot)
+        elif self.free_slots:
+            slot = self.free_slots.pop()
+        else:
+            if self.high_water >= MAX_PLAYERS:
+                raise RuntimeError("No free player slot")
+            slot = self.high_water
+            self.high_water += 1
+            if slot == len(self.active):
+                self._grow(min(MAX_PLAYERS, len(self.active) * 2))
+        self.position[slot] = 0.0
+        self.velocity[slot] = 0.0
+        self.active[slot] = True
+        self.player_ids[slot] = player_id
+        self.count += 1
+        self._active_slots = None
+        return slot
+
+    def remove(self, slot: int):
+        if not self.active[slot]:
+            return
+        self.active[slot] = False
+        self.player_ids[slot] = None
+        self.free_slots.append(slot)
+        self.count -= 1
+        self._active_slots = None
+
+    def _claim(self, slot: int):
+        if not 0 <= slot < MAX_PLAYERS or (slot < len(self.active) and self.active[slot]):
+            raise RuntimeError(f"Player slot {slot} is not available")
+        if slot >= len(self.active):
+            capacity = len(self.active)
+            while capacity <= slot:
+                capacity *= 2
+            self._grow(min(MAX_PLAYERS, capacity))
+        if slot < self.high_water:
+            self.free_slots.remove(slot)
+        else:
+            # A kihagyott slotok szabadok maradnak
+            self.free_slots.extend(range(self.high_water, slot))
+            self.high_water = slot + 1
+
+    def _grow(self, capacity: int):
+        extra = capacity - len(self.active)
+        self.position = np.concatenate([self.position, np.zeros((extra, 2))])
+        self.velocity = np.concatenate([self.velocity, np.zeros((extra, 2))])
+        self.active = np.concatenate([self.active, np.zeros(extra, dtype=bool)])
+        self.player_ids.extend([None] * extra)
+
+    def active_slots(self) -> np.ndarray:
+        """Az élő slotok növekvő sorrendben."""
+        if self._active_slots is None:
+            self._active_slots = np.flatnonzero(self.active[:self.high_water])
+        return self._active_slots
+
+    # --- Szimuláció ---
+
+    def apply_commands(self, slots: np.ndarray, direction_ids: np.ndarray, dt: float):
+        """
+        Slotonként egy input parancs egy lépésben: sebesség az irányból, majd egy dt lépés.
+        Egy hívásban egy slot csak egyszer szerepelhet (a lemaradás pótlása külön hívás).
+        """
+        if len(slots) == 0:
+            return
+        velocity = DIRECTION_VELOCITY[direction_ids]
+        self.velocity[slots] = velocity
+        self.position[slots] += velocity * dt
+
+    def quantized(self, slots: np.ndarray) -> np.ndarray:
+        """A slotok hálózati (kvantált) mezői: (n, 4) egész tömb (x, y, vx, vy)."""
+        return quantize_arrays(self.position[slots], self.velocity[slots])
+
+
+def quantize_arrays(position: np.ndarray, velocity: np.ndarray) -> np.ndarray:
+    """(n, 2) pozíció és sebesség tömbök hálózati (kvantált) alakja: (n, 4) egész tömb."""
+    values = np.empty((len(position), 4), dtype=np.int64)
+    values[:, 0:2] = np.rint(position * POSITION_SCALE)
+    values[:, 2:4] = np.rint(np.clip(velocity, -VELOCITY_LIMIT, VELOCITY_LIMIT) * VELOCITY_SCALE)
+    return values
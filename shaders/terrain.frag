@@ -0,0 +1,21 @@
+#version 150
+in vec3 normal;
+in vec3 worldPos;
+in vec2 texcoord;
+out vec4 p3d_FragColor;
+
+void main() {
+    vec3 N = normalize(normal);
+    float grid = 0.0;
+    if (fract(texcoord.x) < 0.02 || fract(texcoord.y) < 0.02) grid = 0.1;
+
+    vec3 baseColor = vec3(0.2, 0.6, 0.3);
+    if (worldPos.z > 3.0) baseColor = vec3(0.5, 0.5, 0.5);
+    if (worldPos.z > 5.5) baseColor = vec3(0.9, 0.9, 0.9);
+    if (worldPos.z < -1.0) baseColor = vec3(0.7, 0.6, 0.4);
+
+    vec3 lightDir = normalize(vec3(0.5, 0.5, 1.0));
+    float diff = max(dot(N, lightDir), 0.2);
+
+    p3d_FragColor = vec4(baseColor * diff + vec3(grid), 1.0);
+}
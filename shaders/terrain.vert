@@ -0,0 +1,16 @@
+#version 150
+in vec4 p3d_Vertex;
+in vec3 p3d_Normal;
+in vec2 p3d_MultiTexCoord0;
+uniform mat4 p3d_ModelViewProjectionMatrix;
+uniform mat3 p3d_NormalMatrix;
+out vec3 normal;
+out vec3 worldPos;
+out vec2 texcoord;
+
+void main() {
+    gl_Position = p3d_ModelViewProjectionMatrix * p3d_Vertex;
+    worldPos = p3d_Vertex.xyz;
+    normal = normalize(p3d_NormalMatrix * p3d_Normal);
+    texcoord = p3d_MultiTexCoord0;
+}
@@ -1,19 +1,26 @@
 import math
 import random
+
+import numpy as np
 from panda3d.core import (
     Geom, GeomNode, GeomVertexData, GeomVertexFormat, GeomVertexArrayFormat,
     GeomVertexWriter, GeomTriangles, NodePath, InternalName,
     Vec3, Shader, BitMask32
 )
 
+from core.profiler import profiler
+
+TERRAIN_VERT = "shaders/terrain.vert"
+TERRAIN_FRAG = "shaders/terrain.frag"
+
 class InfiniteTerrain:
-    def __init__(self, render_node, seed=42):
+    def __init__(self, render_node, seed=42, generate=True):
         self.render_node = render_node
         # Létrehozunk egy gyökér node-ot a terepnek
         self.root = self.render_node.attachNewNode("infinite_terrain_root")
         
-        # Ütközési maszk (hogy a PhysicsManager és az AI lássa a talajt)
-        # A BitMask32.bit(1) a TERRAIN maszkja a physics.py szerint
+        # Ütközési maszk (hogy a golyók és az AI látás sugara lássa a talajt)
+        # A BitMask32.bit(1) a TERRAIN maszkja
         self.terrain_mask = BitMask32.bit(1)
         
         # Hullám paraméterek
@@ -35,12 +42,18 @@ class InfiniteTerrain:
         self.render_distance = 2 
         self.active_chunks = {}
 
+        # Feliratkozók a chunk betöltés/kitétel eseményekre: callback(key)
+        self.on_chunk_loaded = []
+        self.on_chunk_unloaded = []
+
         # Vertex formátum és Shader beállítása
         self.setup_vertex_format()
         self.setup_shader()
         
         # Kezdeti generálás a (0,0) pont körül
-        self.update(Vec3(0,0,0))
+        # (generate=False esetén a hívó tölti be fokozatosan, pl. update(..., budget=N))
+        if generate:
+            self.update(Vec3(0,0,0))
 
     def setup_vertex_format(self):
         """Egyedi formátum a normálokhoz, tangensekhez."""
@@ -74,8 +87,25 @@ class InfiniteTerrain:
 
         return z, slope_x, slope_y
 
+    def get_height_array(self, xs, ys):
+        """A get_height_slope magassága egyszerre sok pontra (numpy tömbök)."""
+        z = np.zeros(np.shape(xs), dtype=np.float64)
+        for wave in self.waves:
+            z += wave['amp'] * np.sin(xs * wave['freq_x'] + wave['phase_x']) \
+                             * np.cos(ys * wave['freq_y'] + wave['phase_y'])
+        return z
+
+    def chunk_key_at(self, x, y):
+        """Melyik chunkba esik a világ (x, y) pontja."""
+        return (int(math.floor(x / self.chunk_world_size)),
+                int(math.floor(y / self.chunk_world_size)))
+
     def generate_chunk(self, cx, cy):
         """Egy chunk geometriájának legenerálása."""
+        with profiler.scope("generate_chunk"):
+            return self._build_chunk(cx, cy)
+
+    def _build_chunk(self, cx, cy):
         vdata = GeomVertexData(f'chunk_{cx}_{cy}', self.custom_format, Geom.UH_static)
         vdata.setNumRows(self.chunk_size * self.chunk_size)
 
@@ -128,10 +158,13 @@ class InfiniteTerrain:
         
         return np
 
-    def update(self, player_pos):
-        """Chunkok betöltése/kitétele a játékos pozíciója alapján."""
-        p_cx = int(math.floor(player_pos.x / self.chunk_world_size))
-        p_cy = int(math.floor(player_pos.y / self.chunk_world_size))
+    def update(self, player_pos, budget=None):
+        """
+        Chunkok betöltése/kitétele a játékos pozíciója alapján.
+        budget: legfeljebb ennyi új chunk generálása ebben a hívásban (a legközelebbiek
+        előbb); None = mind. Visszaadja a még hiányzó chunkok számát.
+        """
+        p_cx, p_cy = self.chunk_key_at(player_pos.x, player_pos.y)
 
         needed_chunks = set()
         rng = self.render_distance
@@ -143,53 +176,24 @@ class InfiniteTerrain:
             if key not in needed_chunks:
                 self.active_chunks[key].removeNode()
                 del self.active_chunks[key]
-
-        for key in needed_chunks:
-            if key not in self.active_chunks:
-                self.active_chunks[key] = self.generate_chunk(key[0], key[1])
+                for callback in self.on_chunk_unloaded:
+                    callback(key)
+
+        missing = [key for key in needed_chunks if key not in self.active_chunks]
+        missing.sort(key=lambda k: ((k[0] - p_cx) ** 2 + (k[1] - p_cy) ** 2, k))
+        if budget is not None:
+            pending = len(missing) - budget
+            missing = missing[:budget]
+        else:
+            pending = 0
+
+        for key in missing:
+            self.active_chunks[key] = self.generate_chunk(key[0], key[1])
+            for callback in self.on_chunk_loaded:
+                callback(key)
+        return max(0, pending)
 
     def setup_shader(self):
-        vert_shader = """
-        #version 150
-        in vec4 p3d_Vertex;
-        in vec3 p3d_Normal;
-        in vec2 p3d_MultiTexCoord0;
-        uniform mat4 p3d_ModelViewProjectionMatrix;
-        uniform mat3 p3d_NormalMatrix;
-        out vec3 normal;
-        out vec3 worldPos;
-        out vec2 texcoord;
-
-        void main() {
-            gl_Position = p3d_ModelViewProjectionMatrix * p3d_Vertex;
-            worldPos = p3d_Vertex.xyz;
-            normal = normalize(p3d_NormalMatrix * p3d_Normal);
-            texcoord = p3d_MultiTexCoord0;
-        }
-        """
-
-        frag_shader = """
-        #version 150
-        in vec3 normal;
-        in vec3 worldPos;
-        in vec2 texcoord;
-        out vec4 p3d_FragColor;
-
-        void main() {
-            vec3 N = normalize(normal);
-            float grid = 0.0;
-            if (fract(texcoord.x) < 0.02 || fract(texcoord.y) < 0.02) grid = 0.1;
-            
-            vec3 baseColor = vec3(0.2, 0.6, 0.3);
-            if (worldPos.z > 3.0) baseColor = vec3(0.5, 0.5, 0.5);
-            if (worldPos.z > 5.5) baseColor = vec3(0.9, 0.9, 0.9);
-            if (worldPos.z < -1.0) baseColor = vec3(0.7, 0.6, 0.4);
-            
-            vec3 lightDir = normalize(vec3(0.5, 0.5, 1.0));
-            float diff = max(dot(N, lightDir), 0.2);
-            
-            p3d_FragColor = vec4(baseColor * diff + vec3(grid), 1.0);
-        }
-        """
-        shader = Shader.make(Shader.SL_GLSL, vert_shader, frag_shader)
-        self.root.setShader(shader)
\ No newline at end of file
+        # A shader forrás a shaders/ mappában van (nem inline), a Game előre elő tudja készíteni
+        self.shader = Shader.load(Shader.SL_GLSL, vertex=TERRAIN_VERT, fragment=TERRAIN_FRAG)
+        self.root.setShader(self.shader)